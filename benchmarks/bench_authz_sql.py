@@ -0,0 +1,81 @@
+#!/usr/bin/env python
+"""Measure SimpleSQL user lookups per second from a pool of threads.
+
+  bench_authz_sql.py [<db url>] [<threads>] [<seconds>]
+
+The default db url is a temporary sqlite file.  The unpooled run builds a
+new SimpleSQL on a NullPool engine for every lookup, which is what
+PhantomConfig.get_authz used to do.  The pooled run shares one SimpleSQL
+over a QueuePool engine with thread scoped sessions."""
+
+import os
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from pyhantom.authz.simple_sql_db import SimpleSQL, SimpleSQLSessionMaker
+
+USER_COUNT = 1000
+
+
+def _run(get_authz, access_keys, thread_count, seconds):
+    counts = [0] * thread_count
+    done = threading.Event()
+
+    def worker(ndx):
+        i = ndx
+        while not done.is_set():
+            get_authz().get_user_object_by_access_id(access_keys[i % len(access_keys)])
+            counts[ndx] = counts[ndx] + 1
+            i = i + 1
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(0, thread_count)]
+    for t in threads:
+        t.start()
+    time.sleep(seconds)
+    done.set()
+    for t in threads:
+        t.join()
+    return sum(counts) / float(seconds)
+
+
+def main(argv=sys.argv):
+    db_fname = None
+    if len(argv) > 1:
+        dburl = argv[1]
+    else:
+        (osf, db_fname) = tempfile.mkstemp(prefix="/tmp/phantombench")
+        os.close(osf)
+        dburl = "sqlite:///%s" % (db_fname)
+    thread_count = 8
+    if len(argv) > 2:
+        thread_count = int(argv[2])
+    seconds = 5
+    if len(argv) > 3:
+        seconds = int(argv[3])
+
+    try:
+        unpooled = SimpleSQLSessionMaker(dburl)
+        access_keys = []
+        authz = SimpleSQL(unpooled)
+        for i in range(0, USER_COUNT):
+            access_key = str(uuid.uuid4())
+            authz.add_user("benchuser%d" % (i), access_key, str(uuid.uuid4()))
+            access_keys.append(access_key)
+
+        rate = _run(lambda: SimpleSQL(unpooled), access_keys, thread_count, seconds)
+        print "unpooled (NullPool, SimpleSQL per call): %.1f lookups/sec" % (rate)
+
+        pooled = SimpleSQLSessionMaker(dburl, pool_size=thread_count, pool_pre_ping=True)
+        shared = SimpleSQL(pooled)
+        rate = _run(lambda: shared, access_keys, thread_count, seconds)
+        print "pooled (QueuePool, shared SimpleSQL):    %.1f lookups/sec" % (rate)
+    finally:
+        if db_fname:
+            os.remove(db_fname)
+    return 0
+
+if __name__ == '__main__':
+    rc = main()
+    sys.exit(rc)
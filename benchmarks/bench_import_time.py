@@ -0,0 +1,79 @@
+#!/usr/bin/env python
+"""Report how long importing Phantom modules takes, in the style of
+python 3's -X importtime, which python 2 does not have.  Each module is
+imported in a fresh interpreter with __import__ wrapped to time every
+module that is loaded for the first time.
+
+  bench_import_time.py [--all] [<module> ...]
+
+The default modules are the ones a tester + simple_file deployment loads.
+Only modules that took at least 1ms (cumulative) are listed unless --all
+is given.  import_time_report.txt next to this script is the output of a
+plain run, compare against it to spot startup regressions."""
+
+import __builtin__
+import os
+import subprocess
+import sys
+import time
+
+DEFAULT_MODULES = ['pyhantom.config', 'pyhantom.main_router']
+# modules that only some backends need and that should not be loaded otherwise
+HEAVY_MODULES = ['sqlalchemy', 'boto', 'dashi', 'ceiclient']
+MIN_CUMULATIVE_US = 1000
+
+
+def _child(module_name, show_all):
+    real_import = __builtin__.__import__
+    # (depth, name, self us, cumulative us) in the order the imports finished
+    timings = []
+    stack = []
+
+    def timed_import(name, *args, **kwargs):
+        if name in sys.modules:
+            return real_import(name, *args, **kwargs)
+        stack.append(0.0)
+        before = time.time()
+        try:
+            return real_import(name, *args, **kwargs)
+        finally:
+            elapsed = time.time() - before
+            children = stack.pop()
+            if stack:
+                stack[-1] = stack[-1] + elapsed
+            if name in sys.modules and sys.modules[name] is not None:
+                timings.append((len(stack), name, (elapsed - children) * 1000000, elapsed * 1000000))
+
+    __builtin__.__import__ = timed_import
+    before = time.time()
+    __import__(module_name)
+    total = time.time() - before
+    __builtin__.__import__ = real_import
+
+    heavy = [m for m in HEAVY_MODULES if m in sys.modules]
+    print "%s: %.1fms, %d modules loaded, heavy modules: %s" % (module_name, total * 1000, len(sys.modules), ", ".join(heavy) or "none")
+    print "import time: self [us] | cumulative | imported package"
+    for (depth, name, self_us, cumulative_us) in timings:
+        if show_all or cumulative_us >= MIN_CUMULATIVE_US:
+            print "import time: %9d | %10d | %s%s" % (self_us, cumulative_us, "  " * depth, name)
+    print
+
+
+def main(argv=sys.argv):
+    args = argv[1:]
+    if len(args) == 3 and args[0] == '--child':
+        _child(args[1], args[2] == 'all')
+        return 0
+
+    show_all = '--all' in args
+    modules = [a for a in args if a != '--all'] or DEFAULT_MODULES
+    for module_name in modules:
+        # a new interpreter for every module so nothing is already loaded
+        rc = subprocess.call([sys.executable, os.path.abspath(__file__), '--child', module_name, show_all and 'all' or 'some'])
+        if rc != 0:
+            return rc
+    return 0
+
+if __name__ == '__main__':
+    rc = main()
+    sys.exit(rc)
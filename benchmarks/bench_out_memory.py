@@ -0,0 +1,121 @@
+#!/usr/bin/env python
+"""Peak memory of building and serializing a DescribeAutoScalingGroups
+response, with the __slots__ based InstanceType against a dict backed
+copy of it.  Each run happens in a forked child and reports how far its
+peak resident set size (ru_maxrss) grew, python 2 has no tracemalloc.
+
+  bench_out_memory.py [<instance count>] [<instances per group>]"""
+
+import datetime
+import os
+import resource
+import sys
+import traceback
+from pyhantom.out_data_types import AWSListType, AWSType, AutoScalingGroupType, DateTimeType, InstanceType
+from pyhantom.xml_writer import XMLStreamWriter
+
+
+class _DictInstanceType(object):
+    # InstanceType as it was before the output types had __slots__
+    members_type_dict = InstanceType.members_type_dict
+    write_xml = AWSType.__dict__['write_xml']
+    _xml_plan = InstanceType._xml_plan
+
+    def __init__(self, name):
+        self.name = name
+
+
+def make_asg_list(instance_type, instance_count, per_group):
+    asg_list = AWSListType('AutoScalingGroups')
+    for g in range(0, (instance_count + per_group - 1) / per_group):
+        asg = AutoScalingGroupType('AutoScalingGroup')
+        asg.AutoScalingGroupName = "group%d" % (g)
+        asg.AutoScalingGroupARN = "arn:phantom:autoscaling:AZ:000000000000:group%d" % (g)
+        asg.AvailabilityZones.add_item("hotel")
+        asg.CreatedTime = DateTimeType('CreatedTime', datetime.datetime.utcnow())
+        asg.Cooldown = 0
+        asg.DesiredCapacity = per_group
+        asg.HealthCheckGracePeriod = 0
+        asg.LaunchConfigurationName = "dt@hotel"
+        asg.MaxSize = per_group
+        asg.MinSize = per_group
+        for i in range(0, min(per_group, instance_count - g * per_group)):
+            inst = instance_type('Instance')
+            inst.AutoScalingGroupName = asg.AutoScalingGroupName
+            inst.AvailabilityZone = "hotel"
+            inst.HealthStatus = "Healthy"
+            inst.InstanceId = "i-%04d%04d" % (g, i)
+            inst.LaunchConfigurationName = "dt@hotel"
+            inst.LifecycleState = "600-RUNNING"
+            asg.Instances.add_item(inst)
+        asg_list.add_item(asg)
+    return asg_list
+
+
+def _describe(instance_type, instance_count, per_group):
+    asg_list = make_asg_list(instance_type, instance_count, per_group)
+    writer = XMLStreamWriter()
+    writer.start('AutoScalingGroups')
+    asg_list.write_xml(writer)
+    writer.end()
+    return "".join(writer.iter_encoded("UTF-8"))
+
+
+def _peak_growth(instance_type, instance_count, per_group):
+    """Return (peak rss growth in KB, body length) of one describe run in a
+    child, or None if the child failed"""
+    (r, w) = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        os.close(r)
+        try:
+            before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+            body = _describe(instance_type, instance_count, per_group)
+            after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+            os.write(w, "%d %d" % (after - before, len(body)))
+        except:
+            traceback.print_exc()
+            sys.stderr.flush()
+            os._exit(1)
+        os._exit(0)
+    os.close(w)
+    result = os.read(r, 64)
+    os.close(r)
+    (pid, status) = os.waitpid(pid, 0)
+    if not os.WIFEXITED(status) or os.WEXITSTATUS(status) != 0:
+        print "ERROR: the %s run failed with wait status %d" % (instance_type.__name__, status)
+        return None
+    (growth, length) = result.split()
+    return (int(growth), int(length))
+
+
+def main(argv=sys.argv):
+    instance_count = 10000
+    per_group = 100
+    if len(argv) > 1:
+        instance_count = int(argv[1])
+    if len(argv) > 2:
+        per_group = int(argv[2])
+
+    dict_run = _peak_growth(_DictInstanceType, instance_count, per_group)
+    slots_run = _peak_growth(InstanceType, instance_count, per_group)
+    if dict_run is None or slots_run is None:
+        return 1
+    (dict_kb, dict_len) = dict_run
+    (slots_kb, slots_len) = slots_run
+    if dict_len != slots_len:
+        print "ERROR: the two bodies differ"
+        return 1
+    inst = InstanceType('Instance')
+    dict_inst = _DictInstanceType('Instance')
+    for m in InstanceType.members_type_dict:
+        setattr(inst, m, "x")
+        setattr(dict_inst, m, "x")
+    print "%d instances in groups of %d, %d byte body" % (instance_count, per_group, slots_len)
+    print "dict backed:  peak +%d KB, %d bytes per instance" % (dict_kb, sys.getsizeof(dict_inst) + sys.getsizeof(dict_inst.__dict__))
+    print "__slots__:    peak +%d KB, %d bytes per instance" % (slots_kb, sys.getsizeof(inst))
+    return 0
+
+if __name__ == '__main__':
+    rc = main()
+    sys.exit(rc)
@@ -0,0 +1,133 @@
+#!/usr/bin/env python
+"""Time parsing the params of a CreateAutoScalingGroup request with the
+precompiled per class parser against the scan that set_from_dict used to
+do, which checked every param against every list name with str.find.
+
+  bench_request_parse.py [<tag count>] [<rounds>]"""
+
+import sys
+import time
+from webob.multidict import MultiDict
+from pyhantom.in_data_types import CreateAutoScalingGroupInput
+from pyhantom.util import phantom_is_primative
+
+
+def make_params(tag_count):
+    params = MultiDict()
+    params['Action'] = 'CreateAutoScalingGroup'
+    params['Version'] = '2011-01-01'
+    params['AutoScalingGroupName'] = u'asg1'
+    params['LaunchConfigurationName'] = u'dt@hotel'
+    params['MaxSize'] = u'3'
+    params['MinSize'] = u'1'
+    params['DesiredCapacity'] = u'2'
+    params['AvailabilityZones.member.1'] = u'hotel'
+    for i in range(1, tag_count + 1):
+        prefix = 'Tags.member.%d.' % (i)
+        params[prefix + 'Key'] = u'key%d' % (i)
+        params[prefix + 'Value'] = u'value%d' % (i)
+        params[prefix + 'ResourceId'] = u'asg1'
+        params[prefix + 'ResourceType'] = u'auto-scaling-group'
+        params[prefix + 'PropagateAtLaunch'] = u'true'
+    return params
+
+
+class _Old(object):
+    # the old set_from_dict, kept here only to compare against
+
+    def __init__(self, cls):
+        self.__dict__['_cls'] = cls
+
+    def _get_value(self, in_val, t):
+        if t == int:
+            return int(in_val)
+        if t == bool:
+            return in_val.lower() == 'true'
+        return in_val
+
+    def set_value(self, name, value):
+        self.__dict__[name] = value
+
+    def _do_list_param(self, params, p, type_d):
+        for pl in type_d.keys():
+            ndx = p.find(pl)
+            if ndx == 0:
+                if phantom_is_primative(type_d[pl]):
+                    val = self._get_value(params[p], type_d[pl])
+                    if val:
+                        if pl not in self.__dict__:
+                            self.__dict__[pl] = []
+                        self.__dict__[pl].append(val)
+                else:
+                    if pl not in self.__dict__:
+                        self.__dict__[pl] = []
+                    l = self.__dict__[pl]
+                    member_info = p.split('.', 3)
+                    member_ndx = int(member_info[2])
+                    for i in range(len(l), int(member_ndx)):
+                        l.append(_Old(type_d[pl]))
+                    element = l[member_ndx-1]
+                    element.set_value(member_info[3], params[p])
+
+    def set_from_dict(self, params):
+        cls = self._cls
+        for p in cls.needed_param_keys.keys():
+            if p not in params:
+                raise Exception("parameter %s missing" % (p))
+        for pl in cls.needed_param_list_keys.keys():
+            found = False
+            for p in params:
+                if p.find(pl) == 0:
+                    found = True
+            if not found:
+                raise Exception("parameter %s missing" % (pl))
+        for p in params:
+            self._do_list_param(params, p, cls.needed_param_list_keys)
+            self._do_list_param(params, p, cls.optional_param_list_keys)
+        for keys in (cls.needed_param_keys, cls.optional_param_keys):
+            for p in keys:
+                if p in params:
+                    self.__dict__[p] = self._get_value(params[p], keys[p])
+
+
+def old_parse(params):
+    input = _Old(CreateAutoScalingGroupInput)
+    input.set_from_dict(params)
+    return input
+
+
+def new_parse(params):
+    input = CreateAutoScalingGroupInput()
+    input.set_from_dict(params)
+    return input
+
+
+def _time(func, params, rounds):
+    before = time.time()
+    for i in range(0, rounds):
+        input = func(params)
+    return (time.time() - before, input)
+
+
+def main(argv=sys.argv):
+    tag_count = 50
+    rounds = 2000
+    if len(argv) > 1:
+        tag_count = int(argv[1])
+    if len(argv) > 2:
+        rounds = int(argv[2])
+
+    params = make_params(tag_count)
+    (old_time, old_input) = _time(old_parse, params, rounds)
+    (new_time, new_input) = _time(new_parse, params, rounds)
+    if [t.Key for t in old_input.Tags] != [t.Key for t in new_input.Tags]:
+        print "ERROR: the two parsers differ"
+        return 1
+    print "%d params (%d tags), %d rounds" % (len(params), tag_count, rounds)
+    print "old scan:    %.1fus per request" % (old_time * 1000000.0 / rounds)
+    print "precompiled: %.1fus per request" % (new_time * 1000000.0 / rounds)
+    return 0
+
+if __name__ == '__main__':
+    rc = main()
+    sys.exit(rc)
@@ -0,0 +1,102 @@
+#!/usr/bin/env python
+"""Time DescribeLaunchConfigurations requests through the MainRouter
+with the action applications made once at startup against making a new
+one for every request, which is what the router used to do.
+
+  bench_router_overhead.py [<requests>]
+
+Requests are signed ahead of time and served by the in memory test
+system, so the times are the router and application overhead."""
+
+import datetime
+import os
+import sys
+import tempfile
+import time
+import uuid
+import webob
+from pyhantom.authz.simple_file import SimpleFileDataStore
+from pyhantom.main_router import MainRouter, _action_to_application_map
+from pyhantom.system.tester import TestSystem
+from pyhantom.util import calc_v2_signature
+
+
+class _Config(object):
+
+    def __init__(self, authz):
+        self._authz = authz
+        self._system = TestSystem()
+        self.statsd_client = None
+
+    def get_system(self):
+        return self._system
+
+    def get_authz(self):
+        return self._authz
+
+
+class _PerRequestApplications(object):
+    # stands in for the router's applications, making a new one on every lookup
+
+    def __init__(self, cfg):
+        self._cfg = cfg
+
+    def __contains__(self, action):
+        return action in _action_to_application_map
+
+    def __getitem__(self, action):
+        # the applications used to make their own request id as well
+        str(uuid.uuid4())
+        return _action_to_application_map[action](action, cfg=self._cfg)
+
+
+def make_requests(count, username, password):
+    reqs = []
+    for i in range(0, count):
+        params = {'Action': 'DescribeLaunchConfigurations', 'AWSAccessKeyId': username,
+                  'SignatureMethod': 'HmacSHA256', 'SignatureVersion': '2',
+                  'Timestamp': datetime.datetime.utcnow().strftime('%Y-%m-%dT%H:%M:%SZ')}
+        req = webob.Request.blank('/', POST=params)
+        req.headers['host'] = 'localhost'
+        req.POST['Signature'] = calc_v2_signature(password, req, {'SignatureMethod': 'HmacSHA256'})
+        reqs.append(req)
+    return reqs
+
+
+def _time(router, reqs):
+    before = time.time()
+    for req in reqs:
+        res = req.get_response(router)
+        if res.status_int != 200:
+            raise Exception(res.body)
+    return time.time() - before
+
+
+def main(argv=sys.argv):
+    count = 5000
+    if len(argv) > 1:
+        count = int(argv[1])
+
+    (osf, pwfile) = tempfile.mkstemp(prefix="/tmp/phantom")
+    os.close(osf)
+    try:
+        fptr = open(pwfile, "w")
+        fptr.write("benchuser benchsecret tester\n")
+        fptr.close()
+        cfg = _Config(SimpleFileDataStore(pwfile))
+
+        router = MainRouter(cfg=cfg)
+        shared_time = _time(router, make_requests(count, "benchuser", "benchsecret"))
+        router._applications = _PerRequestApplications(cfg)
+        per_request_time = _time(router, make_requests(count, "benchuser", "benchsecret"))
+    finally:
+        os.remove(pwfile)
+
+    print "%d requests" % (count)
+    print "new application per request: %.1fus per request" % (per_request_time * 1000000.0 / count)
+    print "applications made at startup: %.1fus per request" % (shared_time * 1000000.0 / count)
+    return 0
+
+if __name__ == '__main__':
+    rc = main()
+    sys.exit(rc)
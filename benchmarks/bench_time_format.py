@@ -0,0 +1,67 @@
+#!/usr/bin/env python
+"""Time parsing and formatting CreatedTime values with the fixed format
+_get_time/make_time against the strptime/strftime versions they
+replaced.  A describe reads the same few times again and again, so the
+run is over <distinct> different times repeated up to <count> calls.
+
+  bench_time_format.py [<count>] [<distinct>]"""
+
+import datetime
+import re
+import sys
+import time
+import pyhantom.util
+from pyhantom.util import _get_time, make_time
+
+
+def old_get_time(str_time):
+    str_time = str_time.replace("Z", "UTC")
+    str_time = re.sub('\..*', "UTC", str_time)
+    return datetime.datetime.strptime(str_time, '%Y-%m-%dT%H:%M:%S%Z')
+
+def old_make_time(datetimeobj):
+    return datetime.datetime.strftime(datetimeobj, '%Y-%m-%dT%H:%M:%S.%fZ')
+
+
+def _time(func, values):
+    before = time.time()
+    for v in values:
+        func(v)
+    return time.time() - before
+
+
+def main(argv=sys.argv):
+    count = 100000
+    distinct = 200
+    if len(argv) > 1:
+        count = int(argv[1])
+    if len(argv) > 2:
+        distinct = int(argv[2])
+
+    start = datetime.datetime(2012, 5, 1, 12, 30, 15, 12)
+    times = [start + datetime.timedelta(seconds=i, microseconds=i) for i in range(0, distinct)]
+    dts = [times[i % distinct] for i in range(0, count)]
+    strs = [old_make_time(dt) for dt in dts]
+    for (s, dt) in zip(strs, dts):
+        if _get_time(s) != old_get_time(s) or make_time(dt) != s:
+            print "ERROR: the two versions differ on %s" % (s)
+            return 1
+
+    print "%d calls over %d distinct times" % (count, distinct)
+    results = [("strptime", _time(old_get_time, strs)), ("strftime", _time(old_make_time, dts))]
+    # without the memo every call is a miss
+    pyhantom.util.TIME_MEMO_MAX_ENTRIES = 0
+    pyhantom.util.g_parse_time_memo.clear()
+    pyhantom.util.g_make_time_memo.clear()
+    results.append(("_get_time, no memo", _time(_get_time, strs)))
+    results.append(("make_time, no memo", _time(make_time, dts)))
+    pyhantom.util.TIME_MEMO_MAX_ENTRIES = distinct + 1
+    results.append(("_get_time", _time(_get_time, strs)))
+    results.append(("make_time", _time(make_time, dts)))
+    for (name, elapsed) in results:
+        print "%-20s %.2fus per call" % (name + ":", elapsed * 1000000.0 / count)
+    return 0
+
+if __name__ == '__main__':
+    rc = main()
+    sys.exit(rc)
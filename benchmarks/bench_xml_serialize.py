@@ -0,0 +1,115 @@
+#!/usr/bin/env python
+"""Compare building a DescribeAutoScalingGroups response with
+xml.dom.minidom against the XMLStreamWriter.
+
+  bench_xml_serialize.py [<group count>] [<instances per group>]"""
+
+import datetime
+import sys
+import time
+import xml.dom.minidom
+from pyhantom.out_data_types import AWSListType, AutoScalingGroupType, DateTimeType, InstanceType
+from pyhantom.xml_writer import XMLStreamWriter
+
+NS = u"http://autoscaling.amazonaws.com/doc/2009-05-15/"
+
+
+def make_asg_list(group_count, instance_count):
+    asg_list = AWSListType('AutoScalingGroups')
+    for g in range(0, group_count):
+        asg = AutoScalingGroupType('AutoScalingGroup')
+        asg.AutoScalingGroupName = "group%d" % (g)
+        asg.AutoScalingGroupARN = "arn:phantom:autoscaling:AZ:000000000000:group%d" % (g)
+        asg.AvailabilityZones = AWSListType('AvailabilityZones')
+        asg.AvailabilityZones.add_item("hotel")
+        asg.CreatedTime = DateTimeType('CreatedTime', datetime.datetime.utcnow())
+        asg.Cooldown = 0
+        asg.DesiredCapacity = instance_count
+        asg.EnabledMetrics = AWSListType('EnabledMetrics')
+        asg.HealthCheckGracePeriod = 0
+        asg.LaunchConfigurationName = "dt@hotel"
+        asg.LoadBalancerNames = AWSListType('LoadBalancerNames')
+        asg.MaxSize = instance_count
+        asg.MinSize = instance_count
+        asg.SuspendedProcesses = AWSListType('SuspendedProcesses')
+        asg.Tags = AWSListType('Tags')
+        asg.Instances = AWSListType('Instances')
+        for i in range(0, instance_count):
+            inst = InstanceType('Instance')
+            inst.AutoScalingGroupName = asg.AutoScalingGroupName
+            inst.AvailabilityZone = "hotel"
+            inst.HealthStatus = "Healthy"
+            inst.InstanceId = "i-%04d%04d" % (g, i)
+            inst.LaunchConfigurationName = "dt@hotel"
+            inst.LifecycleState = "600-RUNNING"
+            asg.Instances.add_item(inst)
+        asg_list.add_item(asg)
+    return asg_list
+
+
+def minidom_body(asg_list):
+    doc = xml.dom.minidom.Document()
+    el = doc.createElementNS(NS, u"DescribeAutoScalingGroupsResponse")
+    el.setAttribute("xmlns", NS)
+    doc.appendChild(el)
+    resp_el = doc.createElement('ResponseMetadata')
+    el.appendChild(resp_el)
+    reqid_el = doc.createElement('RequestId')
+    resp_el.appendChild(reqid_el)
+    reqid_el.appendChild(doc.createTextNode("reqid"))
+    dlcr_el = doc.createElement('DescribeAutoScalingGroupsResult')
+    el.appendChild(dlcr_el)
+    lc_el = doc.createElement('AutoScalingGroups')
+    dlcr_el.appendChild(lc_el)
+    asg_list.add_xml(doc, lc_el)
+    return doc.documentElement.toxml().encode("UTF-8")
+
+
+def writer_body(asg_list):
+    writer = XMLStreamWriter()
+    writer.start(u"DescribeAutoScalingGroupsResponse", [("xmlns", NS)])
+    writer.start('ResponseMetadata')
+    writer.element('RequestId', "reqid")
+    writer.end()
+    writer.start('DescribeAutoScalingGroupsResult')
+    writer.start('AutoScalingGroups')
+    asg_list.write_xml(writer)
+    writer.end()
+    writer.end()
+    writer.end()
+    return "".join(writer.iter_encoded("UTF-8"))
+
+
+def _time(func, asg_list, rounds=3):
+    best = None
+    for i in range(0, rounds):
+        before = time.time()
+        body = func(asg_list)
+        elapsed = time.time() - before
+        if best is None or elapsed < best:
+            best = elapsed
+    return (best, body)
+
+
+def main(argv=sys.argv):
+    group_count = 200
+    instance_count = 25
+    if len(argv) > 1:
+        group_count = int(argv[1])
+    if len(argv) > 2:
+        instance_count = int(argv[2])
+
+    asg_list = make_asg_list(group_count, instance_count)
+    (dom_time, dom_body) = _time(minidom_body, asg_list)
+    (writer_time, stream_body) = _time(writer_body, asg_list)
+    if dom_body != stream_body:
+        print "ERROR: the two bodies differ"
+        return 1
+    print "%d groups x %d instances, %d byte body" % (group_count, instance_count, len(dom_body))
+    print "minidom: %.3fs" % (dom_time)
+    print "writer:  %.3fs" % (writer_time)
+    return 0
+
+if __name__ == '__main__':
+    rc = main()
+    sys.exit(rc)
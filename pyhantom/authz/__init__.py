@@ -20,3 +20,7 @@ class PHAuthzIface(object):
     @not_implemented_decorator
     def add_user(self, displayname, access_id, access_secret):
         pass
+
+    @not_implemented_decorator
+    def remove_user(self, access_id):
+        pass
@@ -0,0 +1,53 @@
+from pyhantom.authz import PHAuthzIface
+from pyhantom.phantom_exceptions import PhantomAWSException
+from pyhantom.util import submit_metric
+
+# marks an access id that the backend told us does not exist
+_NOT_FOUND = object()
+
+
+class CachedAuthz(PHAuthzIface):
+    """Wraps any authz backend with a TTL/LRU cache of user objects keyed
+    by access id.  Unknown access ids are cached for negative_ttl seconds."""
+
+    def __init__(self, authz, cache, negative_ttl=5, statsd_client=None):
+        self._authz = authz
+        self._cache = cache
+        self._negative_ttl = negative_ttl
+        self._statsd_client = statsd_client
+
+    def _count(self, name):
+        submit_metric(self._statsd_client, 'incr', 'autoscale.authz.cache.%s' % (name))
+
+    def get_user_object_by_access_id(self, access_id):
+        user_obj = self._cache.get(access_id)
+        if user_obj is not None:
+            self._count('hit')
+            if user_obj is _NOT_FOUND:
+                raise PhantomAWSException('InvalidClientTokenId')
+            return user_obj
+
+        self._count('miss')
+        try:
+            user_obj = self._authz.get_user_object_by_access_id(access_id)
+        except PhantomAWSException, pae:
+            if pae.title == 'InvalidClientTokenId' and self._negative_ttl > 0:
+                self._cache.put(access_id, _NOT_FOUND, ttl=self._negative_ttl)
+            raise
+        self._cache.put(access_id, user_obj)
+        return user_obj
+
+    def get_user_object_by_display_name(self, display_name):
+        return self._authz.get_user_object_by_display_name(display_name)
+
+    def add_user(self, displayname, access_id, access_secret):
+        try:
+            return self._authz.add_user(displayname, access_id, access_secret)
+        finally:
+            self._cache.invalidate(access_id)
+
+    def remove_user(self, access_id):
+        try:
+            return self._authz.remove_user(access_id)
+        finally:
+            self._cache.invalidate(access_id)
@@ -1,27 +1,63 @@
-# The user object for store
+import os
+import threading
+import time
 from pyhantom.authz import PHAuthzIface, PhantomUserObject
 from pyhantom.phantom_exceptions import PhantomAWSException
 
+DEFAULT_RELOAD_INTERVAL = 5
+
 class SimpleFileDataStore(PHAuthzIface):
+    """Users are kept in a file with one '<access key> <secret> <display name>'
+    line per user.  The file is parsed into a dict keyed by access key and is
+    only parsed again when its inode, mtime or size changes.  The file is
+    stat'ed at most once every reload_interval seconds."""
 
-    def __init__(self, filepath):
+    def __init__(self, filepath, reload_interval=DEFAULT_RELOAD_INTERVAL, clock=time.time):
         self._filepath = filepath
+        self._reload_interval = reload_interval
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._users = None
+        self._file_id = None
+        self._next_check = 0
 
-    def get_user_object_by_access_id(self, access_id):
-        """Get a new connection every time this is called to make sure it is cleaned up"""
+    def _load(self):
+        users = {}
         fptr = open(self._filepath, "r")
         try:
             for line in fptr:
                 la = line.split()
+                if not la:
+                    continue
                 if len(la) != 3:
                     raise PhantomAWSException("InternalFailure", details="Invalid security file %s" % (self._filepath))
-                access_key = la[0]
-                secret_key = la[1]
-                display_name = la[2]
-                if access_key == access_id:
-                    return PhantomUserObject(access_id, secret_key, display_name)
-            raise PhantomAWSException('InvalidClientTokenId')
+                (access_key, secret_key, display_name) = la
+                users[access_key] = PhantomUserObject(access_key, secret_key, display_name)
         finally:
             fptr.close()
+        return users
 
+    def _get_users(self, force=False):
+        now = self._clock()
+        with self._lock:
+            if self._users is not None and now < self._next_check and not force:
+                return self._users
+            self._next_check = now + self._reload_interval
+            st = os.stat(self._filepath)
+            file_id = (st.st_ino, st.st_mtime, st.st_size)
+            if file_id != self._file_id:
+                self._users = self._load()
+                self._file_id = file_id
+            return self._users
+
+    def get_user_object_by_access_id(self, access_id):
+        users = self._get_users()
+        if access_id not in users:
+            raise PhantomAWSException('InvalidClientTokenId')
+        return users[access_id]
 
+    def get_user_object_by_display_name(self, display_name):
+        for user_obj in self._get_users().values():
+            if user_obj.display_name == display_name:
+                return user_obj
+        raise PhantomAWSException('InvalidClientTokenId')
@@ -6,8 +6,9 @@ from sqlalchemy import Integer
 from sqlalchemy import String, MetaData, Sequence
 from sqlalchemy import Table
 from sqlalchemy import types
-from sqlalchemy.orm import mapper, sessionmaker
-from sqlalchemy.pool import NullPool
+from sqlalchemy.orm import mapper, sessionmaker, scoped_session
+from sqlalchemy.pool import NullPool, QueuePool
+from sqlalchemy import event
 import sqlalchemy
 
 from pyhantom.authz import PHAuthzIface, PhantomUserObject
@@ -44,29 +45,66 @@ def reset_db(func):
     return call
 
 
-class SimpleSQLSessionMaker(object):
+def ping_connection(dbapi_connection, connection_record, connection_proxy):
+    """Make sure a pooled connection is still alive before handing it out.  A
+    DisconnectionError makes the pool throw it away and try a new one."""
+    cursor = dbapi_connection.cursor()
+    try:
+        cursor.execute("SELECT 1")
+    except:
+        raise sqlalchemy.exc.DisconnectionError()
+    finally:
+        cursor.close()
+
 
-    def __init__(self, dburl):
-        self._engine = sqlalchemy.create_engine(dburl, poolclass=NullPool)
+class SimpleSQLSessionMaker(object):
+    """Sessions are scoped to the calling thread.  When pool_size is None a
+    new connection is made for every session (NullPool), otherwise
+    connections are kept in a QueuePool shared by all threads."""
+
+    def __init__(self, dburl, pool_size=None, max_overflow=10, pool_recycle=-1, pool_pre_ping=False):
+        if pool_size is None:
+            self._engine = sqlalchemy.create_engine(dburl, poolclass=NullPool)
+        else:
+            connect_args = {}
+            if dburl.startswith('sqlite'):
+                # pooled sqlite connections move between the server threads
+                connect_args['check_same_thread'] = False
+            self._engine = sqlalchemy.create_engine(dburl, poolclass=QueuePool, pool_size=pool_size,
+                                                    max_overflow=max_overflow, pool_recycle=pool_recycle,
+                                                    connect_args=connect_args)
+            if pool_pre_ping:
+                event.listen(self._engine.pool, 'checkout', ping_connection)
         metadata.create_all(self._engine)
-        self._Session = sessionmaker(bind=self._engine)
+        self._Session = scoped_session(sessionmaker(bind=self._engine))
 
     def get_session(self):
         return self._Session()
 
+    def remove_session(self):
+        self._Session.remove()
+
 
 class SimpleSQL(PHAuthzIface):
 
-    def __init__(self, sessionmaker):
+    def __init__(self, sessionmaker, cache=None):
         self._sessionmaker = sessionmaker
+        self._cache = cache
+
+    def _invalidate(self, access_key):
+        if self._cache is not None:
+            self._cache.invalidate(access_key)
+
+    @property
+    def _session(self):
+        # the session maker hands back the calling thread's session so one SimpleSQL can be shared by all threads
+        return self._sessionmaker.get_session()
 
     def _open_dbobj(self):
-        self._session = self._sessionmaker.get_session()
+        pass
 
     def _close_dbobj(self):
-        if not self._session:
-            return
-        self._session.close()
+        self._sessionmaker.remove_session()
 
     @reset_db
     def get_user_object_by_access_id(self, access_id):
@@ -104,12 +142,15 @@ class SimpleSQL(PHAuthzIface):
         if not db_obj:
             raise PhantomAWSException('InvalidClientTokenId')
         self._session.delete(db_obj)
+        self.commit()
+        self._invalidate(access_key)
         return True
 
     @reset_db
     def add_user(self, displayname, access_id, access_secret):
         self._add_alter_user(displayname, access_id, access_secret)
         self.commit()
+        self._invalidate(access_id)
 
     def _lookup_user(self, access_key):
         q = self._session.query(PhantomUserDBObject)
@@ -0,0 +1,118 @@
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+_MISSING = object()
+
+
+class _Flight(object):
+    """One load that other threads asking for the same key wait on"""
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.value = None
+        self.exc_info = None
+
+
+class TTLCache(object):
+    """A thread safe, size bounded LRU cache whose entries expire after a time
+    to live.  Entries may be given their own ttl when they are added.
+    get_or_load() lets concurrent misses on one key share a single load."""
+
+    def __init__(self, max_entries=1000, ttl=60, clock=time.time):
+        self._max_entries = max_entries
+        self._ttl = ttl
+        self._clock = clock
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._in_flight = {}
+        self.hits = 0
+        self.misses = 0
+
+    def _get_locked(self, key, default):
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            self.misses = self.misses + 1
+            return default
+        (expires, value) = entry
+        if expires <= self._clock():
+            self.misses = self.misses + 1
+            return default
+        # reinserting moves it to the most recently used end
+        self._entries[key] = entry
+        self.hits = self.hits + 1
+        return value
+
+    def _put_locked(self, key, value, ttl):
+        if ttl is None:
+            ttl = self._ttl
+        self._entries.pop(key, None)
+        self._entries[key] = (self._clock() + ttl, value)
+        while len(self._entries) > self._max_entries:
+            self._entries.popitem(last=False)
+
+    def get(self, key, default=None):
+        with self._lock:
+            return self._get_locked(key, default)
+
+    def put(self, key, value, ttl=None):
+        with self._lock:
+            self._put_locked(key, value, ttl)
+
+    def get_or_load(self, key, load, ttl=None):
+        """Return the cached value for key.  On a miss call load() and cache
+        what it returns.  Threads that miss while a load for the same key is
+        running wait for that load instead of starting their own, and get its
+        result or its exception."""
+        with self._lock:
+            value = self._get_locked(key, _MISSING)
+            if value is not _MISSING:
+                return value
+            flight = self._in_flight.get(key)
+            leader = flight is None
+            if leader:
+                flight = _Flight()
+                self._in_flight[key] = flight
+
+        if not leader:
+            flight.event.wait()
+            if flight.exc_info is not None:
+                raise flight.exc_info[0], flight.exc_info[1], flight.exc_info[2]
+            return flight.value
+
+        try:
+            try:
+                flight.value = load()
+            except:
+                flight.exc_info = sys.exc_info()
+                raise
+            with self._lock:
+                # an invalidate while we were loading means the value may already be stale
+                if self._in_flight.get(key) is flight:
+                    self._put_locked(key, flight.value, ttl)
+            return flight.value
+        finally:
+            with self._lock:
+                if self._in_flight.get(key) is flight:
+                    del self._in_flight[key]
+            flight.event.set()
+
+    def invalidate(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+            self._in_flight.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._in_flight.clear()
+
+    def hit_ratio(self):
+        total = self.hits + self.misses
+        if total == 0:
+            return 0.0
+        return float(self.hits) / total
+
+    def __len__(self):
+        return len(self._entries)
@@ -6,43 +6,87 @@ try:
 except ImportError:
     StatsClient = None
 
-from pyhantom.authz.simple_file import SimpleFileDataStore
-from pyhantom.authz.simple_sql_db import SimpleSQL, SimpleSQLSessionMaker
+from pyhantom.authz.cached import CachedAuthz
+from pyhantom.cache import TTLCache
 from pyhantom.phantom_exceptions import PhantomAWSException
-import dashi.bootstrap
-from pyhantom.system.epu.epu_client import EPUSystem
-from pyhantom.system.epu_localdb.epu_system import EPUSystemWithLocalDB
-from pyhantom.system.local_db.system import SystemLocalDB
-from pyhantom.system.tester import TestSystem
+from pyhantom.util import configure_reply_logging, DEFAULT_REPLY_LOG_MAX_SIZE, DEFAULT_REPLY_LOG_SAMPLE_RATE
+
+DEFAULT_AUTHZ_CACHE_MAX_ENTRIES = 1024
+DEFAULT_AUTHZ_CACHE_TTL = 30
+DEFAULT_AUTHZ_CACHE_NEGATIVE_TTL = 5
+DEFAULT_AUTHZ_POOL_MAX_OVERFLOW = 10
+DEFAULT_AUTHZ_POOL_RECYCLE = 3600
+
+
+# The backends are looked up by phantom.system.type and phantom.authz.type.  Each
+# factory imports its backend when it is called, so a deployment only loads the
+# modules (ceiclient, dashi, SQLAlchemy) of the backends it is configured with.
+
+def _make_tester_system(phantom_cfg):
+    from pyhantom.system.tester import TestSystem
+    return TestSystem()
+
+def _make_localdb_system(phantom_cfg):
+    from pyhantom.system.local_db.system import SystemLocalDB
+    return SystemLocalDB(phantom_cfg._CFG, log=phantom_cfg.get_logger())
+
+def _make_epu_localdb_system(phantom_cfg):
+    from pyhantom.system.epu_localdb.epu_system import EPUSystemWithLocalDB
+    return EPUSystemWithLocalDB(phantom_cfg._CFG, statsd_client=phantom_cfg.statsd_client)
+
+def _make_epu_system(phantom_cfg):
+    from pyhantom.system.epu.epu_client import EPUSystem
+    return EPUSystem(phantom_cfg._CFG, statsd_client=phantom_cfg.statsd_client)
+
+def _make_simple_file_authz(phantom_cfg):
+    from pyhantom.authz.simple_file import SimpleFileDataStore, DEFAULT_RELOAD_INTERVAL
+    authz_cfg = phantom_cfg._CFG.phantom.authz
+    reload_interval = getattr(authz_cfg, 'reload_interval', DEFAULT_RELOAD_INTERVAL)
+    return SimpleFileDataStore(authz_cfg.filename, reload_interval=reload_interval)
+
+def _make_cumulus_authz(phantom_cfg):
+    from pyhantom.authz.cumulus_sqlalch import CumulusDataStore
+    return CumulusDataStore(phantom_cfg._CFG.phantom.authz.dburl)
+
+def _make_sqldb_authz(phantom_cfg):
+    from pyhantom.authz.simple_sql_db import SimpleSQL, SimpleSQLSessionMaker
+    authz_cfg = phantom_cfg._CFG.phantom.authz
+    # setting pool_size turns on connection pooling
+    pool_size = getattr(authz_cfg, 'pool_size', None)
+    max_overflow = getattr(authz_cfg, 'max_overflow', DEFAULT_AUTHZ_POOL_MAX_OVERFLOW)
+    pool_recycle = getattr(authz_cfg, 'pool_recycle', DEFAULT_AUTHZ_POOL_RECYCLE)
+    pool_pre_ping = getattr(authz_cfg, 'pool_pre_ping', False)
+    authz_sessionmaker = SimpleSQLSessionMaker(authz_cfg.dburl, pool_size=pool_size,
+                                               max_overflow=max_overflow, pool_recycle=pool_recycle,
+                                               pool_pre_ping=pool_pre_ping)
+    return SimpleSQL(authz_sessionmaker, cache=phantom_cfg._authz_cache)
+
+g_system_registry = {
+    'tester': _make_tester_system,
+    'localdb': _make_localdb_system,
+    'epu_localdb': _make_epu_localdb_system,
+    'epu': _make_epu_system,
+}
+
+g_authz_registry = {
+    'simple_file': _make_simple_file_authz,
+    'cumulus': _make_cumulus_authz,
+    'sqldb': _make_sqldb_authz,
+}
+
+def register_system(type_name, factory):
+    """factory is called with the PhantomConfig and returns the system"""
+    g_system_registry[type_name] = factory
+
+def register_authz(type_name, factory):
+    """factory is called with the PhantomConfig and returns the authz backend"""
+    g_authz_registry[type_name] = factory
 
 class PhantomConfig(object):
     def __init__(self, CFG):
         self._CFG = CFG
         self._logger = logging.getLogger("phantom")
 
-        if self._CFG.phantom.authz.type == "simple_file":
-            fname = self._CFG.phantom.authz.filename
-            self._authz = SimpleFileDataStore(fname)
-        elif self._CFG.phantom.authz.type == "cumulus":
-            from pyhantom.authz.cumulus_sqlalch import CumulusDataStore
-            dburl = self._CFG.phantom.authz.dburl
-            self._authz = CumulusDataStore(dburl)
-        elif self._CFG.phantom.authz.type == "sqldb":
-            self._authz_sessionmaker = SimpleSQLSessionMaker(CFG.phantom.authz.dburl)
-        else:
-            raise PhantomAWSException('InternalFailure', details="Phantom authz module is not setup.")
-
-        if self._CFG.phantom.system.type == "tester":
-            self._system = TestSystem()
-        elif self._CFG.phantom.system.type == "localdb":
-            self._system = SystemLocalDB(self._CFG, log=self._logger)
-        elif self._CFG.phantom.system.type == "epu_localdb":
-            self._system = EPUSystemWithLocalDB(self._CFG)
-        elif self._CFG.phantom.system.type == "epu":
-            self._system = EPUSystem(self._CFG)
-        else:
-            raise PhantomAWSException('InternalFailure', details="Phantom authz module is not setup.")
-
         self.statsd_client = None
         try:
             if self._CFG.statsd is not None:
@@ -56,6 +100,34 @@ class PhantomConfig(object):
         except:
             self._logger.exception("Failed to set up statsd client")
 
+        reply_max_size = getattr(self._CFG.phantom, 'log_reply_max_size', DEFAULT_REPLY_LOG_MAX_SIZE)
+        reply_sample_rate = getattr(self._CFG.phantom, 'log_reply_sample_rate', DEFAULT_REPLY_LOG_SAMPLE_RATE)
+        configure_reply_logging(max_size=reply_max_size, sample_rate=reply_sample_rate)
+
+        # a cache_ttl of 0 turns off the credential cache
+        authz_cfg = self._CFG.phantom.authz
+        self._authz_cache = None
+        self._authz_cache_negative_ttl = getattr(authz_cfg, 'cache_negative_ttl', DEFAULT_AUTHZ_CACHE_NEGATIVE_TTL)
+        cache_ttl = getattr(authz_cfg, 'cache_ttl', DEFAULT_AUTHZ_CACHE_TTL)
+        if cache_ttl > 0:
+            max_entries = getattr(authz_cfg, 'cache_max_entries', DEFAULT_AUTHZ_CACHE_MAX_ENTRIES)
+            self._authz_cache = TTLCache(max_entries=max_entries, ttl=cache_ttl)
+
+        authz_factory = g_authz_registry.get(self._CFG.phantom.authz.type)
+        if authz_factory is None:
+            raise PhantomAWSException('InternalFailure', details="Phantom authz module is not setup.")
+        self._authz = self._wrap_authz(authz_factory(self))
+
+        system_factory = g_system_registry.get(self._CFG.phantom.system.type)
+        if system_factory is None:
+            raise PhantomAWSException('InternalFailure', details="Phantom system module is not setup.")
+        self._system = system_factory(self)
+
+    def _wrap_authz(self, authz):
+        if self._authz_cache is None:
+            return authz
+        return CachedAuthz(authz, self._authz_cache, negative_ttl=self._authz_cache_negative_ttl, statsd_client=self.statsd_client)
+
     def get_system(self):
         return self._system
 
@@ -63,10 +135,7 @@ class PhantomConfig(object):
         return self._logger
 
     def get_authz(self):
-        if self._authz_sessionmaker is not None:
-            return SimpleSQL(self._authz_sessionmaker)
-        else:
-            return self._authz
+        return self._authz
 
 
 def determine_path():
@@ -98,6 +167,8 @@ def build_cfg():
         if os.path.exists(c):
             config_files.append(c)
 
+    # dashi is only needed here, to read the configuration files
+    import dashi.bootstrap
     CFG = dashi.bootstrap.configure(config_files=config_files)
     validate_config(CFG)
     return PhantomConfig(CFG)
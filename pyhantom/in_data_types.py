@@ -1,184 +1,227 @@
+import re
 from pyhantom.phantom_exceptions import PhantomAWSException
 from pyhantom.util import phantom_is_primative
 
+# the part of a list parameter after its name: member.<n> or member.<n>.<field>
+_MEMBER_RE = re.compile(r'member\.(\d+)(?:\.(.+))?$')
+# the highest member index a list parameter may use
+MAX_LIST_MEMBERS = 1000
 
-class ObjectFromReqInput(object):
 
-    def __init__(self):
-        self.optional_param_list_keys = {}
-        self.needed_param_list_keys = {}
-        self.optional_param_keys = {}
-        self.needed_param_keys = {}
-
-    def _get_value(self, name, in_val, t):
-        if t == str:
-            val= in_val
-        elif t == int:
-            val = int(in_val)
-        elif t == None:
-            # means to skip it (not implemented yet)
-            val = None
-        elif t == bool:
-            if in_val.lower() == 'true':
-                val = True
+def _to_bool(in_val):
+    return in_val.lower() == 'true'
+
+def _to_self(in_val):
+    return in_val
+
+def _get_converter(t):
+    if t == str:
+        return _to_self
+    if t == bool:
+        return _to_bool
+    return t
+
+
+class _RequestParser(object):
+    """Everything set_from_dict needs to know about one ObjectFromReqInput
+    class, worked out once.  parse() makes a single pass over the request
+    params."""
+
+    def __init__(self, cls):
+        # name -> converter, None for the names that are skipped
+        self.scalars = {}
+        for keys in (cls.optional_param_keys, cls.needed_param_keys):
+            for (name, t) in keys.items():
+                if phantom_is_primative(t):
+                    self.scalars[name] = _get_converter(t)
+                else:
+                    self.scalars[name] = None
+        self.needed_scalars = cls.needed_param_keys.keys()
+        # name -> (element class or None for a list of values, converter or element parser)
+        self.lists = {}
+        for keys in (cls.optional_param_list_keys, cls.needed_param_list_keys):
+            for (name, t) in keys.items():
+                if phantom_is_primative(t):
+                    self.lists[name] = (None, _get_converter(t))
+                else:
+                    self.lists[name] = (t, t._get_parser())
+        self.needed_lists = cls.needed_param_list_keys.keys()
+        # request key -> attribute name, for keys that are not plain names
+        self.key_names = cls.param_key_names
+
+    def _convert(self, name, converter, in_val):
+        try:
+            return converter(in_val)
+        except ValueError:
+            raise PhantomAWSException('InvalidParameterValue', details="%s is not a valid value for %s" % (in_val, name))
+
+    def set_field(self, obj, name, in_val):
+        """Set one field of an element of a list parameter"""
+        name = self.key_names.get(name, name)
+        if name not in self.scalars:
+            if name in self.lists:
+                raise PhantomAWSException('InvalidParameterValue', details="We cannot work with the type of %s yet" % (name))
+            raise PhantomAWSException('InvalidParameterValue', details="%s is not a known value name" % (name))
+        converter = self.scalars[name]
+        if converter is None:
+            raise PhantomAWSException('InvalidParameterValue', details="We cannot work with the type of %s yet" % (name))
+        obj.__dict__[name] = self._convert(name, converter, in_val)
+
+    def check_needed(self, obj, prefix):
+        """Make sure an element of a list parameter got all of its needed fields"""
+        for name in self.needed_scalars:
+            if name not in obj.__dict__:
+                raise PhantomAWSException('MissingParameter', details="parameter %s%s missing" % (prefix, name))
+
+    def parse(self, obj, params):
+        values = {}
+        # list name -> {member index: value or element}
+        members = {}
+        for (p, in_val) in params.items():
+            p = self.key_names.get(p, p)
+            if p in self.scalars:
+                values[p] = in_val
+                continue
+            ndx = p.find('.')
+            if ndx < 0:
+                continue
+            list_name = p[:ndx]
+            if list_name not in self.lists:
+                continue
+            m = _MEMBER_RE.match(p, ndx + 1)
+            if m is None:
+                raise PhantomAWSException('InvalidParameterValue', details="%s is not a valid list parameter" % (p))
+            (element_cls, converter) = self.lists[list_name]
+            member_ndx = int(m.group(1))
+            if member_ndx > MAX_LIST_MEMBERS:
+                raise PhantomAWSException('InvalidParameterValue', details="%s has more than %d members" % (list_name, MAX_LIST_MEMBERS))
+            list_members = members.setdefault(list_name, {})
+            if element_cls is None:
+                list_members[member_ndx] = in_val
             else:
-                val = False
-        else:
-            o = t()
-            val = o.set_from_dict(in_val)
-        return val
+                element = list_members.get(member_ndx)
+                if element is None:
+                    element = element_cls()
+                    list_members[member_ndx] = element
+                if m.group(2) is not None:
+                    converter.set_field(element, m.group(2), in_val)
+
+        for p in self.needed_scalars:
+            if p not in values:
+                raise PhantomAWSException('MissingParameter', details="parameter %s missing" % (p))
+        for pl in self.needed_lists:
+            if pl not in members:
+                raise PhantomAWSException('MissingParameter', details="parameter %s missing" % (pl))
+
+        for (p, in_val) in values.items():
+            converter = self.scalars[p]
+            if converter is None:
+                # means to skip it (not implemented yet)
+                continue
+            obj.__dict__[p] = self._convert(p, converter, in_val)
+
+        for (pl, list_members) in members.items():
+            (element_cls, converter) = self.lists[pl]
+            if element_cls is None:
+                l = []
+                for member_ndx in sorted(list_members.keys()):
+                    val = self._convert(pl, converter, list_members[member_ndx])
+                    if val:
+                        l.append(val)
+                if l:
+                    obj.__dict__[pl] = l
+            else:
+                # members are numbered from 1, any that were skipped are left empty
+                l = []
+                for i in range(1, max(list_members.keys()) + 1):
+                    element = list_members.get(i)
+                    if element is None:
+                        element = element_cls()
+                    converter.check_needed(element, "%s.member.%d." % (pl, i))
+                    l.append(element)
+                obj.__dict__[pl] = l
+
+
+class ObjectFromReqInput(object):
+    """Subclasses name the parameters they take in the four class level
+    dicts below, mapping each name to its type.  A list parameter comes in
+    as <name>.member.<n> for a list of values, or <name>.member.<n>.<field>
+    when its type is another ObjectFromReqInput.  A key that is not a plain
+    name, like Ebs.SnapshotId, is listed under its attribute name and
+    mapped to it in param_key_names."""
+
+    param_key_names = {}
+    optional_param_list_keys = {}
+    needed_param_list_keys = {}
+    optional_param_keys = {}
+    needed_param_keys = {}
+
+    @classmethod
+    def _get_parser(cls):
+        # built the first time each class is used, never shared with a subclass
+        parser = cls.__dict__.get('_parser')
+        if parser is None:
+            parser = _RequestParser(cls)
+            cls._parser = parser
+        return parser
 
     def __getattr__(self, item):
-        if item in self.optional_param_keys.keys():
+        if item in self.optional_param_keys:
             return None
-        elif item in self.optional_param_list_keys.keys():
+        elif item in self.optional_param_list_keys:
             return None
-        raise AttributeError()
-
-    def _do_list_param(self, params, p, type_d):
-        for pl in type_d.keys():
-            ndx = p.find(pl)
-            if ndx == 0:
-                if phantom_is_primative(type_d[pl]):
-                    val = self._get_value(p, params[p], type_d[pl])
-                    if val:
-                        if pl not in self.__dict__:
-                            self.__dict__[pl] = []
-                        self.__dict__[pl].append(val)
-                else:
-                    if pl not in self.__dict__:
-                        self.__dict__[pl] = []
-                    l = self.__dict__[pl]
-                    member_info = p.split('.', 3)
-                    member_ndx = int(member_info[2])
-                    for i in range(len(l), int(member_ndx)):
-                        l.append(type_d[pl]())
-
-                    element = l[member_ndx-1]
-                    value_name = member_info[3]
-                    element.set_value(value_name, params[p])
+        raise AttributeError(item)
 
     def set_value(self, name, value):
-        if name in self.optional_param_keys:
-            t = self.optional_param_keys[name]
-        elif name in self.needed_param_keys:
-            t = self.needed_param_keys[name]
-        elif name in self.optional_param_list_keys:
-            raise PhantomAWSException("We cannot work with this type yet")
-        elif name in self.needed_param_list_keys:
-            raise PhantomAWSException("We cannot work with this type yet")
-        else:
-            raise PhantomAWSException("%s is not a known value name" % (name))
-
-        if not phantom_is_primative(t):
-            raise PhantomAWSException("We cannot work with this type yet")
-        self.__setattr__(name, t(value))
+        self._get_parser().set_field(self, name, value)
 
     def set_from_dict(self, params):
-
-        for p in self.needed_param_keys.keys():
-            if p not in params:
-                raise PhantomAWSException('MissingParameter', details="parameter %s missing" % (p))
-
-        for pl in self.needed_param_list_keys.keys():
-            found = False
-            for p in params:
-                ndx = p.find(pl)
-                if ndx == 0:
-                    found = True
-            if not found:
-                raise PhantomAWSException('MissingParameter', details="parameter %s missing" % (pl))
-
-        for p in params:
-            self._do_list_param(params, p, self.needed_param_list_keys)
-            self._do_list_param(params, p, self.optional_param_list_keys)
-
-        # setup the needed ones
-        for p in self.needed_param_keys:
-            if p in params:
-                val = self._get_value(p, params[p], self.needed_param_keys[p])
-                if val is not None:
-                    self.__dict__[p] = val
-        # setup the optional ones
-        for p in self.optional_param_keys:
-            if p in params:
-                val = self._get_value(p, params[p], self.optional_param_keys[p])
-                if val is not None:
-                    self.__dict__[p] = val
+        self._get_parser().parse(self, params)
 
 class BlockDeviceMappingInput(ObjectFromReqInput):
-    def __init__(self):
-        ObjectFromReqInput.__init__(self)
-        self.optional_param_keys = {"DeviceName": str,  "VirtualName": str}
+    param_key_names = {"Ebs.SnapshotId": "EbsSnapshotId", "Ebs.VolumeSize": "EbsVolumeSize"}
+    optional_param_keys = {"DeviceName": str,  "VirtualName": str, "EbsSnapshotId": str, "EbsVolumeSize": int}
 
 class TagsInput(ObjectFromReqInput):
-    def __init__(self):
-        ObjectFromReqInput.__init__(self)
-        self.needed_param_keys = {"Key": str,  "PropagateAtLaunch": bool, "ResourceId": str, "ResourceType": str, "Value": str}
+    needed_param_keys = {"Key": str,  "PropagateAtLaunch": bool, "ResourceId": str, "ResourceType": str, "Value": str}
 
 class LaunchConfigurationInput(ObjectFromReqInput):
-    def __init__(self):
-        ObjectFromReqInput.__init__(self)
-        self.optional_param_list_keys = {"BlockDeviceMappings": BlockDeviceMappingInput, "SecurityGroups": str}
-        self.optional_param_keys = {"InstanceMonitoring": None,  "KernelId": str, "KeyName": str, "RamdiskId": str,  "UserData": str}
-        self.needed_param_keys = {"ImageId": str, "InstanceType": str, "LaunchConfigurationName": str,}
+    optional_param_list_keys = {"BlockDeviceMappings": BlockDeviceMappingInput, "SecurityGroups": str}
+    optional_param_keys = {"InstanceMonitoring": None,  "KernelId": str, "KeyName": str, "RamdiskId": str,  "UserData": str}
+    needed_param_keys = {"ImageId": str, "InstanceType": str, "LaunchConfigurationName": str,}
 
 class DeleteLaunchConfigurationInput(ObjectFromReqInput):
-    def __init__(self):
-        ObjectFromReqInput.__init__(self)
-        self.needed_param_keys = {"LaunchConfigurationName": str}
+    needed_param_keys = {"LaunchConfigurationName": str}
 
 class DescribeLaunchConfigurationsInput(ObjectFromReqInput):
-    def __init__(self):
-        ObjectFromReqInput.__init__(self)
-        self.optional_param_keys = {"MaxRecords": int, "NextToken": str}
-        self.optional_param_list_keys = {"LaunchConfigurationNames": str}
+    optional_param_keys = {"MaxRecords": int, "NextToken": str}
+    optional_param_list_keys = {"LaunchConfigurationNames": str}
 
 class CreateAutoScalingGroupInput(ObjectFromReqInput):
-    def __init__(self):
-        ObjectFromReqInput.__init__(self)
-
-        self.needed_param_list_keys = {'AvailabilityZones': str}
-        self.optional_param_list_keys = {"Tags": TagsInput, "LoadBalancerNames": str}
-        self.optional_param_keys = {"DefaultCooldown": int,  "DesiredCapacity": int, "HealthCheckGracePeriod": int, "HealthCheckType": str,  "PlacementGroup": str, "VPCZoneIdentifier": str}
-        self.needed_param_keys = {"AutoScalingGroupName": str, "LaunchConfigurationName": str, "MaxSize": int, "MinSize": int}
+    needed_param_list_keys = {'AvailabilityZones': str}
+    optional_param_list_keys = {"Tags": TagsInput, "LoadBalancerNames": str}
+    optional_param_keys = {"DefaultCooldown": int,  "DesiredCapacity": int, "HealthCheckGracePeriod": int, "HealthCheckType": str,  "PlacementGroup": str, "VPCZoneIdentifier": str}
+    needed_param_keys = {"AutoScalingGroupName": str, "LaunchConfigurationName": str, "MaxSize": int, "MinSize": int}
 
 class CreateOrUpdateTagsInput(ObjectFromReqInput):
-    def __init__(self):
-        ObjectFromReqInput.__init__(self)
-        self.needed_param_list_keys = {"Tags": TagsInput,}
+    needed_param_list_keys = {"Tags": TagsInput,}
 
 class DeleteAutoScalingGroupInput(ObjectFromReqInput):
-    def __init__(self):
-        ObjectFromReqInput.__init__(self)
-
-        self.needed_param_keys = {"AutoScalingGroupName": str}
-        self.optional_param_keys = {"ForceDelete": bool}
+    needed_param_keys = {"AutoScalingGroupName": str}
+    optional_param_keys = {"ForceDelete": bool}
 
 class DescribeAutoScalingGroupInput(ObjectFromReqInput):
-    def __init__(self):
-        ObjectFromReqInput.__init__(self)
-
-        self.optional_param_keys = {"MaxRecords": int, 'NextToken': str}
-        self.optional_param_list_keys = {"AutoScalingGroupNames": str}
+    optional_param_keys = {"MaxRecords": int, 'NextToken': str}
+    optional_param_list_keys = {"AutoScalingGroupNames": str}
 
 class SetDesiredCapacityInput(ObjectFromReqInput):
-    def __init__(self):
-        ObjectFromReqInput.__init__(self)
-
-        self.optional_param_keys = {"HonorCooldown": bool}
-        self.needed_param_keys = {"AutoScalingGroupName": str, "DesiredCapacity": int}
+    optional_param_keys = {"HonorCooldown": bool}
+    needed_param_keys = {"AutoScalingGroupName": str, "DesiredCapacity": int}
 
 class DescribeAutoScalingInstancesInput(ObjectFromReqInput):
-    def __init__(self):
-        ObjectFromReqInput.__init__(self)
-
-        self.optional_param_keys = {"MaxRecords": int, 'NextToken': str}
-        self.optional_param_list_keys = {"InstanceIds": str}
+    optional_param_keys = {"MaxRecords": int, 'NextToken': str}
+    optional_param_list_keys = {"InstanceIds": str}
 
 class TerminateInstanceInAutoScalingGroupInput(ObjectFromReqInput):
-    def __init__(self):
-        ObjectFromReqInput.__init__(self)
-
-        self.needed_param_keys = {"InstanceId": str, "ShouldDecrementDesiredCapacity": bool}
+    needed_param_keys = {"InstanceId": str, "ShouldDecrementDesiredCapacity": bool}
 
@@ -6,7 +6,7 @@ import webob
 import webob.dec
 import webob.exc
 from pyhantom.phantom_exceptions import PhantomAWSException
-from pyhantom.util import authenticate_user, CatchErrorDecorator, LogEntryDecorator, log, get_aws_access_key
+from pyhantom.util import CatchErrorDecorator, LogEntryDecorator, log
 from pyhantom.wsgiapps import PhantomBaseService
 from pyhantom.wsgiapps.auto_scaling_group import CreateAutoScalingGroup, DeleteAutoScalingGroup, DescribeAutoScalingGroup, SetDesiredCapacity, CreateOrUpdateTags
 from pyhantom.wsgiapps.instances import DescribeAutoScalingInstances, TerminateInstanceInAutoScalingGroup
@@ -33,8 +33,12 @@ class Request(webob.Request):
 
 class MainRouter(PhantomBaseService):
 
-    def __init__(self):
-        PhantomBaseService.__init__(self, "MainRouter")
+    def __init__(self, cfg=None):
+        PhantomBaseService.__init__(self, "MainRouter", cfg=cfg)
+        # the action applications keep no per request state, one of each serves every request
+        self._applications = {}
+        for (action, app_cls) in _action_to_application_map.items():
+            self._applications[action] = app_cls(action, cfg=self._cfg)
 
     @webob.dec.wsgify(RequestClass=Request)
     @CatchErrorDecorator(appname="MainRouter")
@@ -44,28 +48,23 @@ class MainRouter(PhantomBaseService):
         user_obj = None
         request_id = str(uuid.uuid4())
         try:
-            log(logging.INFO, "%s Enter main router | %s" % (request_id, str(req.params)))
-            authz = self._cfg.get_authz()
-
-            access_dict = get_aws_access_key(req)
-            user_obj = authz.get_user_object_by_access_id(access_dict['AWSAccessKeyId'])
-            authenticate_user(user_obj.secret_key, req, access_dict)
+            log(logging.INFO, "%s Enter main router | %s", request_id, req.params)
+            # authenticate once here, the action applications pick the user up from the request context
+            ctx = self.authenticate_request(req, request_id)
+            user_obj = ctx.user_obj
             key = 'Action'
             if key not in req.params.keys():
                 raise PhantomAWSException('InvalidParameterValue')
             action = req.params['Action']
 
-            global _action_to_application_map
-            if action not in _action_to_application_map:
+            if action not in self._applications:
                 raise webob.exc.HTTPNotFound("No action %s" % action)
 
-            app_cls = _action_to_application_map[action]
-
-            log(logging.INFO, "%s Getting phantom action %s" % (request_id, action))
+            log(logging.INFO, "%s Getting phantom action %s", request_id, action)
 
-            app = app_cls(action, cfg=self._cfg)
+            app = self._applications[action]
         except Exception, ex:
-            log(logging.ERROR, "%s Exiting main router with error %s" % (request_id, str(ex)))
+            log(logging.ERROR, "%s Exiting main router with error %s", request_id, ex)
             raise
         finally:
             #if user_obj:
@@ -76,7 +75,7 @@ class MainRouter(PhantomBaseService):
                 self._cfg.statsd_client.timing('autoscale.MainRouter.timing', (after - before) * 1000)
             pass
 
-        log(logging.INFO, "%s Exiting main router" % (request_id))
+        log(logging.INFO, "%s Exiting main router", request_id)
 
         return app
 
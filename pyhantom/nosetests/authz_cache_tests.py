@@ -0,0 +1,190 @@
+import os
+import tempfile
+import threading
+import time
+import unittest
+import uuid
+from pyhantom.authz import PHAuthzIface, PhantomUserObject
+from pyhantom.authz.cached import CachedAuthz
+from pyhantom.authz.simple_sql_db import SimpleSQL, SimpleSQLSessionMaker
+from pyhantom.cache import TTLCache
+from pyhantom.nosetests.fake_epu import FakeClock, FakeStatsd
+from pyhantom.phantom_exceptions import PhantomAWSException, PhantomNotImplementedException
+
+
+class CountingAuthz(PHAuthzIface):
+
+    def __init__(self, users):
+        self.users = users
+        self.lookup_count = 0
+
+    def get_user_object_by_access_id(self, access_id):
+        self.lookup_count = self.lookup_count + 1
+        if access_id not in self.users:
+            raise PhantomAWSException('InvalidClientTokenId')
+        return PhantomUserObject(access_id, self.users[access_id], "tester")
+
+
+class TTLCacheTests(unittest.TestCase):
+
+    def test_expire(self):
+        clock = FakeClock()
+        cache = TTLCache(max_entries=10, ttl=5, clock=clock)
+        cache.put("a", 1)
+        self.assertEqual(cache.get("a"), 1)
+        clock.now = clock.now + 6
+        self.assertEqual(cache.get("a"), None)
+
+    def test_lru_eviction(self):
+        cache = TTLCache(max_entries=2, ttl=60)
+        cache.put("a", 1)
+        cache.put("b", 2)
+        cache.get("a")
+        cache.put("c", 3)
+        self.assertEqual(cache.get("a"), 1)
+        self.assertEqual(cache.get("b"), None)
+        self.assertEqual(cache.get("c"), 3)
+        self.assertEqual(len(cache), 2)
+
+    def test_counters(self):
+        cache = TTLCache()
+        cache.get("a")
+        cache.put("a", 1)
+        cache.get("a")
+        self.assertEqual(cache.hits, 1)
+        self.assertEqual(cache.misses, 1)
+        self.assertEqual(cache.hit_ratio(), 0.5)
+
+    def test_get_or_load(self):
+        cache = TTLCache()
+        self.assertEqual(cache.get_or_load("a", lambda: 1), 1)
+        self.assertEqual(cache.get_or_load("a", lambda: 2), 1)
+
+    def test_get_or_load_single_flight(self):
+        cache = TTLCache()
+        loads = []
+        started = threading.Event()
+        release = threading.Event()
+
+        def load():
+            loads.append(1)
+            started.set()
+            release.wait()
+            return "value"
+
+        results = []
+        def worker():
+            results.append(cache.get_or_load("a", load))
+
+        threads = [threading.Thread(target=worker) for i in range(0, 5)]
+        threads[0].start()
+        started.wait()
+        for t in threads[1:]:
+            t.start()
+        time.sleep(0.1)
+        release.set()
+        for t in threads:
+            t.join()
+        self.assertEqual(len(loads), 1)
+        self.assertEqual(results, ["value"] * 5)
+
+    def test_get_or_load_error_not_cached(self):
+        cache = TTLCache()
+
+        def load():
+            raise PhantomAWSException('InternalFailure')
+
+        self.assertRaises(PhantomAWSException, cache.get_or_load, "a", load)
+        self.assertEqual(cache.get_or_load("a", lambda: 1), 1)
+
+    def test_invalidate_during_load(self):
+        cache = TTLCache()
+
+        def load():
+            cache.invalidate("a")
+            return "stale"
+
+        self.assertEqual(cache.get_or_load("a", load), "stale")
+        self.assertEqual(cache.get("a"), None)
+
+
+class CachedAuthzTests(unittest.TestCase):
+
+    def setUp(self):
+        self.clock = FakeClock()
+        self.backend = CountingAuthz({"key": "secret"})
+        self.statsd = FakeStatsd()
+        cache = TTLCache(max_entries=10, ttl=30, clock=self.clock)
+        self.authz = CachedAuthz(self.backend, cache, negative_ttl=5, statsd_client=self.statsd)
+
+    def test_hit(self):
+        for i in range(0, 5):
+            user_obj = self.authz.get_user_object_by_access_id("key")
+            self.assertEqual(user_obj.secret_key, "secret")
+        self.assertEqual(self.backend.lookup_count, 1)
+        self.assertEqual(self.statsd.counts['autoscale.authz.cache.hit'], 4)
+        self.assertEqual(self.statsd.counts['autoscale.authz.cache.miss'], 1)
+
+    def test_ttl(self):
+        self.authz.get_user_object_by_access_id("key")
+        self.clock.now = self.clock.now + 31
+        self.authz.get_user_object_by_access_id("key")
+        self.assertEqual(self.backend.lookup_count, 2)
+
+    def test_remove_not_supported(self):
+        self.authz.get_user_object_by_access_id("key")
+        self.assertRaises(PhantomNotImplementedException, self.authz.remove_user, "key")
+        # the cached entry is dropped all the same
+        self.authz.get_user_object_by_access_id("key")
+        self.assertEqual(self.backend.lookup_count, 2)
+
+    def test_negative(self):
+        for i in range(0, 3):
+            try:
+                self.authz.get_user_object_by_access_id("nokey")
+                self.fail("should have thrown an exception")
+            except PhantomAWSException, pae:
+                self.assertEqual(pae.title, 'InvalidClientTokenId')
+        self.assertEqual(self.backend.lookup_count, 1)
+
+        self.backend.users["nokey"] = "secret2"
+        self.clock.now = self.clock.now + 6
+        user_obj = self.authz.get_user_object_by_access_id("nokey")
+        self.assertEqual(user_obj.secret_key, "secret2")
+
+
+class SimpleSQLInvalidationTests(unittest.TestCase):
+
+    def setUp(self):
+        (osf, self.db_fname) = tempfile.mkstemp(prefix="/tmp/phantom")
+        os.close(osf)
+        self.sessionmaker = SimpleSQLSessionMaker("sqlite:///%s" % (self.db_fname))
+        self.cache = TTLCache()
+
+    def tearDown(self):
+        os.remove(self.db_fname)
+
+    def _get_authz(self):
+        return CachedAuthz(SimpleSQL(self.sessionmaker, cache=self.cache), self.cache)
+
+    def test_add_remove(self):
+        access_key = str(uuid.uuid4()).split('-')[0]
+        self._get_authz().add_user("tester", access_key, "secret")
+        user_obj = self._get_authz().get_user_object_by_access_id(access_key)
+        self.assertEqual(user_obj.secret_key, "secret")
+
+        # alter the secret straight through SimpleSQL, the cache must not hand back the old one
+        SimpleSQL(self.sessionmaker, cache=self.cache).add_user("tester", access_key, "secret2")
+        user_obj = self._get_authz().get_user_object_by_access_id(access_key)
+        self.assertEqual(user_obj.secret_key, "secret2")
+
+        SimpleSQL(self.sessionmaker, cache=self.cache).remove_user(access_key)
+        try:
+            self._get_authz().get_user_object_by_access_id(access_key)
+            self.fail("should have thrown an exception")
+        except PhantomAWSException:
+            pass
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,76 @@
+import os
+import tempfile
+import unittest
+import pyhantom.config
+import pyhantom.system.epu.dashi_pool
+from pyhantom.authz.simple_file import SimpleFileDataStore
+from pyhantom.config import PhantomConfig, register_system, g_system_registry
+from pyhantom.nosetests.fake_epu import FakeSection, FakeStatsd
+from pyhantom.phantom_exceptions import PhantomAWSException
+from pyhantom.system.tester import TestSystem
+
+
+class FakeDashiCeiConnection(object):
+    """Answers the calls EPUSystem makes while it starts up"""
+
+    def __init__(self, *args, **kwargs):
+        pass
+
+    def call(self, service, operation, **kwargs):
+        if operation.startswith('list'):
+            return []
+        return None
+
+    def disconnect(self):
+        pass
+
+
+class BackendRegistryTests(unittest.TestCase):
+
+    def setUp(self):
+        (osf, self.pwfile) = tempfile.mkstemp(prefix="/tmp/phantom")
+        os.close(osf)
+        self._stats_client_class = pyhantom.config.StatsClient
+        self._connection_class = pyhantom.system.epu.dashi_pool.DashiCeiConnection
+
+    def tearDown(self):
+        os.remove(self.pwfile)
+        g_system_registry.pop('custom', None)
+        pyhantom.config.StatsClient = self._stats_client_class
+        pyhantom.system.epu.dashi_pool.DashiCeiConnection = self._connection_class
+
+    def _make_cfg(self, system_type, authz_type="simple_file"):
+        authz = FakeSection(type=authz_type, filename=self.pwfile, cache_ttl=0)
+        return FakeSection(phantom=FakeSection(system=FakeSection(type=system_type), authz=authz))
+
+    def test_tester(self):
+        cfg = PhantomConfig(self._make_cfg("tester"))
+        self.assertTrue(isinstance(cfg.get_system(), TestSystem))
+        self.assertTrue(isinstance(cfg.get_authz(), SimpleFileDataStore))
+
+    def test_unknown_types(self):
+        self.assertRaises(PhantomAWSException, PhantomConfig, self._make_cfg("nosuch"))
+        self.assertRaises(PhantomAWSException, PhantomConfig, self._make_cfg("tester", authz_type="nosuch"))
+
+    def test_register(self):
+        system = object()
+        register_system('custom', lambda phantom_cfg: system)
+        cfg = PhantomConfig(self._make_cfg("custom"))
+        self.assertTrue(cfg.get_system() is system)
+
+    def test_epu_system_gets_statsd_client(self):
+        pyhantom.config.StatsClient = FakeStatsd
+        pyhantom.system.epu.dashi_pool.DashiCeiConnection = FakeDashiCeiConnection
+        cfg = self._make_cfg("epu")
+        cfg.phantom.system = FakeSection(type="epu", rabbit="localhost", rabbit_user="guest", rabbit_pw="guest",
+                                         rabbit_exchange="default_dashi_exchange", rabbit_port=5672,
+                                         rabbit_ssl=False, dashi_pool_size=1)
+        cfg.statsd = {"host": "localhost", "port": 8125}
+        phantom_cfg = PhantomConfig(cfg)
+        self.assertTrue(isinstance(phantom_cfg.statsd_client, FakeStatsd))
+        # starting up lists the domain definitions over the pool
+        self.assertEqual(phantom_cfg.statsd_client.gauges['autoscale.dashi.pool.0.in_flight'], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,140 @@
+import socket
+import threading
+import time
+import unittest
+from ceiclient.exception import CeiClientError
+from dashi import DashiError
+from pyhantom.nosetests.fake_epu import FakeClock, FakeStatsd
+from pyhantom.phantom_exceptions import PhantomAWSException
+from pyhantom.system.epu.dashi_pool import DashiConnectionPool
+
+
+class FakeConnection(object):
+
+    def __init__(self, delay=0):
+        self.delay = delay
+        self.calls = []
+        self.fail_with = None
+        self.disconnected = False
+
+    def call(self, service, operation, **kwargs):
+        self.calls.append((service, operation, kwargs))
+        if self.delay:
+            time.sleep(self.delay)
+        if self.fail_with is not None:
+            raise self.fail_with
+        return (service, operation)
+
+    def disconnect(self):
+        self.disconnected = True
+
+
+class ConnectionFactory(object):
+
+    def __init__(self, delay=0):
+        self.delay = delay
+        self.made = []
+        self.fail = False
+
+    def __call__(self):
+        if self.fail:
+            raise socket.error("connection refused")
+        conn = FakeConnection(self.delay)
+        self.made.append(conn)
+        return conn
+
+
+class DashiConnectionPoolTests(unittest.TestCase):
+
+    def setUp(self):
+        self.clock = FakeClock()
+        self.statsd = FakeStatsd()
+        self.factory = ConnectionFactory()
+
+    def _pool(self, **kwargs):
+        kwargs.setdefault('statsd_client', self.statsd)
+        kwargs.setdefault('clock', self.clock)
+        return DashiConnectionPool(self.factory, **kwargs)
+
+    def test_lazy_and_reused(self):
+        pool = self._pool(size=4)
+        self.assertEqual(len(self.factory.made), 0)
+        for i in range(0, 5):
+            self.assertEqual(pool.call("epu_management_service", "list_domains", caller="user1"), ("epu_management_service", "list_domains"))
+        self.assertEqual(len(self.factory.made), 1)
+        self.assertEqual(self.factory.made[0].calls[0][2], {'caller': 'user1'})
+        self.assertEqual(self.statsd.gauges['autoscale.dashi.pool.0.in_flight'], 0)
+
+    def test_concurrent_calls_use_separate_connections(self):
+        self.factory.delay = 0.2
+        pool = DashiConnectionPool(self.factory, size=4, statsd_client=self.statsd)
+        threads = [threading.Thread(target=pool.call, args=("svc", "op")) for i in range(0, 4)]
+        before = time.time()
+        for t in threads:
+            t.start()
+        time.sleep(0.1)
+        self.assertEqual(pool.in_flight(), [1, 1, 1, 1])
+        for t in threads:
+            t.join()
+        self.assertTrue(time.time() - before < 0.6)
+        self.assertEqual(len(self.factory.made), 4)
+        self.assertEqual(pool.in_flight(), [0, 0, 0, 0])
+
+    def test_connection_error_replaces(self):
+        pool = self._pool(size=1)
+        pool.call("svc", "op")
+        self.factory.made[0].fail_with = CeiClientError("broken pipe")
+        self.assertRaises(CeiClientError, pool.call, "svc", "op")
+        self.assertTrue(self.factory.made[0].disconnected)
+        pool.call("svc", "op")
+        self.assertEqual(len(self.factory.made), 2)
+
+    def test_service_error_keeps_connection(self):
+        pool = self._pool(size=1)
+        pool.call("svc", "op")
+        self.factory.made[0].fail_with = DashiError("NotFoundError", exc_type=u'NotFoundError')
+        self.assertRaises(DashiError, pool.call, "svc", "op")
+        self.assertFalse(self.factory.made[0].disconnected)
+        self.assertEqual(len(self.factory.made), 1)
+
+    def test_reconnect_backoff(self):
+        pool = self._pool(size=1, backoff=1, max_backoff=3, wait=0)
+        self.factory.fail = True
+        for expected in [1, 2, 3, 3]:
+            try:
+                pool.call("svc", "op")
+                self.fail("should have thrown an exception")
+            except PhantomAWSException, pae:
+                self.assertEqual(pae.title, 'ServiceUnavailable')
+            # still backing off, no attempt is made
+            self.assertRaises(PhantomAWSException, pool.call, "svc", "op")
+            self.clock.now = self.clock.now + expected
+        self.assertEqual(self.statsd.counts['autoscale.dashi.pool.connect_failure'], 4)
+
+        self.factory.fail = False
+        pool.call("svc", "op")
+        self.assertEqual(len(self.factory.made), 1)
+
+    def test_idle_connection_replaced(self):
+        pool = self._pool(size=1, max_idle=60)
+        pool.call("svc", "op")
+        self.clock.now = self.clock.now + 30
+        pool.call("svc", "op")
+        self.assertEqual(len(self.factory.made), 1)
+        self.clock.now = self.clock.now + 61
+        pool.call("svc", "op")
+        self.assertEqual(len(self.factory.made), 2)
+        self.assertTrue(self.factory.made[0].disconnected)
+
+    def test_wait_for_free_connection(self):
+        self.factory.delay = 0.5
+        pool = DashiConnectionPool(self.factory, size=1, wait=0.1)
+        t = threading.Thread(target=pool.call, args=("svc", "op"))
+        t.start()
+        time.sleep(0.1)
+        self.assertRaises(PhantomAWSException, pool.call, "svc", "op")
+        t.join()
+
+
+if __name__ == '__main__':
+    unittest.main()
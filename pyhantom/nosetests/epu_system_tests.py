@@ -0,0 +1,610 @@
+import datetime
+import threading
+import time
+import unittest
+from pyhantom.authz import PhantomUserObject
+from pyhantom.phantom_exceptions import PhantomAWSException
+from pyhantom.nosetests.fake_epu import FakeEPUMClient, FakeDTRSClient, FakeStatsd, make_cfg
+from pyhantom.system.epu.epu_client import EPUSystem
+from pyhantom.util import make_time
+from pyhantom.cache import TTLCache
+from pyhantom.system.epu.dt_cache import CachedDTRSClient
+from pyhantom.system.epu.rpc import AsyncRPC, DTRS_WRITE_METHODS
+from pyhantom.system.epu.read_model import DomainReadModel
+from dashi import DashiError
+from pyhantom.out_data_types import LaunchConfigurationType, DateTimeType, InstanceMonitoringType
+
+
+class EPUSystemTestBase(unittest.TestCase):
+
+    system_options = {}
+    epum_delay = 0
+
+    def setUp(self):
+        self.user_obj = PhantomUserObject("user1", "secret", "tester")
+        self.epum = FakeEPUMClient(delay=self.epum_delay)
+        self.dtrs = FakeDTRSClient()
+        self.statsd = FakeStatsd()
+        self.system = EPUSystem(make_cfg(**self.system_options), epum_client=self.epum, dtrs_client=self.dtrs,
+                                statsd_client=self.statsd)
+
+    def _add_domains(self, count, instances=0):
+        names = []
+        for i in range(0, count):
+            name = "asg%03d" % (i)
+            conf = {'engine_conf': {'minimum_vms': instances, 'maximum_vms': instances, 'dtname': 'dt'}}
+            self.epum.add_domain(name, "multi_site_n_preserving", conf, caller=self.user_obj.access_id)
+            for j in range(0, instances):
+                self.epum.add_instance(self.user_obj.access_id, name, "i-%s-%d" % (name, j))
+            names.append(name)
+        self.epum.reset_counts()
+        return names
+
+    def _add_launch_configs(self, dt_count, sites=("hotel", "sierra")):
+        names = []
+        for i in range(0, dt_count):
+            dt_name = "dt%03d" % (i)
+            dt_def = {'mappings': {}}
+            for site in sites:
+                dt_def['mappings'][site] = {'iaas_image': 'ami-1', 'iaas_allocation': 'm1.small',
+                    'LaunchConfigurationARN': 'arn', 'CreatedTime': make_time(datetime.datetime.utcnow())}
+                names.append("%s@%s" % (dt_name, site))
+            self.dtrs.add_dt(self.user_obj.access_id, dt_name, dt_def)
+        self.dtrs.reset_counts()
+        return names
+
+    def _page_all(self, func, attr, max, **kwargs):
+        found = []
+        token = None
+        while True:
+            (page, token) = func(self.user_obj, max=max, startToken=token, **kwargs)
+            self.assertTrue(page.get_length() <= max)
+            found.extend([getattr(item, attr) for item in page.type_list])
+            if token is None:
+                return found
+
+
+class DescribeGroupsTests(EPUSystemTestBase):
+
+    def test_names_only_describes_those(self):
+        names = self._add_domains(20)
+        (asgs, next_token) = self.system.get_autoscale_groups(self.user_obj, names=[names[3], names[7]])
+        self.assertEqual([a.AutoScalingGroupName for a in asgs.type_list], [names[3], names[7]])
+        self.assertEqual(self.epum.call_count('describe_domain'), 2)
+        self.assertEqual(self.epum.call_count('list_domains'), 1)
+
+    def test_max_before_describe(self):
+        self._add_domains(20)
+        (asgs, next_token) = self.system.get_autoscale_groups(self.user_obj, max=5)
+        self.assertEqual(asgs.get_length(), 5)
+        self.assertEqual(self.epum.call_count('describe_domain'), 5)
+
+    def test_all_in_order(self):
+        names = self._add_domains(20, instances=2)
+        (asgs, next_token) = self.system.get_autoscale_groups(self.user_obj)
+        self.assertEqual([a.AutoScalingGroupName for a in asgs.type_list], names)
+        for a in asgs.type_list:
+            self.assertEqual(a.Instances.get_length(), 2)
+
+
+class PaginationTests(EPUSystemTestBase):
+
+    # these count RPCs and change DTs and domains behind the system's back
+    system_options = {'dt_cache_ttl': 0, 'domain_cache_ttl': 0}
+
+    def test_groups_pages(self):
+        names = self._add_domains(23)
+        found = self._page_all(self.system.get_autoscale_groups, 'AutoScalingGroupName', 5)
+        self.assertEqual(found, names)
+        # 5 pages of describes, never the whole list
+        self.assertEqual(self.epum.call_count('describe_domain'), 23)
+
+    def test_groups_exact_page_has_no_token(self):
+        self._add_domains(5)
+        (asgs, next_token) = self.system.get_autoscale_groups(self.user_obj, max=5)
+        self.assertEqual(asgs.get_length(), 5)
+        self.assertEqual(next_token, None)
+
+    def test_groups_stable_with_changes(self):
+        names = self._add_domains(10)
+        (asgs, next_token) = self.system.get_autoscale_groups(self.user_obj, max=4)
+        self.assertEqual(next_token, names[4])
+
+        # remove the group the token points at and add one before and one after it
+        self.epum.remove_domain(names[4], caller=self.user_obj.access_id)
+        conf = {'engine_conf': {'minimum_vms': 0, 'maximum_vms': 0, 'dtname': 'dt'}}
+        self.epum.add_domain("asg000a", "multi_site_n_preserving", conf, caller=self.user_obj.access_id)
+        self.epum.add_domain("asg999", "multi_site_n_preserving", conf, caller=self.user_obj.access_id)
+
+        (asgs, next_token) = self.system.get_autoscale_groups(self.user_obj, max=4, startToken=next_token)
+        self.assertEqual([a.AutoScalingGroupName for a in asgs.type_list], names[5:9])
+        (asgs, next_token) = self.system.get_autoscale_groups(self.user_obj, max=4, startToken=next_token)
+        self.assertEqual([a.AutoScalingGroupName for a in asgs.type_list], [names[9], "asg999"])
+        self.assertEqual(next_token, None)
+
+    def test_launch_configs_pages(self):
+        names = self._add_launch_configs(7)
+        found = self._page_all(self.system.get_launch_configs, 'LaunchConfigurationName', 3)
+        self.assertEqual(found, names)
+
+    def test_launch_configs_bounded_describes(self):
+        names = self._add_launch_configs(50)
+        (lcs, next_token) = self.system.get_launch_configs(self.user_obj, max=4)
+        self.assertEqual([lc.LaunchConfigurationName for lc in lcs.type_list], names[:4])
+        self.assertEqual(next_token, names[4])
+        self.assertEqual(self.dtrs.call_count('describe_dt'), 3)
+
+        self.dtrs.reset_counts()
+        (lcs, next_token) = self.system.get_launch_configs(self.user_obj, max=4, startToken=names[5])
+        self.assertEqual([lc.LaunchConfigurationName for lc in lcs.type_list], names[5:9])
+        self.assertEqual(self.dtrs.call_count('describe_dt'), 3)
+
+    def test_launch_configs_names(self):
+        names = self._add_launch_configs(50)
+        (lcs, next_token) = self.system.get_launch_configs(self.user_obj, names=[names[20], names[41]])
+        self.assertEqual([lc.LaunchConfigurationName for lc in lcs.type_list], [names[20], names[41]])
+        self.assertEqual(self.dtrs.call_count('describe_dt'), 2)
+
+    def test_launch_configs_removed_dt(self):
+        names = self._add_launch_configs(6)
+        (lcs, next_token) = self.system.get_launch_configs(self.user_obj, max=2)
+        self.assertEqual(next_token, "dt001@hotel")
+        self.dtrs.remove_dt(self.user_obj.access_id, "dt001")
+        (lcs, next_token) = self.system.get_launch_configs(self.user_obj, max=2, startToken=next_token)
+        self.assertEqual([lc.LaunchConfigurationName for lc in lcs.type_list], ["dt002@hotel", "dt002@sierra"])
+
+    def test_instances_pages(self):
+        self._add_domains(4, instances=3)
+        (insts, next_token) = self.system.get_autoscale_instances(self.user_obj)
+        all_ids = [i.InstanceId for i in insts.type_list]
+        self.assertEqual(next_token, None)
+        found = self._page_all(self.system.get_autoscale_instances, 'InstanceId', 5)
+        self.assertEqual(found, all_ids)
+
+
+class DTCacheTests(EPUSystemTestBase):
+
+    def _make_lc(self, name):
+        lc = LaunchConfigurationType('LaunchConfiguration')
+        lc.LaunchConfigurationName = name
+        lc.ImageId = 'ami-2'
+        lc.InstanceType = 'm1.large'
+        lc.CreatedTime = DateTimeType('CreatedTime', datetime.datetime.utcnow())
+        lc.InstanceMonitoring = InstanceMonitoringType('InstanceMonitoring')
+        lc.InstanceMonitoring.Enabled = False
+        lc.UserData = None
+        lc.KernelId = None
+        lc.RamdiskId = None
+        lc.KeyName = None
+        lc.LaunchConfigurationARN = 'arn'
+        return lc
+
+    def test_repeat_describes_from_memory(self):
+        names = self._add_launch_configs(5)
+        for i in range(0, 3):
+            (lcs, next_token) = self.system.get_launch_configs(self.user_obj)
+            self.assertEqual([lc.LaunchConfigurationName for lc in lcs.type_list], names)
+        self.assertEqual(self.dtrs.call_count('list_dts'), 1)
+        self.assertEqual(self.dtrs.call_count('describe_dt'), 5)
+
+    def test_own_writes_seen(self):
+        names = self._add_launch_configs(2)
+        self.system.get_launch_configs(self.user_obj)
+
+        self.system.create_launch_config(self.user_obj, self._make_lc("dt000@foxtrot"))
+        self.system.create_launch_config(self.user_obj, self._make_lc("newdt@hotel"))
+        self.system.delete_launch_config(self.user_obj, names[2])
+        (lcs, next_token) = self.system.get_launch_configs(self.user_obj)
+        found = [lc.LaunchConfigurationName for lc in lcs.type_list]
+        self.assertEqual(found, ["dt000@foxtrot", "dt000@hotel", "dt000@sierra", "dt001@sierra", "newdt@hotel"])
+
+    def test_writes_read_dtrs(self):
+        self._add_launch_configs(1)
+        self.system.get_launch_configs(self.user_obj)
+        # another phantom adds a site to the cached DT
+        self.dtrs.dts[self.user_obj.access_id]["dt000"]['mappings']['foxtrot'] = {'iaas_image': 'ami-1'}
+
+        self.system.create_launch_config(self.user_obj, self._make_lc("dt000@india"))
+        self.assertEqual(sorted(self.dtrs.dts[self.user_obj.access_id]["dt000"]['mappings'].keys()),
+                         ["foxtrot", "hotel", "india", "sierra"])
+        self.system.delete_launch_config(self.user_obj, "dt000@hotel")
+        self.assertEqual(sorted(self.dtrs.dts[self.user_obj.access_id]["dt000"]['mappings'].keys()),
+                         ["foxtrot", "india", "sierra"])
+
+    def test_disabled(self):
+        self.system = EPUSystem(make_cfg(dt_cache_ttl=0), epum_client=self.epum, dtrs_client=self.dtrs)
+        self._add_launch_configs(3)
+        self.system.get_launch_configs(self.user_obj)
+        self.system.get_launch_configs(self.user_obj)
+        self.assertEqual(self.dtrs.call_count('list_dts'), 2)
+        self.assertEqual(self.dtrs.call_count('describe_dt'), 6)
+
+
+class DomainCacheTests(EPUSystemTestBase):
+
+    epum_delay = 0.02
+
+    def test_describe_actions_share_rpcs(self):
+        names = self._add_domains(5, instances=1)
+        self.system.get_autoscale_groups(self.user_obj)
+        self.system.get_autoscale_instances(self.user_obj)
+        self.system.terminate_instances(self.user_obj, "i-%s-0" % (names[2]), False)
+        self.assertEqual(self.epum.call_count('list_domains'), 1)
+        # terminate describes the domain it changes live
+        self.assertEqual(self.epum.call_count('describe_domain'), 6)
+        self.assertEqual(self.epum.call_count('reconfigure_domain'), 1)
+
+    def test_concurrent_requests_coalesce(self):
+        self._add_domains(5)
+        threads = [threading.Thread(target=self.system.get_autoscale_groups, args=(self.user_obj,)) for i in range(0, 4)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEqual(self.epum.call_count('list_domains'), 1)
+        self.assertEqual(self.epum.call_count('describe_domain'), 5)
+
+    def test_own_changes_seen(self):
+        names = self._add_domains(3, instances=1)
+        self.system.get_autoscale_groups(self.user_obj)
+        self.system.alter_autoscale_group(self.user_obj, names[1], {'desired_capacity': 4}, False)
+        self.system.delete_autoscale_group(self.user_obj, names[2], True)
+        (asgs, next_token) = self.system.get_autoscale_groups(self.user_obj)
+        self.assertEqual([a.AutoScalingGroupName for a in asgs.type_list], names[:2])
+        self.assertEqual(asgs.type_list[1].DesiredCapacity, 4)
+
+    def test_terminate_new_instance(self):
+        names = self._add_domains(3, instances=1)
+        self.system.get_autoscale_instances(self.user_obj)
+        # started after our descriptions were cached
+        self.epum.add_instance(self.user_obj.access_id, names[0], "i-new")
+        self.system.terminate_instances(self.user_obj, "i-new", False)
+        self.assertEqual(len(self.epum.domains[self.user_obj.access_id][names[0]]['instances']), 1)
+
+    def test_users_kept_apart(self):
+        self._add_domains(3)
+        self.system.get_autoscale_groups(self.user_obj)
+        other = PhantomUserObject("user2", "secret", "other")
+        (asgs, next_token) = self.system.get_autoscale_groups(other)
+        self.assertEqual(asgs.get_length(), 0)
+
+
+class ReadModelTests(EPUSystemTestBase):
+
+    # an hour between refreshes so that only our own writes wake the synchronizer
+    system_options = {'read_model': True, 'read_model_interval': 3600, 'domain_cache_ttl': 0}
+
+    def tearDown(self):
+        self.system._synchronizer.stop()
+
+    def test_describes_served_from_model(self):
+        names = self._add_domains(5, instances=1)
+        self.system.get_autoscale_groups(self.user_obj)
+        (asgs, next_token) = self.system.get_autoscale_groups(self.user_obj, max=2)
+        self.assertEqual([a.AutoScalingGroupName for a in asgs.type_list], names[:2])
+        self.assertEqual(next_token, names[2])
+        (instances, next_token) = self.system.get_autoscale_instances(self.user_obj)
+        self.assertEqual(instances.get_length(), 5)
+        self.assertEqual(self.epum.call_count('list_domains'), 1)
+        self.assertEqual(self.epum.call_count('describe_domain'), 5)
+        self.assertEqual(len(self.statsd.timings['autoscale.read_model.age']), 2)
+
+    def test_synchronizer_picks_up_changes(self):
+        names = self._add_domains(2)
+        self.system.get_autoscale_groups(self.user_obj)
+        # changed behind our back, not seen until the next refresh
+        self.epum.remove_domain(names[0], caller=self.user_obj.access_id)
+        (asgs, next_token) = self.system.get_autoscale_groups(self.user_obj)
+        self.assertEqual(asgs.get_length(), 2)
+        self.system._synchronizer.sync_once()
+        (asgs, next_token) = self.system.get_autoscale_groups(self.user_obj)
+        self.assertEqual([a.AutoScalingGroupName for a in asgs.type_list], names[1:])
+
+    def test_own_changes_seen(self):
+        names = self._add_domains(3, instances=1)
+        self.system.get_autoscale_groups(self.user_obj)
+        self.system.alter_autoscale_group(self.user_obj, names[1], {'desired_capacity': 4}, False)
+        self.system.delete_autoscale_group(self.user_obj, names[2], True)
+        (asgs, next_token) = self.system.get_autoscale_groups(self.user_obj)
+        self.assertEqual([a.AutoScalingGroupName for a in asgs.type_list], names[:2])
+        self.assertEqual(asgs.type_list[1].DesiredCapacity, 4)
+
+    def test_terminate_new_instance(self):
+        names = self._add_domains(3, instances=1)
+        self.system.get_autoscale_instances(self.user_obj)
+        self.epum.add_instance(self.user_obj.access_id, names[0], "i-new")
+        self.system.terminate_instances(self.user_obj, "i-new", False)
+        self.assertEqual(len(self.epum.domains[self.user_obj.access_id][names[0]]['instances']), 1)
+
+
+class DomainReadModelTests(unittest.TestCase):
+
+    def setUp(self):
+        self.now = 1000.0
+        self.model = DomainReadModel(max_staleness=10, idle_timeout=60, clock=lambda: self.now)
+
+    def test_staleness(self):
+        self.assertEqual(self.model.get("user1"), None)
+        self.model.refresh("user1", lambda: {'asg': {'name': 'asg'}})
+        self.now = self.now + 4
+        (age, domains) = self.model.get("user1")
+        self.assertEqual(age, 4)
+        domains['asg']['name'] = 'changed'
+        self.assertEqual(self.model.get("user1")[1], {'asg': {'name': 'asg'}})
+        self.now = self.now + 7
+        self.assertEqual(self.model.get("user1"), None)
+
+    def test_refresh_older_than_write_stays_dirty(self):
+        def load():
+            # our write lands while the refresh is out talking to the EPUM
+            self.now = self.now + 1
+            self.model.mark_dirty("user1")
+            return {}
+        self.model.refresh("user1", load)
+        self.assertEqual(self.model.get("user1"), None)
+        self.model.refresh("user1", lambda: {})
+        self.assertEqual(self.model.get("user1"), (0, {}))
+
+    def test_idle_users_dropped(self):
+        self.model.get("user1")
+        self.now = self.now + 30
+        self.model.get("user2")
+        self.assertEqual(sorted(self.model.active_users()), ["user1", "user2"])
+        self.now = self.now + 31
+        self.assertEqual(self.model.active_users(), ["user2"])
+
+
+class CachedDTRSClientTests(unittest.TestCase):
+
+    def setUp(self):
+        self.now = 1000.0
+        clock = lambda: self.now
+        self.dtrs = FakeDTRSClient()
+        self.dtrs.add_dt("user1", "dt", {'mappings': {'hotel': {}}})
+        self.statsd = FakeStatsd()
+        cache = TTLCache(ttl=10, clock=clock)
+        self.client = CachedDTRSClient(self.dtrs, cache, statsd_client=self.statsd, clock=clock)
+
+    def test_copies(self):
+        dt_def = self.client.describe_dt("user1", "dt")
+        dt_def['mappings']['sierra'] = {}
+        self.assertEqual(self.client.describe_dt("user1", "dt").keys(), ['mappings'])
+        self.assertEqual(self.client.describe_dt("user1", "dt")['mappings'].keys(), ['hotel'])
+        self.assertEqual(self.dtrs.call_count('describe_dt'), 1)
+
+    def test_expire_and_age(self):
+        self.client.describe_dt("user1", "dt")
+        self.now = self.now + 4
+        self.client.describe_dt("user1", "dt")
+        self.assertEqual(self.statsd.timings['autoscale.dtrs.cache.age'], [4000.0])
+        self.now = self.now + 7
+        self.client.describe_dt("user1", "dt")
+        self.assertEqual(self.dtrs.call_count('describe_dt'), 2)
+        self.assertEqual(self.statsd.counts['autoscale.dtrs.cache.hit'], 1)
+        self.assertEqual(self.statsd.counts['autoscale.dtrs.cache.miss'], 2)
+
+    def test_users_kept_apart(self):
+        self.assertEqual(self.client.list_dts("user1"), ["dt"])
+        self.assertEqual(self.client.list_dts("user2"), [])
+        self.assertEqual(self.client.describe_dt("user2", "dt"), None)
+
+    def test_concurrent_misses_coalesce(self):
+        self.dtrs.delay = 0.1
+        threads = [threading.Thread(target=self.client.describe_dt, args=("user1", "dt")) for i in range(0, 4)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEqual(self.dtrs.call_count('describe_dt'), 1)
+        self.assertEqual(self.statsd.counts['autoscale.dtrs.cache.miss'], 1)
+        self.assertEqual(self.statsd.counts['autoscale.dtrs.cache.hit'], 3)
+
+
+class ConcurrentDescribeTests(EPUSystemTestBase):
+
+    system_options = {'rpc_workers': 10}
+    epum_delay = 0.05
+
+    def test_describes_run_in_parallel(self):
+        self._add_domains(20)
+        before = time.time()
+        (asgs, next_token) = self.system.get_autoscale_groups(self.user_obj)
+        elapsed = time.time() - before
+        self.assertEqual(asgs.get_length(), 20)
+        # 21 serial calls would take over a second
+        self.assertTrue(elapsed < 0.5, "took %f seconds" % (elapsed))
+
+
+class TerminateInstanceTests(EPUSystemTestBase):
+
+    def test_terminate_after_describe_uses_index(self):
+        names = self._add_domains(10, instances=2)
+        self.system.get_autoscale_groups(self.user_obj)
+        self.epum.reset_counts()
+
+        self.system.terminate_instances(self.user_obj, "i-%s-1" % (names[4]), True)
+        self.assertEqual(self.epum.call_count('list_domains'), 0)
+        self.assertEqual(self.epum.call_count('describe_domain'), 1)
+        self.assertEqual(self.epum.call_count('reconfigure_domain'), 1)
+        domain = self.epum.domains[self.user_obj.access_id][names[4]]
+        self.assertEqual(len(domain['instances']), 1)
+        self.assertEqual(domain['config']['engine_conf']['minimum_vms'], 1)
+
+    def test_terminate_cold_index(self):
+        names = self._add_domains(10, instances=2)
+        self.system.terminate_instances(self.user_obj, "i-%s-0" % (names[2]), False)
+        self.assertEqual(self.epum.call_count('list_domains'), 1)
+        self.assertEqual(self.epum.call_count('reconfigure_domain'), 1)
+
+        # the scan filled in the index for the other domains
+        self.epum.reset_counts()
+        self.system.terminate_instances(self.user_obj, "i-%s-0" % (names[7]), False)
+        self.assertEqual(self.epum.call_count('list_domains'), 0)
+        self.assertEqual(self.epum.call_count('describe_domain'), 1)
+
+    def test_reconfigure_invalidates(self):
+        names = self._add_domains(3, instances=2)
+        self.system.get_autoscale_groups(self.user_obj)
+        self.system.alter_autoscale_group(self.user_obj, names[0], {'desired_capacity': 5}, False)
+        self.epum.reset_counts()
+
+        self.system.terminate_instances(self.user_obj, "i-%s-0" % (names[0]), True)
+        # only the altered domain had to be described again, once by the scan and once live
+        self.assertEqual(self.epum.call_count('describe_domain'), 2)
+        domain = self.epum.domains[self.user_obj.access_id][names[0]]
+        self.assertEqual(domain['config']['engine_conf']['minimum_vms'], 4)
+
+    def test_terminate_uses_current_size(self):
+        names = self._add_domains(3, instances=2)
+        self.system.get_autoscale_groups(self.user_obj)
+        # another phantom grows the domain after we indexed it
+        self.epum.domains[self.user_obj.access_id][names[1]]['config']['engine_conf']['minimum_vms'] = 6
+
+        self.system.terminate_instances(self.user_obj, "i-%s-0" % (names[1]), True)
+        domain = self.epum.domains[self.user_obj.access_id][names[1]]
+        self.assertEqual(domain['config']['engine_conf']['minimum_vms'], 5)
+
+    def test_terminate_moved_instance(self):
+        names = self._add_domains(3, instances=1)
+        self.system.get_autoscale_groups(self.user_obj)
+        # the index still says the instance is in the first domain
+        domains = self.epum.domains[self.user_obj.access_id]
+        domains[names[2]]['instances'].append(domains[names[0]]['instances'].pop())
+
+        self.system.terminate_instances(self.user_obj, "i-%s-0" % (names[0]), False)
+        self.assertEqual([inst['iaas_id'] for inst in domains[names[2]]['instances']], ["i-%s-0" % (names[2])])
+        self.assertEqual(self.epum.call_count('reconfigure_domain'), 1)
+
+    def test_deleted_domain_is_forgotten(self):
+        names = self._add_domains(3, instances=1)
+        self.system.get_autoscale_instances(self.user_obj)
+        self.system.delete_autoscale_group(self.user_obj, names[1], True)
+        try:
+            self.system.terminate_instances(self.user_obj, "i-%s-0" % (names[1]), False)
+            self.fail("should have thrown an exception")
+        except PhantomAWSException, pae:
+            self.assertEqual(pae.title, 'InvalidParameterValue')
+
+    def test_unknown_instance(self):
+        self._add_domains(3, instances=1)
+        try:
+            self.system.terminate_instances(self.user_obj, "i-nothere", False)
+            self.fail("should have thrown an exception")
+        except PhantomAWSException, pae:
+            self.assertEqual(pae.title, 'InvalidParameterValue')
+
+
+class InstanceIdDescribeTests(EPUSystemTestBase):
+
+    system_options = {'domain_cache_ttl': 0}
+
+    def _instance_ids(self, instances):
+        return [inst.InstanceId for inst in instances.type_list]
+
+    def test_only_owning_domains_described(self):
+        names = self._add_domains(10, instances=2)
+        self.system.get_autoscale_groups(self.user_obj)
+        self.epum.reset_counts()
+
+        ids = ["i-%s-1" % (names[7]), "i-%s-0" % (names[3])]
+        (instances, next_token) = self.system.get_autoscale_instances(self.user_obj, instance_id_list=ids)
+        self.assertEqual(self._instance_ids(instances), sorted(ids))
+        self.assertEqual(self.epum.call_count('list_domains'), 0)
+        self.assertEqual(self.epum.call_count('describe_domain'), 2)
+
+    def test_index_miss_scans(self):
+        names = self._add_domains(4, instances=1)
+        self.system.get_autoscale_groups(self.user_obj)
+        self.epum.reset_counts()
+
+        ids = ["i-%s-0" % (names[1]), "i-nothere"]
+        (instances, next_token) = self.system.get_autoscale_instances(self.user_obj, instance_id_list=ids)
+        self.assertEqual(self._instance_ids(instances), ["i-%s-0" % (names[1])])
+        self.assertEqual(self.epum.call_count('list_domains'), 1)
+
+    def test_removed_instance_scans(self):
+        names = self._add_domains(4, instances=2)
+        self.system.get_autoscale_groups(self.user_obj)
+        self.epum.domains[self.user_obj.access_id][names[2]]['instances'].pop()
+        self.epum.reset_counts()
+
+        ids = ["i-%s-0" % (names[2]), "i-%s-1" % (names[2])]
+        (instances, next_token) = self.system.get_autoscale_instances(self.user_obj, instance_id_list=ids)
+        self.assertEqual(self._instance_ids(instances), ["i-%s-0" % (names[2])])
+        self.assertEqual(self.epum.call_count('list_domains'), 1)
+
+
+class RPCDeadlineTests(EPUSystemTestBase):
+
+    system_options = {'rpc_timeout': 0.2}
+
+    def test_slow_epum_times_out(self):
+        self._add_domains(3)
+        self.epum.delay = 2
+        before = time.time()
+        try:
+            self.system.get_autoscale_groups(self.user_obj)
+            self.fail("should have thrown an exception")
+        except PhantomAWSException, pae:
+            self.assertEqual(pae.title, 'ServiceUnavailable')
+        self.assertTrue(time.time() - before < 1)
+
+    def test_slow_write_not_abandoned(self):
+        names = self._add_domains(1)
+        self.epum.delay = 0.5
+        self.system.alter_autoscale_group(self.user_obj, names[0], {'desired_capacity': 3}, False)
+        domain = self.epum.domains[self.user_obj.access_id][names[0]]
+        self.assertEqual(domain['config']['engine_conf']['minimum_vms'], 3)
+
+    def test_errors_pass_through(self):
+        try:
+            self.system.get_autoscale_groups(self.user_obj, names=["nothere"])
+        except PhantomAWSException:
+            self.fail("an unknown name is not an error")
+        self.assertRaises(DashiError, self.system.alter_autoscale_group, self.user_obj, "nothere", {'desired_capacity': 1}, False)
+
+
+class AsyncRPCTests(unittest.TestCase):
+
+    def test_map_in_order(self):
+        rpc = AsyncRPC(workers=4)
+        self.assertEqual(rpc.map(lambda x: x * 2, range(0, 10)), [x * 2 for x in range(0, 10)])
+
+    def test_exception(self):
+        rpc = AsyncRPC(workers=2)
+
+        def fail():
+            raise ValueError("bad")
+        self.assertRaises(ValueError, rpc.call, fail)
+        self.assertEqual(rpc.in_flight(), 0)
+
+    def test_in_flight_bound(self):
+        rpc = AsyncRPC(workers=4, max_in_flight=2, timeout=0.2)
+        release = threading.Event()
+        f1 = rpc.submit(release.wait)
+        f2 = rpc.submit(release.wait)
+        try:
+            rpc.submit(release.wait)
+            self.fail("should have thrown an exception")
+        except PhantomAWSException, pae:
+            self.assertEqual(pae.title, 'ServiceUnavailable')
+        release.set()
+        f1.result()
+        f2.result()
+        self.assertEqual(rpc.call(lambda: 5), 5)
+
+    def test_wrap(self):
+        rpc = AsyncRPC(workers=2, timeout=0.2)
+        client = rpc.wrap(FakeDTRSClient(delay=1))
+        self.assertRaises(PhantomAWSException, client.list_dts, "user1")
+
+    def test_wrap_writes(self):
+        rpc = AsyncRPC(workers=2, timeout=0.2)
+        dtrs = FakeDTRSClient(delay=0.5)
+        client = rpc.wrap(dtrs, writes=DTRS_WRITE_METHODS)
+        client.add_dt("user1", "dt", {'mappings': {}})
+        self.assertEqual(dtrs.dts["user1"].keys(), ["dt"])
+
+
+if __name__ == '__main__':
+    unittest.main()
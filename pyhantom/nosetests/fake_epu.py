@@ -0,0 +1,172 @@
+import copy
+import threading
+import time
+from dashi import DashiError
+
+
+class FakeSection(object):
+
+    def __init__(self, **kwargs):
+        self.__dict__.update(kwargs)
+
+
+class FakeClock(object):
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class FakeStatsd(object):
+    """Records what is sent to it.  It takes StatsClient's arguments so it can stand in for that class."""
+
+    def __init__(self, host=None, port=None):
+        self.counts = {}
+        self.timings = {}
+        self.gauges = {}
+
+    def incr(self, name):
+        self.counts[name] = self.counts.get(name, 0) + 1
+
+    def timing(self, name, value):
+        self.timings.setdefault(name, []).append(value)
+
+    def gauge(self, name, value):
+        self.gauges[name] = value
+
+
+class FakeConfig(object):
+    """Stands in for PhantomConfig in front of the wsgi applications"""
+
+    def __init__(self, authz=None, system=None):
+        self._authz = authz
+        self._system = system
+        self.statsd_client = None
+        self.get_system_count = 0
+
+    def get_system(self):
+        self.get_system_count = self.get_system_count + 1
+        return self._system
+
+    def get_authz(self):
+        return self._authz
+
+
+def make_cfg(**system_options):
+    """A configuration object with just enough in it for the epu backends"""
+    system = FakeSection(**system_options)
+    return FakeSection(phantom=FakeSection(system=system))
+
+
+class _CallCounter(object):
+
+    def __init__(self, delay=0):
+        self.calls = {}
+        self.delay = delay
+        self._lock = threading.Lock()
+
+    def _count(self, name):
+        with self._lock:
+            self.calls[name] = self.calls.get(name, 0) + 1
+        if self.delay:
+            time.sleep(self.delay)
+
+    def call_count(self, name):
+        return self.calls.get(name, 0)
+
+    def reset_counts(self):
+        with self._lock:
+            self.calls = {}
+
+
+class FakeEPUMClient(_CallCounter):
+    """An in memory stand in for ceiclient's EPUMClient"""
+
+    def __init__(self, delay=0):
+        _CallCounter.__init__(self, delay)
+        self.domains = {}
+        self.definitions = {}
+
+    def _user_domains(self, caller):
+        return self.domains.setdefault(caller, {})
+
+    def add_instance(self, caller, name, iaas_id, instance_id=None, state="600-RUNNING"):
+        if instance_id is None:
+            instance_id = "epu-" + iaas_id
+        inst = {'iaas_id': iaas_id, 'instance_id': instance_id, 'state': state, 'site': 'hotel',
+                'deployable_type': 'dt'}
+        self._user_domains(caller)[name]['instances'].append(inst)
+
+    def list_domain_definitions(self):
+        return self.definitions.keys()
+
+    def add_domain_definition(self, name, definition):
+        self.definitions[name] = definition
+
+    def list_domains(self, caller=None):
+        self._count('list_domains')
+        return self._user_domains(caller).keys()
+
+    def describe_domain(self, name, caller=None):
+        self._count('describe_domain')
+        if name not in self._user_domains(caller):
+            raise DashiError("NotFoundError", exc_type=u'NotFoundError')
+        return copy.deepcopy(self._user_domains(caller)[name])
+
+    def add_domain(self, name, definition_id, config, caller=None):
+        self._count('add_domain')
+        if name in self._user_domains(caller):
+            raise DashiError("WriteConflictError", exc_type=u'WriteConflictError')
+        config = copy.deepcopy(config)
+        self._user_domains(caller)[name] = {'name': name, 'config': config, 'instances': []}
+
+    def reconfigure_domain(self, name, config, caller=None):
+        self._count('reconfigure_domain')
+        if name not in self._user_domains(caller):
+            raise DashiError("NotFoundError", exc_type=u'NotFoundError')
+        domain = self._user_domains(caller)[name]
+        engine_conf = config.get('engine_conf', {})
+        terminate = engine_conf.get('terminate')
+        if terminate:
+            domain['instances'] = [i for i in domain['instances'] if i['instance_id'] != terminate]
+        for k in engine_conf:
+            if k != 'terminate':
+                domain['config']['engine_conf'][k] = engine_conf[k]
+
+    def remove_domain(self, name, caller=None):
+        self._count('remove_domain')
+        del self._user_domains(caller)[name]
+
+
+class FakeDTRSClient(_CallCounter):
+    """An in memory stand in for ceiclient's DTRSClient"""
+
+    def __init__(self, delay=0):
+        _CallCounter.__init__(self, delay)
+        self.dts = {}
+
+    def _user_dts(self, caller):
+        return self.dts.setdefault(caller, {})
+
+    def list_dts(self, caller):
+        self._count('list_dts')
+        return self._user_dts(caller).keys()
+
+    def describe_dt(self, caller, dt_name):
+        self._count('describe_dt')
+        dt = self._user_dts(caller).get(dt_name)
+        return copy.deepcopy(dt)
+
+    def add_dt(self, caller, dt_name, dt_definition):
+        self._count('add_dt')
+        self._user_dts(caller)[dt_name] = copy.deepcopy(dt_definition)
+
+    def update_dt(self, caller, dt_name, dt_definition):
+        self._count('update_dt')
+        self._user_dts(caller)[dt_name] = copy.deepcopy(dt_definition)
+
+    def remove_dt(self, caller, dt_name):
+        self._count('remove_dt')
+        del self._user_dts(caller)[dt_name]
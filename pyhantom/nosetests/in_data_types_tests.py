@@ -0,0 +1,135 @@
+import unittest
+from webob.multidict import MultiDict
+from pyhantom.in_data_types import CreateAutoScalingGroupInput, LaunchConfigurationInput, DescribeAutoScalingGroupInput, TagsInput, MAX_LIST_MEMBERS
+from pyhantom.out_data_types import LaunchConfigurationType
+from pyhantom.phantom_exceptions import PhantomAWSException
+
+
+def make_asg_params(tag_count=2):
+    params = MultiDict()
+    params['Action'] = 'CreateAutoScalingGroup'
+    params['AutoScalingGroupName'] = u'asg1'
+    params['LaunchConfigurationName'] = u'dt@hotel'
+    params['MaxSize'] = u'3'
+    params['MinSize'] = u'1'
+    params['AvailabilityZones.member.1'] = u'hotel'
+    params['AvailabilityZones.member.2'] = u'sierra'
+    for i in range(1, tag_count + 1):
+        prefix = 'Tags.member.%d.' % (i)
+        params[prefix + 'Key'] = u'key%d' % (i)
+        params[prefix + 'Value'] = u'value%d' % (i)
+        params[prefix + 'ResourceId'] = u'asg1'
+        params[prefix + 'ResourceType'] = u'auto-scaling-group'
+        params[prefix + 'PropagateAtLaunch'] = u'false'
+    return params
+
+
+class RequestParserTests(unittest.TestCase):
+
+    def test_create_asg(self):
+        input = CreateAutoScalingGroupInput()
+        input.set_from_dict(make_asg_params(tag_count=12))
+        self.assertEqual(input.AutoScalingGroupName, u'asg1')
+        self.assertEqual(input.MaxSize, 3)
+        self.assertEqual(input.MinSize, 1)
+        self.assertEqual(input.AvailabilityZones, [u'hotel', u'sierra'])
+        self.assertEqual([t.Key for t in input.Tags], [u'key%d' % (i) for i in range(1, 13)])
+        self.assertEqual(input.Tags[0].PropagateAtLaunch, False)
+        self.assertEqual(input.DesiredCapacity, None)
+        self.assertEqual(input.LoadBalancerNames, None)
+
+    def test_members_placed_by_index(self):
+        params = MultiDict()
+        params['AutoScalingGroupNames.member.2'] = u'b'
+        params['AutoScalingGroupNames.member.1'] = u'a'
+        params['MaxRecords'] = u'5'
+        input = DescribeAutoScalingGroupInput()
+        input.set_from_dict(params)
+        self.assertEqual(input.AutoScalingGroupNames, [u'a', u'b'])
+        self.assertEqual(input.MaxRecords, 5)
+        self.assertEqual(input.NextToken, None)
+
+    def test_missing(self):
+        for names in [['MinSize'], ['AvailabilityZones.member.1', 'AvailabilityZones.member.2']]:
+            params = make_asg_params()
+            for name in names:
+                del params[name]
+            try:
+                CreateAutoScalingGroupInput().set_from_dict(params)
+                self.fail("should have thrown an exception")
+            except PhantomAWSException, pae:
+                self.assertEqual(pae.title, 'MissingParameter')
+
+    def test_missing_element_fields(self):
+        for name in ['PropagateAtLaunch', 'ResourceId', 'Value']:
+            params = make_asg_params()
+            del params['Tags.member.2.%s' % (name)]
+            try:
+                CreateAutoScalingGroupInput().set_from_dict(params)
+                self.fail("should have thrown an exception")
+            except PhantomAWSException, pae:
+                self.assertEqual(pae.title, 'MissingParameter')
+                self.assertTrue(('Tags.member.2.%s' % (name)) in pae.detail)
+
+    def test_skipped_element_missing(self):
+        params = make_asg_params(tag_count=1)
+        params['Tags.member.3.Key'] = u'key3'
+        params['Tags.member.3.Value'] = u'value3'
+        params['Tags.member.3.ResourceId'] = u'asg1'
+        params['Tags.member.3.ResourceType'] = u'auto-scaling-group'
+        params['Tags.member.3.PropagateAtLaunch'] = u'true'
+        try:
+            CreateAutoScalingGroupInput().set_from_dict(params)
+            self.fail("should have thrown an exception")
+        except PhantomAWSException, pae:
+            self.assertEqual(pae.title, 'MissingParameter')
+
+    def test_member_index_bound(self):
+        for name in ['AvailabilityZones.member.%d' % (MAX_LIST_MEMBERS + 1), 'Tags.member.99999999.Key']:
+            params = make_asg_params()
+            params[name] = u'x'
+            try:
+                CreateAutoScalingGroupInput().set_from_dict(params)
+                self.fail("should have thrown an exception")
+            except PhantomAWSException, pae:
+                self.assertEqual(pae.title, 'InvalidParameterValue')
+
+    def test_bad_values(self):
+        for (name, value) in [('MaxSize', u'many'), ('Tags.member.1.Colour', u'red'), ('Tags.member.x.Key', u'k')]:
+            params = make_asg_params()
+            params[name] = value
+            self.assertRaises(PhantomAWSException, CreateAutoScalingGroupInput().set_from_dict, params)
+
+    def test_nested_fields(self):
+        params = MultiDict()
+        params['ImageId'] = u'ami-1'
+        params['InstanceType'] = u'm1.small'
+        params['LaunchConfigurationName'] = u'dt@hotel'
+        params['InstanceMonitoring.Enabled'] = u'true'
+        params['SecurityGroups.member.1'] = u'default'
+        params['BlockDeviceMappings.member.2.DeviceName'] = u'/dev/sdb'
+        params['BlockDeviceMappings.member.2.Ebs.VolumeSize'] = u'10'
+        input = LaunchConfigurationInput()
+        input.set_from_dict(params)
+        self.assertEqual(input.SecurityGroups, [u'default'])
+        self.assertEqual(len(input.BlockDeviceMappings), 2)
+        self.assertEqual(input.BlockDeviceMappings[0].DeviceName, None)
+        self.assertEqual(input.BlockDeviceMappings[1].DeviceName, u'/dev/sdb')
+        self.assertEqual(input.BlockDeviceMappings[1].EbsVolumeSize, 10)
+        self.assertEqual(input.BlockDeviceMappings[1].EbsSnapshotId, None)
+        self.assertEqual(input.InstanceMonitoring, None)
+
+        lc = LaunchConfigurationType('LaunchConfiguration')
+        lc.set_from_intype(input, 'arn')
+        bdms = lc.BlockDeviceMappings.type_list
+        self.assertEqual(bdms[0].Ebs, None)
+        self.assertEqual((bdms[1].Ebs.SnapshotId, bdms[1].Ebs.VolumeSize), (None, 10))
+
+    def test_parser_per_class(self):
+        CreateAutoScalingGroupInput().set_from_dict(make_asg_params())
+        self.assertTrue(CreateAutoScalingGroupInput._get_parser() is CreateAutoScalingGroupInput._get_parser())
+        self.assertTrue(TagsInput._get_parser() is not CreateAutoScalingGroupInput._get_parser())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,245 @@
+import datetime
+import os
+import tempfile
+import threading
+import unittest
+from sqlalchemy import event
+from pyhantom.authz import PhantomUserObject
+from pyhantom.nosetests.fake_epu import make_cfg
+from pyhantom.out_data_types import LaunchConfigurationType, DateTimeType, AWSListType, AutoScalingGroupType, \
+    BlockDeviceMappingType, EbsType
+from pyhantom.phantom_exceptions import PhantomAWSException
+from pyhantom.system.local_db.system import SystemLocalDB
+
+
+def make_lc(name):
+    lc = LaunchConfigurationType('LaunchConfiguration')
+    lc.LaunchConfigurationName = name
+    lc.ImageId = 'ami-1'
+    lc.InstanceType = 'm1.small'
+    lc.KernelId = None
+    lc.KeyName = 'ooi'
+    lc.LaunchConfigurationARN = 'arn'
+    lc.RamdiskId = None
+    lc.UserData = None
+    lc.CreatedTime = DateTimeType('CreatedTime', datetime.datetime.utcnow())
+    lc.SecurityGroups = AWSListType('SecurityGroups')
+    lc.SecurityGroups.add_item('default')
+    lc.SecurityGroups.add_item('web')
+    bdm = BlockDeviceMappingType('BlockDeviceMapping')
+    bdm.DeviceName = '/dev/sdb'
+    bdm.VirtualName = 'ephemeral0'
+    bdm.Ebs = None
+    lc.BlockDeviceMappings.add_item(bdm)
+    bdm = BlockDeviceMappingType('BlockDeviceMapping')
+    bdm.DeviceName = '/dev/sdc'
+    bdm.VirtualName = None
+    bdm.Ebs = EbsType('Ebs')
+    bdm.Ebs.SnapshotId = 'snap-1'
+    bdm.Ebs.VolumeSize = 8
+    lc.BlockDeviceMappings.add_item(bdm)
+    return lc
+
+
+def make_asg(name, lc_name):
+    asg = AutoScalingGroupType('AutoScalingGroup')
+    asg.AutoScalingGroupName = name
+    asg.AutoScalingGroupARN = 'arn'
+    asg.LaunchConfigurationName = lc_name
+    asg.VPCZoneIdentifier = None
+    asg.HealthCheckType = None
+    asg.PlacementGroup = None
+    asg.Status = None
+    asg.AvailabilityZones = AWSListType('AvailabilityZones')
+    asg.AvailabilityZones.add_item('us-east-1')
+    asg.DesiredCapacity = 0
+    asg.MaxSize = 1
+    asg.MinSize = 0
+    asg.Cooldown = 0
+    asg.HealthCheckGracePeriod = 0
+    asg.CreatedTime = DateTimeType('CreatedTime', datetime.datetime.utcnow())
+    return asg
+
+
+class StatementRecorder(object):
+    """Collects every SQL statement the engine runs inside the with block"""
+
+    def __init__(self, engine):
+        self.statements = []
+        self._recording = False
+        # this version of sqlalchemy cannot remove listeners so it stays attached and is switched off
+        event.listen(engine, 'before_cursor_execute', self._record)
+
+    def _record(self, conn, cursor, statement, parameters, context, executemany):
+        if self._recording:
+            self.statements.append(statement)
+
+    def __enter__(self):
+        self._recording = True
+        return self
+
+    def __exit__(self, exc_type, exc_value, tb):
+        self._recording = False
+
+    def selects(self):
+        return [st for st in self.statements if st.lstrip().upper().startswith('SELECT')]
+
+
+class SystemLocalDBTestBase(unittest.TestCase):
+
+    def setUp(self):
+        (osf, self.db_fname) = tempfile.mkstemp(prefix="/tmp/phantom")
+        os.close(osf)
+        self.system = SystemLocalDB(make_cfg(db_url="sqlite:///%s" % (self.db_fname)))
+        self.user_obj = PhantomUserObject("user1", "secret", "tester")
+
+    def tearDown(self):
+        self.system._db.close()
+        os.remove(self.db_fname)
+
+
+class SessionTests(SystemLocalDBTestBase):
+
+    def test_failed_write_rolled_back(self):
+        self.system.create_launch_config(self.user_obj, make_lc("lc1"))
+        try:
+            self.system.create_launch_config(self.user_obj, make_lc("lc1"))
+            self.fail("should have thrown an exception")
+        except PhantomAWSException:
+            pass
+        # the session is usable again after the integrity error
+        self.system.create_launch_config(self.user_obj, make_lc("lc2"))
+        (lcs, next_token) = self.system.get_launch_configs(self.user_obj)
+        self.assertEqual([lc.LaunchConfigurationName for lc in lcs.type_list], ["lc1", "lc2"])
+        self.assertEqual(lcs.type_list[0].SecurityGroups.type_list, ['default', 'web'])
+
+    def test_write_seen_by_other_thread(self):
+        self.system.create_launch_config(self.user_obj, make_lc("lc1"))
+        found = []
+
+        def reader():
+            (lcs, next_token) = self.system.get_launch_configs(self.user_obj)
+            found.extend([lc.LaunchConfigurationName for lc in lcs.type_list])
+        t = threading.Thread(target=reader)
+        t.start()
+        t.join()
+        self.assertEqual(found, ["lc1"])
+
+
+class PaginationTests(SystemLocalDBTestBase):
+
+    def setUp(self):
+        SystemLocalDBTestBase.setUp(self)
+        self.lc_names = ["lc%02d" % (i) for i in range(0, 12)]
+        for name in self.lc_names:
+            self.system.create_launch_config(self.user_obj, make_lc(name))
+        self.asg_names = ["asg%02d" % (i) for i in range(0, 7)]
+        for name in self.asg_names:
+            self.system.create_autoscale_group(self.user_obj, make_asg(name, "lc00"))
+
+    def _page_all(self, func, attr, max):
+        found = []
+        token = None
+        while True:
+            (page, token) = func(self.user_obj, max=max, startToken=token)
+            self.assertTrue(page.get_length() <= max)
+            found.extend([getattr(item, attr) for item in page.type_list])
+            if token is None:
+                return found
+
+    def test_lcs(self):
+        for max in [1, 5, 6, 12, 20]:
+            self.assertEqual(self._page_all(self.system.get_launch_configs, 'LaunchConfigurationName', max), self.lc_names)
+
+    def test_asgs(self):
+        for max in [1, 3, 7, 10]:
+            self.assertEqual(self._page_all(self.system.get_autoscale_groups, 'AutoScalingGroupName', max), self.asg_names)
+
+    def test_token_is_first_of_next_page(self):
+        (lcs, next_token) = self.system.get_launch_configs(self.user_obj, max=4)
+        self.assertEqual(next_token, "lc04")
+        # removing the row the token names does not upset the next page
+        self.system.delete_launch_config(self.user_obj, "lc04")
+        (lcs, next_token) = self.system.get_launch_configs(self.user_obj, max=4, startToken=next_token)
+        self.assertEqual([lc.LaunchConfigurationName for lc in lcs.type_list], self.lc_names[5:9])
+
+    def test_limit_in_sql(self):
+        with StatementRecorder(self.system._db._engine) as recorder:
+            self.system.get_launch_configs(self.user_obj, max=3, startToken="lc05")
+        lc_select = [st for st in recorder.selects() if 'FROM launch_configuration' in st][0]
+        self.assertTrue('LIMIT' in lc_select, lc_select)
+        self.assertTrue('>' in lc_select, lc_select)
+
+
+class EagerLoadTests(SystemLocalDBTestBase):
+
+    def test_block_device_mappings_round_trip(self):
+        self.system.create_launch_config(self.user_obj, make_lc("lc1"))
+        (lcs, next_token) = self.system.get_launch_configs(self.user_obj)
+        bdms = lcs.type_list[0].BlockDeviceMappings.type_list
+        self.assertEqual([(b.DeviceName, b.VirtualName) for b in bdms], [('/dev/sdb', 'ephemeral0'), ('/dev/sdc', None)])
+        self.assertEqual(bdms[0].Ebs, None)
+        self.assertEqual((bdms[1].Ebs.SnapshotId, bdms[1].Ebs.VolumeSize), ('snap-1', 8))
+
+    def test_delete_removes_children(self):
+        self.system.create_launch_config(self.user_obj, make_lc("lc1"))
+        self.system.delete_launch_config(self.user_obj, "lc1")
+        conn = self.system._db._engine.connect()
+        try:
+            self.assertEqual(conn.execute("SELECT count(*) FROM block_device_mappings").scalar(), 0)
+            self.assertEqual(conn.execute("SELECT count(*) FROM security_group").scalar(), 0)
+        finally:
+            conn.close()
+
+    def test_query_count_independent_of_rows(self):
+        for i in range(0, 20):
+            self.system.create_launch_config(self.user_obj, make_lc("lc%02d" % (i)))
+        with StatementRecorder(self.system._db._engine) as recorder:
+            (lcs, next_token) = self.system.get_launch_configs(self.user_obj)
+        self.assertEqual(lcs.get_length(), 20)
+        for lc in lcs.type_list:
+            self.assertEqual(lc.SecurityGroups.get_length(), 2)
+            self.assertEqual(lc.BlockDeviceMappings.get_length(), 2)
+        # the launch configs, then their security groups, then their block devices
+        self.assertEqual(len(recorder.selects()), 3)
+
+
+class ConcurrencyStressTests(SystemLocalDBTestBase):
+
+    thread_count = 10
+    rounds = 15
+
+    def test_many_threads(self):
+        errors = []
+
+        def worker(n):
+            user_obj = PhantomUserObject("user%d" % (n), "secret", "tester")
+            try:
+                for i in range(0, self.rounds):
+                    name = "lc-%d-%d" % (n, i)
+                    self.system.create_launch_config(user_obj, make_lc(name))
+                    (lcs, next_token) = self.system.get_launch_configs(user_obj)
+                    names = [lc.LaunchConfigurationName for lc in lcs.type_list]
+                    if name not in names:
+                        errors.append("%s missing from %s" % (name, names))
+                    if i % 3 == 0:
+                        self.system.delete_launch_config(user_obj, name)
+            except Exception, ex:
+                errors.append("thread %d: %s" % (n, str(ex)))
+
+        threads = [threading.Thread(target=worker, args=(n,)) for n in range(0, self.thread_count)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEqual(errors, [])
+
+        for n in range(0, self.thread_count):
+            user_obj = PhantomUserObject("user%d" % (n), "secret", "tester")
+            (lcs, next_token) = self.system.get_launch_configs(user_obj)
+            expected = sorted(["lc-%d-%d" % (n, i) for i in range(0, self.rounds) if i % 3 != 0])
+            self.assertEqual([lc.LaunchConfigurationName for lc in lcs.type_list], expected)
+
+
+if __name__ == '__main__':
+    unittest.main()
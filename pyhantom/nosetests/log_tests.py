@@ -0,0 +1,93 @@
+import logging
+import unittest
+import pyhantom.util
+from pyhantom.authz import PhantomUserObject
+from pyhantom.util import configure_reply_logging, log, log_reply_writer, LogEntryDecorator
+from pyhantom.xml_writer import XMLStreamWriter
+
+
+class RecordingHandler(logging.Handler):
+
+    def __init__(self):
+        logging.Handler.__init__(self)
+        self.records = []
+
+    def emit(self, record):
+        self.records.append(record)
+
+
+class CountingWriter(XMLStreamWriter):
+
+    def __init__(self, body):
+        XMLStreamWriter.__init__(self)
+        self.element("Body", body)
+        self.getvalue_count = 0
+
+    def getvalue(self):
+        self.getvalue_count = self.getvalue_count + 1
+        return XMLStreamWriter.getvalue(self)
+
+
+class LazyLogTests(unittest.TestCase):
+
+    def setUp(self):
+        self.logger = logging.getLogger("phantom")
+        self.old_level = self.logger.level
+        self.handler = RecordingHandler()
+        self.logger.addHandler(self.handler)
+        self.user_obj = PhantomUserObject("key", "secret", "tester")
+
+    def tearDown(self):
+        self.logger.removeHandler(self.handler)
+        self.logger.setLevel(self.old_level)
+        configure_reply_logging()
+
+    def test_reply_not_built_when_disabled(self):
+        self.logger.setLevel(logging.WARN)
+        writer = CountingWriter("x")
+        log_reply_writer(writer, self.user_obj)
+        self.assertEqual(writer.getvalue_count, 0)
+        self.assertEqual(len(self.handler.records), 0)
+
+    def test_reply_truncated(self):
+        self.logger.setLevel(logging.INFO)
+        configure_reply_logging(max_size=10)
+        writer = CountingWriter("x" * 100)
+        log_reply_writer(writer, self.user_obj)
+        self.assertEqual(len(self.handler.records), 1)
+        msg = self.handler.records[0].getMessage()
+        self.assertTrue("truncated" in msg)
+        self.assertFalse("x" * 20 in msg)
+
+    def test_reply_sampled_out(self):
+        self.logger.setLevel(logging.INFO)
+        configure_reply_logging(sample_rate=0.0)
+        writer = CountingWriter("x")
+        log_reply_writer(writer, self.user_obj)
+        self.assertEqual(writer.getvalue_count, 0)
+
+    def test_lazy_args(self):
+        class Exploding(object):
+            def __str__(self):
+                raise Exception("should not have been formatted")
+
+        self.logger.setLevel(logging.INFO)
+        log(logging.DEBUG, "value %s", Exploding())
+        self.assertEqual(len(self.handler.records), 0)
+
+    def test_entry_decorator(self):
+        self.logger.setLevel(logging.INFO)
+
+        @LogEntryDecorator(classname="Test")
+        def f(x):
+            return x + 1
+        self.assertEqual(f(1), 2)
+        self.assertEqual(len(self.handler.records), 0)
+
+        self.logger.setLevel(logging.DEBUG)
+        f(1)
+        self.assertEqual(len(self.handler.records), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
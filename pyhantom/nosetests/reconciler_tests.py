@@ -0,0 +1,123 @@
+import os
+import tempfile
+import time
+import unittest
+from pyhantom.authz import PhantomUserObject
+from pyhantom.nosetests.fake_epu import FakeEPUMClient, make_cfg
+from pyhantom.nosetests.local_db_system_tests import make_asg
+from pyhantom.system.epu_localdb.epu_system import EPUSystemWithLocalDB
+from pyhantom.system.epu_localdb.reconciler import ASGReconciler
+from pyhantom.system.local_db.persistance import LaunchConfigurationDB, AutoscaleGroupObject
+
+
+class ReconcilerTestBase(unittest.TestCase):
+
+    def setUp(self):
+        (osf, self.db_fname) = tempfile.mkstemp(prefix="/tmp/phantom")
+        os.close(osf)
+        self.db_url = "sqlite:///%s" % (self.db_fname)
+        self.db = LaunchConfigurationDB(self.db_url)
+        self.epum = FakeEPUMClient()
+
+    def tearDown(self):
+        self.db.close()
+        os.remove(self.db_fname)
+
+    def _add_group(self, user_name, name, in_epu=True):
+        db_asg = AutoscaleGroupObject()
+        db_asg.set_from_outtype(make_asg(name, "lc"), PhantomUserObject(user_name, "secret", "tester"))
+        self.db.db_obj_add(db_asg)
+        self.db.db_commit()
+        self.db.remove_session()
+        if in_epu:
+            self.epum.add_domain(name, "def", {'engine_conf': {}})
+
+    def _names(self):
+        names = sorted([name for (column_id, name) in self.db.get_asg_keys()])
+        self.db.remove_session()
+        return names
+
+
+class ASGReconcilerTests(ReconcilerTestBase):
+
+    def test_removes_after_two_passes(self):
+        self._add_group("user1", "keep")
+        self._add_group("user1", "gone1", in_epu=False)
+        self._add_group("user2", "gone2", in_epu=False)
+        reconciler = ASGReconciler(self.db, self.epum, batch_size=1)
+
+        self.assertEqual(reconciler.reconcile(), 0)
+        self.assertEqual(self._names(), ["gone1", "gone2", "keep"])
+        self.assertEqual(reconciler.reconcile(), 2)
+        self.assertEqual(self._names(), ["keep"])
+
+    def test_domain_back_before_second_pass(self):
+        self._add_group("user1", "flaky", in_epu=False)
+        reconciler = ASGReconciler(self.db, self.epum)
+        reconciler.reconcile()
+        self.epum.add_domain("flaky", "def", {'engine_conf': {}})
+        self.assertEqual(reconciler.reconcile(), 0)
+        self.epum.remove_domain("flaky")
+        self.assertEqual(reconciler.reconcile(), 0)
+        self.assertEqual(reconciler.reconcile(), 1)
+
+    def test_background_thread(self):
+        self._add_group("user1", "gone", in_epu=False)
+        reconciler = ASGReconciler(self.db, self.epum, interval=0.05)
+        reconciler.start()
+        try:
+            deadline = time.time() + 5
+            while self._names() and time.time() < deadline:
+                time.sleep(0.05)
+        finally:
+            reconciler.stop()
+        self.assertEqual(self._names(), [])
+
+
+class EPUSystemWithLocalDBTests(ReconcilerTestBase):
+
+    def _system(self, **options):
+        options.setdefault('db_url', self.db_url)
+        return EPUSystemWithLocalDB(make_cfg(**options), epum_client=self.epum)
+
+    def test_describe_does_not_scan_everything(self):
+        system = self._system(reconcile_interval=0)
+        for i in range(0, 5):
+            self._add_group("user1", "mine%d" % (i))
+            self._add_group("user2", "theirs%d" % (i))
+        self._add_group("user1", "stale", in_epu=False)
+        self.epum.reset_counts()
+
+        user_obj = PhantomUserObject("user1", "secret", "tester")
+        (asgs, next_token) = system.get_autoscale_groups(user_obj)
+        self.assertEqual([a.AutoScalingGroupName for a in asgs.type_list], ["mine%d" % (i) for i in range(0, 5)])
+        self.assertEqual(self.epum.call_count('list_domains'), 1)
+        self.assertEqual(self.epum.call_count('describe_domain'), 5)
+        # the stale row is left for the reconciler
+        self.assertTrue("stale" in self._names())
+
+    def test_unknown_groups_do_not_short_a_page(self):
+        system = self._system(reconcile_interval=0)
+        for i in range(0, 4):
+            self._add_group("user1", "a_stale%d" % (i), in_epu=False)
+        for i in range(0, 5):
+            self._add_group("user1", "mine%d" % (i))
+
+        user_obj = PhantomUserObject("user1", "secret", "tester")
+        (asgs, next_token) = system.get_autoscale_groups(user_obj, max=3)
+        self.assertEqual([a.AutoScalingGroupName for a in asgs.type_list], ["mine0", "mine1", "mine2"])
+        self.assertEqual(next_token, "mine3")
+        (asgs, next_token) = system.get_autoscale_groups(user_obj, max=3, startToken=next_token)
+        self.assertEqual([a.AutoScalingGroupName for a in asgs.type_list], ["mine3", "mine4"])
+        self.assertEqual(next_token, None)
+
+    def test_alter(self):
+        system = self._system(reconcile_interval=0)
+        self._add_group("user1", "grp")
+        user_obj = PhantomUserObject("user1", "secret", "tester")
+        system.alter_autoscale_group(user_obj, "grp", {'desired_capacity': 3}, False)
+        self.assertEqual(self.db.get_asg(user_obj, "grp").DesiredCapacity, 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,103 @@
+import datetime
+import os
+import tempfile
+import unittest
+import uuid
+import webob
+from pyhantom.authz.simple_file import SimpleFileDataStore
+from pyhantom.main_router import MainRouter
+from pyhantom.nosetests.fake_epu import FakeConfig, FakeStatsd
+from pyhantom.system.tester import TestSystem, _TESTONLY_clear_registry
+from pyhantom.util import calc_v2_signature
+from pyhantom.wsgiapps import PHANTOM_REQUEST_CONTEXT_KEY
+
+
+class CountingAuthz(SimpleFileDataStore):
+
+    def __init__(self, filepath):
+        SimpleFileDataStore.__init__(self, filepath)
+        self.lookup_count = 0
+
+    def get_user_object_by_access_id(self, access_id):
+        self.lookup_count = self.lookup_count + 1
+        return SimpleFileDataStore.get_user_object_by_access_id(self, access_id)
+
+
+class RequestContextTests(unittest.TestCase):
+
+    def setUp(self):
+        self.username = str(uuid.uuid4()).split('-')[0]
+        self.password = str(uuid.uuid4()).split('-')[0]
+        (osf, self.pwfile) = tempfile.mkstemp(prefix="/tmp/phantom")
+        os.close(osf)
+        fptr = open(self.pwfile, "w")
+        fptr.write(self.username + ' ' + self.password + ' tester\n')
+        fptr.close()
+        self.authz = CountingAuthz(self.pwfile)
+        self.cfg = FakeConfig(authz=self.authz, system=TestSystem())
+        self.router = MainRouter(cfg=self.cfg)
+
+    def tearDown(self):
+        _TESTONLY_clear_registry()
+        os.remove(self.pwfile)
+
+    def _make_request(self, params):
+        params = params.copy()
+        params['AWSAccessKeyId'] = self.username
+        params['SignatureMethod'] = 'HmacSHA256'
+        params['SignatureVersion'] = '2'
+        params['Timestamp'] = datetime.datetime.utcnow().strftime('%Y-%m-%dT%H:%M:%SZ')
+        req = webob.Request.blank('/', POST=params)
+        req.headers['host'] = 'localhost'
+        access_dict = {'SignatureMethod': 'HmacSHA256'}
+        req.POST['Signature'] = calc_v2_signature(self.password, req, access_dict)
+        return req
+
+    def test_one_lookup_per_request(self):
+        req = self._make_request({'Action': 'DescribeLaunchConfigurations'})
+        res = req.get_response(self.router)
+        self.assertEqual(res.status_int, 200, res.body)
+        self.assertEqual(self.authz.lookup_count, 1)
+
+    def test_signing_key_cache_gauge(self):
+        self.cfg.statsd_client = FakeStatsd()
+        req = self._make_request({'Action': 'DescribeLaunchConfigurations'})
+        req.get_response(self.router)
+        self.assertTrue('autoscale.signing_key.cache.hit_ratio' in self.cfg.statsd_client.gauges)
+
+    def test_context_attached(self):
+        req = self._make_request({'Action': 'DescribeAutoScalingGroups'})
+        req.get_response(self.router)
+        ctx = req.environ[PHANTOM_REQUEST_CONTEXT_KEY]
+        self.assertEqual(ctx.user_obj.access_id, self.username)
+        self.assertTrue(ctx.request_id)
+
+    def test_request_id_from_context(self):
+        ids = []
+        for i in range(0, 2):
+            req = self._make_request({'Action': 'DescribeAutoScalingGroups'})
+            res = req.get_response(self.router)
+            ctx = req.environ[PHANTOM_REQUEST_CONTEXT_KEY]
+            self.assertEqual(res.headers['x-amzn-RequestId'], ctx.request_id)
+            self.assertTrue(("<RequestId>%s</RequestId>" % (ctx.request_id)) in res.body)
+            ids.append(ctx.request_id)
+        self.assertNotEqual(ids[0], ids[1])
+
+    def test_applications_made_once(self):
+        app = self.router._applications['DescribeAutoScalingGroups']
+        for i in range(0, 2):
+            req = self._make_request({'Action': 'DescribeAutoScalingGroups'})
+            req.get_response(self.router)
+        self.assertTrue(self.router._applications['DescribeAutoScalingGroups'] is app)
+        self.assertEqual(self.cfg.get_system_count, 1 + len(self.router._applications))
+
+    def test_bad_signature(self):
+        req = self._make_request({'Action': 'DescribeAutoScalingGroups'})
+        req.POST['Signature'] = 'notit'
+        res = req.get_response(self.router)
+        self.assertNotEqual(res.status_int, 200)
+        self.assertFalse(PHANTOM_REQUEST_CONTEXT_KEY in req.environ)
+
+
+if __name__ == '__main__':
+    unittest.main()
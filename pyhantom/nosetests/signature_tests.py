@@ -0,0 +1,48 @@
+import binascii
+import unittest
+import pyhantom.util
+from pyhantom.cache import TTLCache
+from pyhantom.util import aws4_signature, aws4_signing_key, aws4_sign
+
+# the key derivation example from the AWS signature version 4 documentation
+EXAMPLE_SECRET = 'wJalrXUtnFEMI/K7MDENG+bPxRfiCYEXAMPLEKEY'
+EXAMPLE_SCOPE = '20120215/us-east-1/iam/aws4_request'
+EXAMPLE_SIGNING_KEY = 'f4780e2d9f65fa895f9c67b32ce1baf0b0d8a43505a000a1a9e090d414db404d'
+
+
+class SigningKeyCacheTests(unittest.TestCase):
+
+    def setUp(self):
+        self._old_cache = pyhantom.util.g_signing_key_cache
+        pyhantom.util.g_signing_key_cache = TTLCache(max_entries=4)
+
+    def tearDown(self):
+        pyhantom.util.g_signing_key_cache = self._old_cache
+
+    def test_signing_key(self):
+        self.assertEqual(binascii.hexlify(aws4_signing_key(EXAMPLE_SECRET, EXAMPLE_SCOPE)), EXAMPLE_SIGNING_KEY)
+
+    def test_cached_signature(self):
+        access_dict = {'AWSAccessKeyId': 'AKIDEXAMPLE', 'CredentialScope': EXAMPLE_SCOPE}
+        expected = aws4_sign(binascii.unhexlify(EXAMPLE_SIGNING_KEY), "string to sign", hex=True)
+        for i in range(0, 3):
+            self.assertEqual(aws4_signature(None, "string to sign", EXAMPLE_SECRET, access_dict), expected)
+        self.assertEqual(pyhantom.util.g_signing_key_cache.hits, 2)
+        self.assertEqual(pyhantom.util.g_signing_key_cache.misses, 1)
+        self.assertTrue(pyhantom.util.signing_key_cache_hit_ratio() > 0.6)
+
+    def test_new_secret(self):
+        access_dict = {'AWSAccessKeyId': 'AKIDEXAMPLE', 'CredentialScope': EXAMPLE_SCOPE}
+        sig1 = aws4_signature(None, "string to sign", EXAMPLE_SECRET, access_dict)
+        sig2 = aws4_signature(None, "string to sign", "anothersecret", access_dict)
+        self.assertNotEqual(sig1, sig2)
+
+    def test_secret_not_kept(self):
+        access_dict = {'AWSAccessKeyId': 'AKIDEXAMPLE', 'CredentialScope': EXAMPLE_SCOPE}
+        aws4_signature(None, "string to sign", EXAMPLE_SECRET, access_dict)
+        for cache_key in pyhantom.util.g_signing_key_cache._entries.keys():
+            self.assertFalse(EXAMPLE_SECRET in cache_key)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,62 @@
+import os
+import tempfile
+import unittest
+from pyhantom.authz.simple_file import SimpleFileDataStore
+from pyhantom.nosetests.fake_epu import FakeClock
+from pyhantom.phantom_exceptions import PhantomAWSException
+
+
+class SimpleFileDataStoreTests(unittest.TestCase):
+
+    def setUp(self):
+        (osf, self.pwfile) = tempfile.mkstemp(prefix="/tmp/phantom")
+        os.close(osf)
+        self._write(["user1 secret1 name1", "user2 secret2 name2"])
+        self.clock = FakeClock()
+        self.authz = SimpleFileDataStore(self.pwfile, reload_interval=10, clock=self.clock)
+
+    def tearDown(self):
+        os.remove(self.pwfile)
+
+    def _write(self, lines):
+        fptr = open(self.pwfile, "w")
+        for l in lines:
+            fptr.write(l + "\n")
+        fptr.close()
+
+    def test_lookup(self):
+        user_obj = self.authz.get_user_object_by_access_id("user2")
+        self.assertEqual(user_obj.secret_key, "secret2")
+        self.assertEqual(user_obj.display_name, "name2")
+        try:
+            self.authz.get_user_object_by_access_id("user3")
+            self.fail("should have thrown an exception")
+        except PhantomAWSException:
+            pass
+
+    def test_reload_after_interval(self):
+        self.authz.get_user_object_by_access_id("user1")
+        self._write(["user1 secret1 name1", "user2 secret2 name2", "user3 secret3 name3"])
+
+        # the file is not looked at again until the interval passes
+        try:
+            self.authz.get_user_object_by_access_id("user3")
+            self.fail("should have thrown an exception")
+        except PhantomAWSException:
+            pass
+
+        self.clock.now = self.clock.now + 11
+        user_obj = self.authz.get_user_object_by_access_id("user3")
+        self.assertEqual(user_obj.secret_key, "secret3")
+
+    def test_bad_file(self):
+        self._write(["user1 secret1"])
+        try:
+            self.authz.get_user_object_by_access_id("user1")
+            self.fail("should have thrown an exception")
+        except PhantomAWSException, pae:
+            self.assertEqual(pae.title, "InternalFailure")
+
+
+if __name__ == '__main__':
+    unittest.main()
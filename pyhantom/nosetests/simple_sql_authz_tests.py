@@ -0,0 +1,62 @@
+import os
+import tempfile
+import threading
+import unittest
+import uuid
+from pyhantom.authz.simple_sql_db import SimpleSQL, SimpleSQLSessionMaker
+from pyhantom.phantom_exceptions import PhantomAWSException
+
+
+class PooledSimpleSQLTests(unittest.TestCase):
+
+    def setUp(self):
+        (osf, self.db_fname) = tempfile.mkstemp(prefix="/tmp/phantom")
+        os.close(osf)
+        self.sessionmaker = SimpleSQLSessionMaker("sqlite:///%s" % (self.db_fname), pool_size=4, pool_pre_ping=True)
+        self.authz = SimpleSQL(self.sessionmaker)
+
+    def tearDown(self):
+        os.remove(self.db_fname)
+
+    def test_add_lookup(self):
+        access_key = str(uuid.uuid4())
+        self.authz.add_user("tester", access_key, "secret")
+        user_obj = self.authz.get_user_object_by_access_id(access_key)
+        self.assertEqual(user_obj.secret_key, "secret")
+        user_obj = self.authz.get_user_object_by_display_name("tester")
+        self.assertEqual(user_obj.access_id, access_key)
+        self.authz.remove_user(access_key)
+        try:
+            self.authz.get_user_object_by_access_id(access_key)
+            self.fail("should have thrown an exception")
+        except PhantomAWSException:
+            pass
+
+    def test_shared_across_threads(self):
+        access_keys = []
+        for i in range(0, 10):
+            access_key = str(uuid.uuid4())
+            self.authz.add_user("tester%d" % (i), access_key, "secret%d" % (i))
+            access_keys.append(access_key)
+
+        errors = []
+        def worker():
+            try:
+                for j in range(0, 50):
+                    for i in range(0, len(access_keys)):
+                        user_obj = self.authz.get_user_object_by_access_id(access_keys[i])
+                        if user_obj.secret_key != "secret%d" % (i):
+                            errors.append("wrong secret for %s" % (access_keys[i]))
+            except Exception, ex:
+                errors.append(str(ex))
+
+        threads = [threading.Thread(target=worker) for i in range(0, 8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEqual(errors, [])
+
+
+if __name__ == '__main__':
+    unittest.main()
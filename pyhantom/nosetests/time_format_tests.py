@@ -0,0 +1,64 @@
+import datetime
+import re
+import unittest
+from pyhantom.util import _get_time, _get_amz_time, make_time, _make_timestamp
+
+
+# the strptime/strftime versions these replaced, kept to check against
+def _old_get_time(str_time):
+    str_time = str_time.replace("Z", "UTC")
+    str_time = re.sub('\..*', "UTC", str_time)
+    return datetime.datetime.strptime(str_time, '%Y-%m-%dT%H:%M:%S%Z')
+
+def _old_make_time(datetimeobj):
+    return datetime.datetime.strftime(datetimeobj, '%Y-%m-%dT%H:%M:%S.%fZ')
+
+def _old_amz_timestamp(dt_str):
+    dt = datetime.datetime.strptime(dt_str.replace('Z', 'UTC'), '%Y%m%dT%H%M%S%Z')
+    return dt.strftime('%Y-%m-%dT%H:%M:%SZ')
+
+
+class TimeFormatTests(unittest.TestCase):
+
+    times = [datetime.datetime(2012, 5, 1, 12, 30, 15, 12), datetime.datetime(1999, 12, 31, 23, 59, 59, 999999),
+             datetime.datetime(2024, 2, 29, 0, 0, 0), datetime.datetime(2013, 1, 9, 7, 5, 3, 100000)]
+
+    def test_make_time_matches(self):
+        for dt in self.times:
+            self.assertEqual(make_time(dt), _old_make_time(dt))
+            # and again from the memo
+            self.assertEqual(make_time(dt), _old_make_time(dt))
+
+    def test_get_time_matches(self):
+        for dt in self.times:
+            for s in [make_time(dt), dt.strftime('%Y-%m-%dT%H:%M:%SZ'), dt.strftime('%Y-%m-%dT%H:%M:%SUTC'),
+                      dt.strftime('%Y-%m-%dT%H:%M:%S.%f'), unicode(make_time(dt))]:
+                self.assertEqual(_get_time(s), _old_get_time(s))
+                self.assertEqual(_get_time(s), _old_get_time(s))
+
+    def test_round_trip(self):
+        for dt in self.times:
+            self.assertEqual(_get_time(make_time(dt)), dt.replace(microsecond=0))
+
+    def test_offsets(self):
+        self.assertEqual(_get_time("2012-05-01T12:30:15+02:00"), datetime.datetime(2012, 5, 1, 10, 30, 15))
+        self.assertEqual(_get_time("2012-05-01T23:30:15.5-0100"), datetime.datetime(2012, 5, 2, 0, 30, 15))
+
+    def test_fraction_without_zone(self):
+        for s in ["2012-05-01T12:30:15.123", "2012-05-01T12:30:15."]:
+            self.assertEqual(_get_time(s), _old_get_time(s))
+
+    def test_bad_times(self):
+        for s in ["", "2012-05-01", "2012-13-01T12:30:15Z", "2012-05-01T12:30:15Zjunk", "2012-05-01 12:30:15Z",
+                  "2012-05-01T12:30:15Z\n", "2012-02-30T12:30:15Z", "2012-05-01T12:30:15", "2012-05-01T12:30:15+02"]:
+            self.assertRaises(ValueError, _get_time, s)
+
+    def test_amz_date(self):
+        for s in ["20120501T123015Z", "19991231T235959Z"]:
+            self.assertEqual(_make_timestamp(_get_amz_time(s)), _old_amz_timestamp(s))
+        self.assertRaises(ValueError, _get_amz_time, "2012-05-01T12:30:15Z")
+        self.assertRaises(ValueError, _get_amz_time, "20121301T123015Z")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,224 @@
+import datetime
+import unittest
+import xml.dom.minidom
+from webob import Response
+from pyhantom.authz import PhantomUserObject
+from pyhantom.nosetests.fake_epu import FakeConfig
+from pyhantom.out_data_types import AWSListType, AutoScalingGroupType, DateTimeType, InstanceType, LaunchConfigurationType, InstanceMonitoringType, TagDescription
+from pyhantom.wsgiapps import PhantomBaseService
+from pyhantom.xml_writer import XMLStreamWriter
+
+NS = u"http://autoscaling.amazonaws.com/doc/2009-05-15/"
+
+
+def _make_asg(name, instance_count):
+    asg = AutoScalingGroupType('AutoScalingGroup')
+    asg.AutoScalingGroupName = name
+    asg.AutoScalingGroupARN = "arn:%s" % (name)
+    asg.AvailabilityZones = AWSListType('AvailabilityZones')
+    asg.AvailabilityZones.add_item("hotel")
+    asg.CreatedTime = DateTimeType('CreatedTime', datetime.datetime(2012, 5, 1, 12, 30, 15, 12))
+    asg.Cooldown = 0
+    asg.DesiredCapacity = instance_count
+    asg.EnabledMetrics = AWSListType('EnabledMetrics')
+    asg.HealthCheckGracePeriod = 0
+    asg.HealthCheckType = None
+    asg.LaunchConfigurationName = "dt@hotel"
+    asg.LoadBalancerNames = AWSListType('LoadBalancerNames')
+    asg.MaxSize = instance_count
+    asg.MinSize = instance_count
+    asg.PlacementGroup = ""
+    asg.Status = "Healthy & <running>"
+    asg.SuspendedProcesses = AWSListType('SuspendedProcesses')
+    asg.Tags = AWSListType('Tags')
+    td = TagDescription('Tag')
+    td.Key = "key"
+    td.PropagateAtLaunch = True
+    td.Value = 'a "quoted" value'
+    asg.Tags.add_item(td)
+    asg.Instances = AWSListType('Instances')
+    for i in range(0, instance_count):
+        inst = InstanceType('Instance')
+        inst.AutoScalingGroupName = name
+        inst.AvailabilityZone = "hotel"
+        inst.HealthStatus = "Healthy"
+        inst.InstanceId = "i-%08d" % (i)
+        inst.LaunchConfigurationName = "dt@hotel"
+        inst.LifecycleState = "600-RUNNING"
+        asg.Instances.add_item(inst)
+    return asg
+
+
+def _dom_body(l, doc_name, result_name, list_name, next_token=None):
+    doc = xml.dom.minidom.Document()
+    el = doc.createElementNS(NS, doc_name)
+    el.setAttribute("xmlns", NS)
+    doc.appendChild(el)
+    resp_el = doc.createElement('ResponseMetadata')
+    el.appendChild(resp_el)
+    reqid_el = doc.createElement('RequestId')
+    resp_el.appendChild(reqid_el)
+    reqid_el.appendChild(doc.createTextNode("reqid"))
+
+    dlcr_el = doc.createElement(result_name)
+    el.appendChild(dlcr_el)
+    lc_el = doc.createElement(list_name)
+    dlcr_el.appendChild(lc_el)
+    if next_token:
+        nt_el = doc.createElement('NextToken')
+        el.appendChild(nt_el)
+        nt_el.appendChild(doc.createTextNode(next_token))
+    l.add_xml(doc, lc_el)
+    return doc.documentElement.toxml()
+
+
+def _writer_body(l, doc_name, result_name, list_name, next_token=None):
+    writer = XMLStreamWriter()
+    writer.start(doc_name, [("xmlns", NS)])
+    writer.start('ResponseMetadata')
+    writer.element('RequestId', "reqid")
+    writer.end()
+    writer.start(result_name)
+    writer.start(list_name)
+    l.write_xml(writer)
+    writer.end()
+    writer.end()
+    if next_token:
+        writer.element('NextToken', next_token)
+    writer.end()
+    return writer
+
+
+class XMLStreamWriterTests(unittest.TestCase):
+
+    def test_empty_and_text(self):
+        writer = XMLStreamWriter()
+        writer.start("a")
+        writer.element("b")
+        writer.element("c", "")
+        writer.element("d", "x<y")
+        writer.end()
+        self.assertEqual(writer.getvalue(), u"<a><b/><c></c><d>x&lt;y</d></a>")
+
+    def test_asgs_match_minidom(self):
+        l = AWSListType('AutoScalingGroups')
+        for i in range(0, 5):
+            l.add_item(_make_asg("asg%d" % (i), i))
+        args = (l, "DescribeAutoScalingGroupsResponse", "DescribeAutoScalingGroupsResult", "AutoScalingGroups", "asg4")
+        self.assertEqual(_writer_body(*args).getvalue(), _dom_body(*args))
+
+    def test_launch_configs_match_minidom(self):
+        l = AWSListType('LaunchConfigurations')
+        lc = LaunchConfigurationType('LaunchConfiguration')
+        lc.BlockDeviceMappings = AWSListType('BlockDeviceMappings')
+        lc.CreatedTime = DateTimeType('CreatedTime', datetime.datetime.utcnow())
+        lc.ImageId = "ami-1234"
+        lc.InstanceMonitoring = InstanceMonitoringType('InstanceMonitoring')
+        lc.InstanceMonitoring.Enabled = False
+        lc.InstanceType = "m1.small"
+        lc.KernelId = None
+        lc.LaunchConfigurationName = "dt@hotel"
+        lc.SecurityGroups = AWSListType('SecurityGroups')
+        lc.SecurityGroups.add_item("default")
+        lc.SecurityGroups.add_item(None)
+        lc.UserData = None
+        l.add_item(lc)
+        args = (l, "DescribeLaunchConfigurationsResponse", "DescribeLaunchConfigurationsResult", "LaunchConfigurations")
+        self.assertEqual(_writer_body(*args).getvalue(), _dom_body(*args))
+
+    def test_iter_encoded(self):
+        l = AWSListType('AutoScalingGroups')
+        l.add_item(_make_asg("asg", 50))
+        args = (l, "DescribeAutoScalingGroupsResponse", "DescribeAutoScalingGroupsResult", "AutoScalingGroups")
+        writer = _writer_body(*args)
+        chunks = list(writer.iter_encoded("UTF-8", chunk_size=512))
+        self.assertTrue(len(chunks) > 1)
+        self.assertEqual("".join(chunks), _dom_body(*args).encode("UTF-8"))
+
+    def test_drain(self):
+        writer = XMLStreamWriter()
+        writer.start("a")
+        writer.element("b", "x")
+        self.assertEqual(writer.pending_size(), len("<a><b>x</b>"))
+        self.assertEqual(writer.drain(), "<a><b>x</b>")
+        self.assertEqual(writer.pending_size(), 0)
+        writer.end()
+        self.assertEqual(writer.pending_size(), len("</a>"))
+        self.assertEqual(writer.drain(), "</a>")
+
+
+class StreamResponseTests(unittest.TestCase):
+
+    def test_sent_while_written(self):
+        l = AWSListType('AutoScalingGroups')
+        for i in range(0, 20):
+            l.add_item(_make_asg("asg%02d" % (i), 2))
+        written = []
+
+        def write_body(writer):
+            writer.start('DescribeAutoScalingGroupsResult')
+            writer.start('AutoScalingGroups')
+            for asg in l.iter_write_xml(writer):
+                written.append(asg)
+                yield asg
+            writer.end()
+            writer.end()
+            writer.end()
+
+        service = PhantomBaseService("DescribeAutoScalingGroupsResponse", cfg=FakeConfig())
+        writer = XMLStreamWriter()
+        writer.start("DescribeAutoScalingGroupsResponse", [("xmlns", NS)])
+        writer.start('ResponseMetadata')
+        writer.element('RequestId', "reqid")
+        writer.end()
+        res = Response()
+        service.stream_response_body(res, writer, write_body(writer), PhantomUserObject("key", "secret", "tester"), chunk_size=2048)
+        self.assertEqual(written, [])
+
+        chunks = []
+        written_at_first_chunk = None
+        for chunk in res.app_iter:
+            if written_at_first_chunk is None:
+                written_at_first_chunk = len(written)
+            chunks.append(chunk)
+        self.assertTrue(written_at_first_chunk < 20)
+        self.assertTrue(len(chunks) > 1)
+        args = (l, "DescribeAutoScalingGroupsResponse", "DescribeAutoScalingGroupsResult", "AutoScalingGroups")
+        self.assertEqual("".join(chunks), _dom_body(*args).encode("UTF-8"))
+
+
+class OutTypeSlotsTests(unittest.TestCase):
+
+    def test_no_instance_dict(self):
+        asg = _make_asg("asg", 2)
+        for o in [asg, asg.Instances, asg.Instances.type_list[0], asg.CreatedTime, asg.Tags.type_list[0]]:
+            self.assertFalse(hasattr(o, '__dict__'))
+
+    def test_members_only(self):
+        inst = InstanceType('Instance')
+        inst.InstanceId = "i-1"
+        self.assertRaises(AttributeError, setattr, inst, 'InstanceID', "i-1")
+        self.assertRaises(AttributeError, getattr, inst, 'HealthStatus')
+        self.assertEqual(set(InstanceType.__slots__), set(InstanceType.members_type_dict.keys()))
+
+    def test_members_in_name_order(self):
+        inst = InstanceType('Instance')
+        inst.InstanceId = "i-1"
+        inst.AvailabilityZone = "hotel"
+        writer = XMLStreamWriter()
+        writer.start('member')
+        inst.write_xml(writer)
+        writer.end()
+        self.assertEqual(writer.getvalue(), u"<member><AutoScalingGroupName/><AvailabilityZone>hotel</AvailabilityZone>"
+            u"<HealthStatus/><InstanceId>i-1</InstanceId><LaunchConfigurationName/><LifecycleState/></member>")
+        names = [m for (m, encoder) in AutoScalingGroupType._xml_plan]
+        self.assertEqual(names, sorted(AutoScalingGroupType.members_type_dict.keys()))
+
+    def test_list_members_made(self):
+        asg = AutoScalingGroupType('AutoScalingGroup')
+        self.assertEqual(asg.Instances.name, 'Instances')
+        self.assertEqual(asg.Instances.get_length(), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -2,6 +2,8 @@ import datetime
 from pyhantom.util import make_time, phantom_is_primative
 
 class AWSListType(object):
+    __slots__ = ('type_list', 'name')
+
     def __init__(self, name):
         self.type_list = []
         self.name = name
@@ -24,33 +26,96 @@ class AWSListType(object):
                 #l.add_xml(doc, l_el)
                 l.add_xml(doc, member_el)
 
+    def write_xml(self, writer):
+        for l in self.iter_write_xml(writer):
+            pass
+
+    def iter_write_xml(self, writer):
+        """Write the members one at a time, yielding after each one"""
+        for l in self.type_list:
+            writer.start('member')
+            if l is not None:
+                if phantom_is_primative(type(l)):
+                    writer.text(str(l))
+                else:
+                    l.write_xml(writer)
+            writer.end()
+            yield l
+
     def get_length(self):
         return len(self.type_list)
 
+class _AWSTypeMeta(type):
+    """Gives every AWSType subclass a __slots__ made from the names in its
+    members_type_dict, plus any __slots__ the class lists itself, so that
+    instances carry no per-object __dict__.  Setting a name that is not a
+    member raises AttributeError.
+
+    It also works out the class's serialization plan, _xml_plan: one
+    (member name, encoder) pair per member, sorted by member name.  The
+    encoder turns a primitive value into element text, it is None for a
+    member that serializes itself (lists, dates and nested types)."""
+
+    def __new__(mcs, name, bases, dct):
+        inherited = set()
+        for base in bases:
+            for klass in base.__mro__:
+                inherited.update(klass.__dict__.get('__slots__', ()))
+        slots = list(dct.get('__slots__', ()))
+        for m in sorted(dct.get('members_type_dict', {}).keys()):
+            if m not in inherited and m not in slots:
+                slots.append(m)
+        dct['__slots__'] = tuple(slots)
+        cls = type.__new__(mcs, name, bases, dct)
+
+        plan = []
+        for (m, t) in sorted(cls.members_type_dict.items()):
+            if phantom_is_primative(t):
+                plan.append((m, str))
+            else:
+                plan.append((m, None))
+        cls._xml_plan = tuple(plan)
+        return cls
+
+
 class AWSType(object):
+    """Members are written out as child elements in alphabetical order of
+    their names, whatever the order of members_type_dict.  A member that
+    was never set or is None is written as an empty element."""
+    __metaclass__ = _AWSTypeMeta
+    __slots__ = ('name',)
     members_type_dict = {}
-    
+
     def __init__(self, name):
         self.name = name
         for m in self.members_type_dict:
             if self.members_type_dict[m] == AWSListType:
-                self.__dict__[m] = AWSListType(m)
+                setattr(self, m, AWSListType(m))
 
     def add_xml(self, doc, container_element):
-        for m in self.members_type_dict:
+        for (m, encoder) in self._xml_plan:
             i_el = doc.createElement(m)
             container_element.appendChild(i_el)
-            if m in self.__dict__:
-                v = self.__dict__[m]
-                if v is None:
-                    continue
-                t = self.members_type_dict[m]
-                if phantom_is_primative(t):
-                    txt_el = doc.createTextNode(str(v))
+            v = getattr(self, m, None)
+            if v is not None:
+                if encoder is not None:
+                    txt_el = doc.createTextNode(encoder(v))
                     i_el.appendChild(txt_el)
                 else:
                     v.add_xml(doc, i_el)
 
+    def write_xml(self, writer):
+        for (m, encoder) in self._xml_plan:
+            v = getattr(self, m, None)
+            if v is None:
+                writer.element(m)
+            elif encoder is not None:
+                writer.element(m, encoder(v))
+            else:
+                writer.start(m)
+                v.write_xml(writer)
+                writer.end()
+
 class EbsType(AWSType):
     members_type_dict = {'SnapshotId': str, 'VolumeSize': int}
 
@@ -64,6 +129,7 @@ class BlockDeviceMappingType(AWSType):
         AWSType.__init__(self, name)
 
 class DateTimeType(AWSType):
+    __slots__ = ('date_time',)
 
     def __init__(self, name, date_time):
         AWSType.__init__(self, name)
@@ -74,6 +140,9 @@ class DateTimeType(AWSType):
         txt_el = doc.createTextNode(tm_str)
         container_element.appendChild(txt_el)
 
+    def write_xml(self, writer):
+        writer.text(make_time(self.date_time))
+
 class TagDescription(AWSType):
     members_type_dict = {'Key': str, 'PropagateAtLaunch': bool, 'ResourceId' : str,
                          'ResourceType': str, 'Value': str}
@@ -114,6 +183,20 @@ class LaunchConfigurationType(AWSType):
         if lc.SecurityGroups:
             for sg in lc.SecurityGroups:
                 self.SecurityGroups.add_item(sg)
+        self.BlockDeviceMappings = AWSListType('BlockDeviceMappings')
+        if lc.BlockDeviceMappings:
+            for bdm_in in lc.BlockDeviceMappings:
+                bdm = BlockDeviceMappingType('BlockDeviceMapping')
+                bdm.DeviceName = bdm_in.DeviceName
+                bdm.VirtualName = bdm_in.VirtualName
+                bdm.Ebs = None
+                snapshot_id = bdm_in.EbsSnapshotId
+                volume_size = bdm_in.EbsVolumeSize
+                if snapshot_id is not None or volume_size is not None:
+                    bdm.Ebs = EbsType('Ebs')
+                    bdm.Ebs.SnapshotId = snapshot_id
+                    bdm.Ebs.VolumeSize = volume_size
+                self.BlockDeviceMappings.add_item(bdm)
 
 class EnabledMetricType(AWSType):
     members_type_dict = {'Granularity': str, 'Metric': str}
@@ -0,0 +1,168 @@
+import logging
+import socket
+import threading
+import time
+from ceiclient.connection import DashiCeiConnection
+from ceiclient.exception import CeiClientError
+from pyhantom.phantom_exceptions import PhantomAWSException
+from pyhantom.util import log, submit_metric
+
+DEFAULT_DASHI_POOL_SIZE = 8
+DEFAULT_DASHI_POOL_MAX_IDLE = 300
+DEFAULT_DASHI_POOL_BACKOFF = 0.5
+DEFAULT_DASHI_POOL_MAX_BACKOFF = 30
+DEFAULT_DASHI_POOL_WAIT = 15
+DEFAULT_DASHI_TIMEOUT = 60
+
+# errors that mean the connection itself is no good, anything else (a DashiError
+# from the remote service for example) leaves the connection in the pool
+_CONNECTION_ERRORS = (CeiClientError, socket.error, IOError)
+
+
+class _PooledConnection(object):
+
+    def __init__(self, index):
+        self.index = index
+        self.conn = None
+        self.in_flight = 0
+        self.last_used = 0
+        self.retry_at = 0
+        self.backoff = 0
+
+
+class DashiConnectionPool(object):
+    """A fixed size pool of dashi connections that looks like a single
+    DashiCeiConnection, so EPUMClient and DTRSClient can be handed the pool
+    unchanged.  Each call borrows an idle connection for its duration.
+
+    Connections are opened when first needed.  A connection that raised a
+    connection error, or that sat idle for longer than max_idle seconds
+    (brokers and firewalls drop quiet AMQP connections), is replaced before
+    it is handed out again.  Failed reconnects are retried with exponential
+    backoff from backoff up to max_backoff seconds.  The number of calls in
+    flight on each connection is sent to statsd as a gauge."""
+
+    def __init__(self, factory, size=DEFAULT_DASHI_POOL_SIZE, max_idle=DEFAULT_DASHI_POOL_MAX_IDLE,
+                 backoff=DEFAULT_DASHI_POOL_BACKOFF, max_backoff=DEFAULT_DASHI_POOL_MAX_BACKOFF,
+                 wait=DEFAULT_DASHI_POOL_WAIT, statsd_client=None, clock=time.time):
+        self._factory = factory
+        self._max_idle = max_idle
+        self._backoff = backoff
+        self._max_backoff = max_backoff
+        self._wait = wait
+        self._statsd_client = statsd_client
+        self._clock = clock
+        self._cond = threading.Condition()
+        self._slots = [_PooledConnection(i) for i in range(0, size)]
+        self._idle = list(self._slots)
+
+    def _metric(self, kind, name, value=None):
+        submit_metric(self._statsd_client, kind, 'autoscale.dashi.pool.%s' % (name), value)
+
+    def _acquire(self):
+        deadline = self._clock() + self._wait
+        with self._cond:
+            while True:
+                now = self._clock()
+                # prefer connections that are already open
+                ready = [s for s in self._idle if s.conn is not None] + \
+                        [s for s in self._idle if s.conn is None and s.retry_at <= now]
+                if ready:
+                    slot = ready[0]
+                    self._idle.remove(slot)
+                    slot.in_flight = slot.in_flight + 1
+                    break
+                remaining = deadline - now
+                if remaining <= 0:
+                    log(logging.ERROR, "No dashi connection available after %s seconds", self._wait)
+                    raise PhantomAWSException('ServiceUnavailable', details="no connection to the EPU services")
+                # wake up at least once a second to see if a backoff has run out
+                self._cond.wait(min(remaining, 1))
+        self._metric('gauge', '%d.in_flight' % (slot.index), slot.in_flight)
+        return slot
+
+    def _release(self, slot):
+        with self._cond:
+            slot.in_flight = slot.in_flight - 1
+            slot.last_used = self._clock()
+            self._idle.append(slot)
+            self._cond.notify()
+        self._metric('gauge', '%d.in_flight' % (slot.index), slot.in_flight)
+
+    def _discard(self, slot):
+        conn = slot.conn
+        slot.conn = None
+        if conn is None:
+            return
+        try:
+            conn.disconnect()
+        except Exception, ex:
+            log(logging.WARN, "Error while disconnecting dashi connection %d: %s", slot.index, str(ex))
+
+    def _connect(self, slot):
+        if slot.conn is not None and self._max_idle is not None and self._clock() - slot.last_used > self._max_idle:
+            log(logging.INFO, "Replacing dashi connection %d after %d idle seconds", slot.index, self._clock() - slot.last_used)
+            self._discard(slot)
+        if slot.conn is not None:
+            return
+        try:
+            slot.conn = self._factory()
+        except Exception, ex:
+            if slot.backoff:
+                slot.backoff = min(slot.backoff * 2, self._max_backoff)
+            else:
+                slot.backoff = self._backoff
+            slot.retry_at = self._clock() + slot.backoff
+            log(logging.ERROR, "Failed to connect dashi connection %d, retrying in %s seconds: %s", slot.index, slot.backoff, str(ex))
+            self._metric('incr', 'connect_failure')
+            raise PhantomAWSException('ServiceUnavailable', details="could not connect to the EPU services")
+        slot.backoff = 0
+        slot.retry_at = 0
+        self._metric('incr', 'connect')
+
+    def _run(self, method, service, operation, **kwargs):
+        slot = self._acquire()
+        try:
+            self._connect(slot)
+            try:
+                return getattr(slot.conn, method)(service, operation, **kwargs)
+            except _CONNECTION_ERRORS:
+                log(logging.ERROR, "dashi connection %d failed, it will be replaced", slot.index, printstack=True)
+                self._discard(slot)
+                raise
+        finally:
+            self._release(slot)
+
+    def call(self, service, operation, **kwargs):
+        return self._run('call', service, operation, **kwargs)
+
+    def fire(self, service, operation, **kwargs):
+        return self._run('fire', service, operation, **kwargs)
+
+    def disconnect(self):
+        with self._cond:
+            for slot in self._slots:
+                self._discard(slot)
+
+    def in_flight(self):
+        return [slot.in_flight for slot in self._slots]
+
+
+def make_dashi_pool(cfg, statsd_client=None):
+    """Build the pool described by the phantom.system section of cfg"""
+    system = cfg.phantom.system
+    ssl = system.rabbit_ssl
+    log(logging.INFO, "Connecting to epu messaging fabric: %s, %s, XXXXX, %d, ssl=%s" % (system.rabbit, system.rabbit_user, system.rabbit_port, str(ssl)))
+    timeout = getattr(system, 'dashi_timeout', DEFAULT_DASHI_TIMEOUT)
+
+    def factory():
+        return DashiCeiConnection(system.rabbit, system.rabbit_user, system.rabbit_pw, exchange=system.rabbit_exchange,
+                                  timeout=timeout, port=system.rabbit_port, ssl=ssl)
+
+    return DashiConnectionPool(factory,
+                               size=getattr(system, 'dashi_pool_size', DEFAULT_DASHI_POOL_SIZE),
+                               max_idle=getattr(system, 'dashi_pool_max_idle', DEFAULT_DASHI_POOL_MAX_IDLE),
+                               backoff=getattr(system, 'dashi_pool_backoff', DEFAULT_DASHI_POOL_BACKOFF),
+                               max_backoff=getattr(system, 'dashi_pool_max_backoff', DEFAULT_DASHI_POOL_MAX_BACKOFF),
+                               wait=getattr(system, 'dashi_pool_wait', DEFAULT_DASHI_POOL_WAIT),
+                               statsd_client=statsd_client)
@@ -0,0 +1,67 @@
+import copy
+import threading
+
+DEFAULT_DOMAIN_CACHE_TTL = 3
+DEFAULT_DOMAIN_CACHE_MAX_ENTRIES = 4096
+
+
+class CachedEPUMClient(object):
+    """Wraps an EPUMClient with a short lived cache of each user's domain
+    list and domain descriptions.  Concurrent misses for the same entry share
+    one RPC.  Domains changed through this object are dropped from the cache
+    right away, anything else is seen once its entry expires.  Callers get
+    their own copy of every description.  Calls that are not cached go
+    straight to the wrapped client."""
+
+    def __init__(self, epum_client, cache):
+        self._epum_client = epum_client
+        self._cache = cache
+        self._lock = threading.Lock()
+        # caller -> names of the domains we may hold a description of
+        self._described = {}
+
+    def __getattr__(self, name):
+        return getattr(self._epum_client, name)
+
+    def list_domains(self, caller=None):
+        domains = self._cache.get_or_load(('list', caller), lambda: self._epum_client.list_domains(caller=caller))
+        return list(domains)
+
+    def describe_domain(self, name, caller=None):
+        with self._lock:
+            self._described.setdefault(caller, set()).add(name)
+        desc = self._cache.get_or_load(('domain', caller, name), lambda: self._epum_client.describe_domain(name, caller=caller))
+        return copy.deepcopy(desc)
+
+    def _forget_domain(self, caller, name):
+        self._cache.invalidate(('domain', caller, name))
+        with self._lock:
+            self._described.get(caller, set()).discard(name)
+
+    def forget_user(self, caller):
+        """Drop everything cached for caller"""
+        with self._lock:
+            names = self._described.pop(caller, set())
+        for name in names:
+            self._cache.invalidate(('domain', caller, name))
+        self._cache.invalidate(('list', caller))
+
+    def add_domain(self, name, definition_id, config, caller=None):
+        try:
+            return self._epum_client.add_domain(name, definition_id, config, caller=caller)
+        finally:
+            self._cache.invalidate(('list', caller))
+            self._forget_domain(caller, name)
+
+    def reconfigure_domain(self, name, config, caller=None):
+        try:
+            return self._epum_client.reconfigure_domain(name, config, caller=caller)
+        finally:
+            self._forget_domain(caller, name)
+
+    def remove_domain(self, name, caller=None):
+        try:
+            return self._epum_client.remove_domain(name, caller=caller)
+        finally:
+            self._cache.invalidate(('list', caller))
+            self._forget_domain(caller, name)
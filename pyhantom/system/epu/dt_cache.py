@@ -0,0 +1,66 @@
+import copy
+import time
+from pyhantom.util import submit_metric
+
+DEFAULT_DT_CACHE_TTL = 10
+DEFAULT_DT_CACHE_MAX_ENTRIES = 1024
+
+
+class CachedDTRSClient(object):
+    """Wraps a DTRSClient with a read-through cache of each user's DT list
+    and DT descriptions.  Writes made through this object invalidate the
+    entries they change.  Changes made by anyone else are seen once the
+    entries expire.  Callers get their own copy of every description
+    because EPUSystem edits them in place before update_dt."""
+
+    def __init__(self, dtrs_client, cache, statsd_client=None, clock=time.time):
+        self._dtrs_client = dtrs_client
+        self._cache = cache
+        self._statsd_client = statsd_client
+        self._clock = clock
+
+    def _metric(self, kind, name, value=None):
+        submit_metric(self._statsd_client, kind, 'autoscale.dtrs.cache.%s' % (name), value)
+
+    def _read_through(self, key, load):
+        loaded = []
+
+        def load_entry():
+            loaded.append(True)
+            fetched = self._clock()
+            return (fetched, load())
+
+        (fetched, value) = self._cache.get_or_load(key, load_entry)
+        if loaded:
+            self._metric('incr', 'miss')
+        else:
+            self._metric('incr', 'hit')
+            # how old the data we hand back is, in milliseconds
+            self._metric('timing', 'age', (self._clock() - fetched) * 1000)
+        return copy.deepcopy(value)
+
+    def list_dts(self, caller):
+        return self._read_through(('list', caller), lambda: self._dtrs_client.list_dts(caller=caller))
+
+    def describe_dt(self, caller, dt_name):
+        return self._read_through(('dt', caller, dt_name), lambda: self._dtrs_client.describe_dt(caller, dt_name))
+
+    def add_dt(self, caller, dt_name, dt_definition):
+        try:
+            return self._dtrs_client.add_dt(caller, dt_name, dt_definition)
+        finally:
+            self._cache.invalidate(('list', caller))
+            self._cache.invalidate(('dt', caller, dt_name))
+
+    def update_dt(self, caller, dt_name, dt_definition):
+        try:
+            return self._dtrs_client.update_dt(caller, dt_name, dt_definition)
+        finally:
+            self._cache.invalidate(('dt', caller, dt_name))
+
+    def remove_dt(self, caller, dt_name):
+        try:
+            return self._dtrs_client.remove_dt(caller, dt_name)
+        finally:
+            self._cache.invalidate(('list', caller))
+            self._cache.invalidate(('dt', caller, dt_name))
@@ -4,11 +4,17 @@ import logging
 from pyhantom.out_data_types import InstanceType, AWSListType, LaunchConfigurationType, InstanceMonitoringType, DateTimeType, AutoScalingGroupType
 from pyhantom.system import SystemAPI
 from pyhantom.phantom_exceptions import PhantomAWSException
-from ceiclient.connection import DashiCeiConnection
 from ceiclient.client import DTRSClient, EPUMClient
-from pyhantom.util import log, LogEntryDecorator, _get_time, make_time
+from pyhantom.util import log, LogEntryDecorator, _get_time, make_time, submit_metric
 from dashi import DashiError
 from pyhantom.system.epu.definitions import tags_to_definition, load_known_definitions
+from pyhantom.system.epu.instance_index import InstanceIndex
+from pyhantom.system.epu.dt_cache import CachedDTRSClient, DEFAULT_DT_CACHE_TTL, DEFAULT_DT_CACHE_MAX_ENTRIES
+from pyhantom.system.epu.domain_cache import CachedEPUMClient, DEFAULT_DOMAIN_CACHE_TTL, DEFAULT_DOMAIN_CACHE_MAX_ENTRIES
+from pyhantom.system.epu.dashi_pool import make_dashi_pool
+from pyhantom.system.epu.rpc import AsyncRPC, EPUM_WRITE_METHODS, DTRS_WRITE_METHODS, DEFAULT_RPC_WORKERS, DEFAULT_RPC_MAX_IN_FLIGHT, DEFAULT_RPC_TIMEOUT
+from pyhantom.system.epu.read_model import DomainReadModel, DomainSynchronizer, DEFAULT_READ_MODEL_INTERVAL, DEFAULT_READ_MODEL_MAX_STALENESS, DEFAULT_READ_MODEL_IDLE_TIMEOUT
+from pyhantom.cache import TTLCache
 
 DEFAULT_OPENTSDB_HOST = 'localhost'
 DEFAULT_OPENTSDB_PORT = 4242
@@ -32,7 +38,7 @@ def _is_healthy(state):
         else:
             return "Healthy"
     except:
-        log(logging.WARN, "A weird state was found %s" % (state))
+        log(logging.WARN, "A weird state was found %s", state)
         return "Unhealthy"
 
 def _get_key_or_none(config, k):
@@ -41,7 +47,7 @@ def _get_key_or_none(config, k):
     return config[k]
 
 def convert_instance_type(name, inst):
-    log(logging.DEBUG, "Converting instance %s" %(str(inst)))
+    log(logging.DEBUG, "Converting instance %s", inst)
     out_t = InstanceType('Instance')
 
     out_t.AutoScalingGroupName = name
@@ -61,7 +67,7 @@ def convert_instance_type(name, inst):
 
 def convert_epu_description_to_asg_out(desc, name):
 
-    log(logging.DEBUG, "conversion description: %s" %(str(desc)))
+    log(logging.DEBUG, "conversion description: %s", desc)
 
     config = desc['config']['engine_conf']
     
@@ -111,15 +117,12 @@ def convert_epu_description_to_asg_out(desc, name):
 
 class EPUSystem(SystemAPI):
 
-    def __init__(self, cfg):
-        ssl = cfg.phantom.system.rabbit_ssl
-        self._rabbit = cfg.phantom.system.rabbit
-        self._rabbit_port = cfg.phantom.system.rabbit_port
-        self._rabbitpw = cfg.phantom.system.rabbit_pw
-        self._rabbituser = cfg.phantom.system.rabbit_user
-        self._rabbitexchange = cfg.phantom.system.rabbit_exchange
-        log(logging.INFO, "Connecting to epu messaging fabric: %s, %s, XXXXX, %d, ssl=%s" % (self._rabbit, self._rabbituser, self._rabbit_port, str(ssl)))
-        self._dashi_conn = DashiCeiConnection(self._rabbit, self._rabbituser, self._rabbitpw, exchange=self._rabbitexchange, timeout=60, port=self._rabbit_port, ssl=ssl)
+    def __init__(self, cfg, epum_client=None, dtrs_client=None, statsd_client=None):
+        self._statsd_client = statsd_client
+        if epum_client is None or dtrs_client is None:
+            self._dashi_conn = make_dashi_pool(cfg, statsd_client=statsd_client)
+            epum_client = EPUMClient(self._dashi_conn)
+            dtrs_client = DTRSClient(self._dashi_conn)
 
         try:
             self._opentsdb_host = cfg.phantom.sensor.opentsdb.host
@@ -131,16 +134,106 @@ class EPUSystem(SystemAPI):
         except AttributeError:
             self._opentsdb_port = DEFAULT_OPENTSDB_PORT
 
-        self._epum_client = EPUMClient(self._dashi_conn)
-        self._dtrs_client = DTRSClient(self._dashi_conn)
+        # domain lists and descriptions are shared by requests for domain_cache_ttl seconds,
+        # 0 turns the cache off.  terminate reads the domain it changes from EPUM itself
+        live_epum_client = epum_client
+        self._domain_cache = None
+        domain_cache_ttl = getattr(cfg.phantom.system, 'domain_cache_ttl', DEFAULT_DOMAIN_CACHE_TTL)
+        if domain_cache_ttl > 0:
+            domain_cache_max_entries = getattr(cfg.phantom.system, 'domain_cache_max_entries', DEFAULT_DOMAIN_CACHE_MAX_ENTRIES)
+            domain_cache = TTLCache(max_entries=domain_cache_max_entries, ttl=domain_cache_ttl)
+            epum_client = CachedEPUMClient(epum_client, domain_cache)
+            self._domain_cache = epum_client
+
+        # DT lists and descriptions are cached for dt_cache_ttl seconds, 0 turns the cache off.
+        # launch config writes always read the DT they change from DTRS itself
+        live_dtrs_client = dtrs_client
+        dt_cache_ttl = getattr(cfg.phantom.system, 'dt_cache_ttl', DEFAULT_DT_CACHE_TTL)
+        if dt_cache_ttl > 0:
+            dt_cache_max_entries = getattr(cfg.phantom.system, 'dt_cache_max_entries', DEFAULT_DT_CACHE_MAX_ENTRIES)
+            dt_cache = TTLCache(max_entries=dt_cache_max_entries, ttl=dt_cache_ttl)
+            dtrs_client = CachedDTRSClient(dtrs_client, dt_cache, statsd_client=statsd_client)
+
+        # every EPUM and DTRS read runs on an rpc worker so the request thread can fan
+        # out describes and gives up on a read after rpc_timeout seconds.  writes are
+        # made directly, they are only bounded by the dashi timeout
+        rpc_workers = getattr(cfg.phantom.system, 'rpc_workers', DEFAULT_RPC_WORKERS)
+        rpc_max_in_flight = getattr(cfg.phantom.system, 'rpc_max_in_flight', DEFAULT_RPC_MAX_IN_FLIGHT)
+        rpc_timeout = getattr(cfg.phantom.system, 'rpc_timeout', DEFAULT_RPC_TIMEOUT)
+        self._rpc = AsyncRPC(workers=rpc_workers, max_in_flight=rpc_max_in_flight, timeout=rpc_timeout)
+        # describes fanned out by _describe_domains are already on a worker and use this directly
+        self._direct_epum_client = epum_client
+        self._epum_client = self._rpc.wrap(epum_client, writes=EPUM_WRITE_METHODS)
+        self._live_epum_client = self._rpc.wrap(live_epum_client, writes=EPUM_WRITE_METHODS)
+        self._dtrs_client = self._rpc.wrap(dtrs_client, writes=DTRS_WRITE_METHODS)
+        self._live_dtrs_client = self._rpc.wrap(live_dtrs_client, writes=DTRS_WRITE_METHODS)
+        # iaas instance id -> domain name, refreshed by every describe
+        self._instance_index = InstanceIndex()
+
+        # with read_model on, Describe* calls are answered from a copy of each user's domains
+        # that a background thread refreshes every read_model_interval seconds.  a copy older
+        # than read_model_max_staleness seconds, or older than one of our own writes, is not used
+        self._read_model = None
+        self._synchronizer = None
+        if getattr(cfg.phantom.system, 'read_model', False):
+            max_staleness = getattr(cfg.phantom.system, 'read_model_max_staleness', DEFAULT_READ_MODEL_MAX_STALENESS)
+            idle_timeout = getattr(cfg.phantom.system, 'read_model_idle_timeout', DEFAULT_READ_MODEL_IDLE_TIMEOUT)
+            interval = getattr(cfg.phantom.system, 'read_model_interval', DEFAULT_READ_MODEL_INTERVAL)
+            self._read_model = DomainReadModel(max_staleness=max_staleness, idle_timeout=idle_timeout)
+            self._synchronizer = DomainSynchronizer(self._read_model, self._refresh_read_model, interval=interval)
+            self._synchronizer.start()
 
         load_known_definitions(self._epum_client)
 
-    def _get_dt_details(self, name, caller):
+    def _describe_domains(self, caller, names):
+        """Describe the named domains and return the descriptions in the same
+        order.  The describes run concurrently on the rpc workers and share
+        one deadline.  Every description is also fed to the instance index."""
+        def describe(name):
+            desc = self._direct_epum_client.describe_domain(name, caller=caller)
+            self._instance_index.update_domain(caller, name, desc)
+            return desc
+
+        return self._rpc.map(describe, names)
+
+    def _load_domains(self, caller):
+        """Return {name: description} for all of the caller's domains"""
+        epu_list = self._epum_client.list_domains(caller=caller)
+        self._instance_index.retain_domains(caller, epu_list)
+        descriptions = self._describe_domains(caller, epu_list)
+        return dict(zip(epu_list, descriptions))
+
+    def _refresh_read_model(self, caller):
+        if self._domain_cache is not None:
+            # the snapshot is only as fresh as the time it was taken if it skips the domain cache
+            self._domain_cache.forget_user(caller)
+        return self._read_model.refresh(caller, lambda: self._load_domains(caller))
+
+    def _read_model_domains(self, caller):
+        snapshot = self._read_model.get(caller)
+        if snapshot is None:
+            return self._refresh_read_model(caller)
+        (age, domains) = snapshot
+        log(logging.INFO, "Serving the domains of %s from a snapshot %f seconds old", caller, age)
+        submit_metric(self._statsd_client, 'timing', 'autoscale.read_model.age', int(age * 1000))
+        return domains
+
+    def _wrote_domain(self, caller):
+        # called after each of our own writes so the next describe sees it
+        if self._read_model is not None:
+            self._read_model.mark_dirty(caller)
+            self._synchronizer.wake()
+
+    def _get_dt_details(self, name, caller, live=False):
+        if live:
+            return self._live_dtrs_client.describe_dt(caller, name)
         return self._dtrs_client.describe_dt(caller, name)
 
-    def _check_dt_name_exists(self, name, caller):
-        name_list = self._dtrs_client.list_dts(caller=caller)
+    def _check_dt_name_exists(self, name, caller, live=False):
+        if live:
+            name_list = self._live_dtrs_client.list_dts(caller=caller)
+        else:
+            name_list = self._dtrs_client.list_dts(caller=caller)
         return name in name_list
 
     @LogEntryDecorator(classname="EPUSystem")
@@ -149,9 +242,9 @@ class EPUSystem(SystemAPI):
 
         # see if that name already exists
         dt_def = None
-        exists = self._check_dt_name_exists(dt_name, user_obj.access_id)
+        exists = self._check_dt_name_exists(dt_name, user_obj.access_id, live=True)
         if exists:
-            dt_def = self._get_dt_details(dt_name, user_obj.access_id)
+            dt_def = self._get_dt_details(dt_name, user_obj.access_id, live=True)
         if not dt_def:
             dt_def = {}
             dt_def['mappings'] = {}
@@ -193,7 +286,7 @@ class EPUSystem(SystemAPI):
     @LogEntryDecorator(classname="EPUSystem")
     def delete_launch_config(self, user_obj, name):
         (dt_name, site_name) = _breakup_name(name)
-        dt_def = self._get_dt_details(dt_name, user_obj.access_id)
+        dt_def = self._get_dt_details(dt_name, user_obj.access_id, live=True)
         if not dt_def:
             raise PhantomAWSException('InvalidParameterValue', details="Name %s not found" % (name))
         if site_name not in dt_def['mappings']:
@@ -206,65 +299,81 @@ class EPUSystem(SystemAPI):
         else:
             self._dtrs_client.update_dt(user_obj.access_id, dt_name, dt_def)
 
+    def _iter_launch_configs(self, user_obj, names, start):
+        """Yield (name, dt description, site mapping) for each launch config
+        at or after start in name order.  DTs are described one at a time as
+        the caller asks for more, so a page of n costs at most n + 1
+        describe_dt calls."""
+        dts = self._dtrs_client.list_dts(user_obj.access_id)
+        if names is not None:
+            wanted_dts = set([name.split('@', 1)[0] for name in names])
+            dts = [dt_name for dt_name in dts if dt_name in wanted_dts]
+        dts.sort()
+
+        for dt_name in dts:
+            if start is not None and dt_name < start[0]:
+                continue
+            dt_descr = self._get_dt_details(dt_name, user_obj.access_id)
+            if not dt_descr:
+                # removed since we listed it
+                continue
+            for site in sorted(dt_descr['mappings'].keys()):
+                if start is not None and (dt_name, site) < start:
+                    continue
+                out_name = '%s@%s' % (dt_name, site)
+                if names is not None and out_name not in names:
+                    continue
+                yield (out_name, dt_descr, dt_descr['mappings'][site])
+
     @LogEntryDecorator(classname="EPUSystem")
     def get_launch_configs(self, user_obj, names=None, max=-1, startToken=None):
         next_token = None
 
-        dts = self._dtrs_client.list_dts(user_obj.access_id)
-        dts.sort()
+        # like the local db backend the token is the name of the first launch config on the next page
+        start = None
+        if startToken is not None:
+            start = tuple(startToken.split('@', 1))
 
-        # now that we have the final list, look up each description
         lc_list_type = AWSListType('LaunchConfigurations')
-        for lc_name in dts:
-            if lc_list_type.get_length() >= max and max > -1:
+        for (out_name, dt_descr, mapped_def) in self._iter_launch_configs(user_obj, names, start):
+            if 'CreatedTime' not in mapped_def.keys():
+                # This is an LC that was created with the new Phantom API, ignore it
+                continue
+
+            if max > -1 and lc_list_type.get_length() >= max:
+                next_token = out_name
                 break
 
-            dt_descr = self._get_dt_details(lc_name, user_obj.access_id)
-            for site in sorted(dt_descr['mappings'].keys()):
-                mapped_def = dt_descr['mappings'][site]
-                out_name = '%s@%s' % (lc_name, site)
-                if lc_list_type.get_length() >= max and max > -1:
-                    break
-
-                if out_name == startToken:
-                    startToken = None
-
-                if startToken is None and (names is None or out_name in names):
-                    ot_lc = LaunchConfigurationType('LaunchConfiguration')
-                    ot_lc.BlockDeviceMappings = AWSListType('BlockDeviceMappings')
-
-                    if 'CreatedTime' not in mapped_def.keys():
-                        # This is an LC that was created with the new Phantom API, ignore it
-                        continue
-
-                    tm = _get_time(mapped_def['CreatedTime'])
-                    ot_lc.CreatedTime = DateTimeType('CreatedTime', tm)
-
-                    ot_lc.ImageId = mapped_def['iaas_image']
-                    ot_lc.InstanceMonitoring = InstanceMonitoringType('InstanceMonitoring')
-                    ot_lc.InstanceMonitoring.Enabled = False
-                    ot_lc.InstanceType = mapped_def['iaas_allocation']
-                    ot_lc.KernelId = None
-                    ot_lc.KeyName = phantom_get_default_key_name()
-                    ot_lc.LaunchConfigurationARN = mapped_def['LaunchConfigurationARN']
-                    ot_lc.LaunchConfigurationName = out_name
-                    ot_lc.RamdiskId = None
-                    ot_lc.SecurityGroups = AWSListType('SecurityGroups')
-                    contextualization = dt_descr.get('contextualization')
-                    if contextualization is not None and contextualization.get('method') == 'userdata':
-                        # UserData should be base64-encoded to be properly decoded by boto
-                        ot_lc.UserData = base64.b64encode(contextualization.get('userdata'))
-                    else:
-                        ot_lc.UserData = None
-
-                    lc_list_type.add_item(ot_lc)
-
-        # XXX need to set next_token
+            ot_lc = LaunchConfigurationType('LaunchConfiguration')
+            ot_lc.BlockDeviceMappings = AWSListType('BlockDeviceMappings')
+
+            tm = _get_time(mapped_def['CreatedTime'])
+            ot_lc.CreatedTime = DateTimeType('CreatedTime', tm)
+
+            ot_lc.ImageId = mapped_def['iaas_image']
+            ot_lc.InstanceMonitoring = InstanceMonitoringType('InstanceMonitoring')
+            ot_lc.InstanceMonitoring.Enabled = False
+            ot_lc.InstanceType = mapped_def['iaas_allocation']
+            ot_lc.KernelId = None
+            ot_lc.KeyName = phantom_get_default_key_name()
+            ot_lc.LaunchConfigurationARN = mapped_def['LaunchConfigurationARN']
+            ot_lc.LaunchConfigurationName = out_name
+            ot_lc.RamdiskId = None
+            ot_lc.SecurityGroups = AWSListType('SecurityGroups')
+            contextualization = dt_descr.get('contextualization')
+            if contextualization is not None and contextualization.get('method') == 'userdata':
+                # UserData should be base64-encoded to be properly decoded by boto
+                ot_lc.UserData = base64.b64encode(contextualization.get('userdata'))
+            else:
+                ot_lc.UserData = None
+
+            lc_list_type.add_item(ot_lc)
+
         return (lc_list_type, next_token)
 
     @LogEntryDecorator(classname="EPUSystem")
     def create_autoscale_group(self, user_obj, asg):
-        log(logging.DEBUG, "entering create_autoscale_group with %s" % (asg.LaunchConfigurationName))
+        log(logging.DEBUG, "entering create_autoscale_group with %s", asg.LaunchConfigurationName)
 
         (definition_name, domain_opts) = tags_to_definition(asg.Tags.type_list)
         domain_opts['minimum_vms'] = asg.DesiredCapacity
@@ -298,14 +407,16 @@ class EPUSystem(SystemAPI):
 
         conf = {'engine_conf': domain_opts}
         
-        log(logging.INFO, "Creating autoscale group with %s" % (conf))
+        log(logging.INFO, "Creating autoscale group with %s", conf)
         try:
             self._epum_client.add_domain(asg.AutoScalingGroupName, definition_name, conf, caller=user_obj.access_id)
         except DashiError, de:
             if de.exc_type == u'WriteConflictError':
                 raise PhantomAWSException('InvalidParameterValue', details="auto scale name already exists")
-            log(logging.ERROR, "An error creating ASG: %s" % (str(de)))
+            log(logging.ERROR, "An error creating ASG: %s", de)
             raise
+        finally:
+            self._wrote_domain(user_obj.access_id)
 
     @LogEntryDecorator(classname="EPUSystem")
     def alter_autoscale_group(self, user_obj, name, new_conf, force):
@@ -318,61 +429,144 @@ class EPUSystem(SystemAPI):
 
         try:
             if engine_conf:
+                self._instance_index.remove_domain(user_obj.access_id, name)
                 self._epum_client.reconfigure_domain(name, conf, caller=user_obj.access_id)
         except DashiError, de:
-            log(logging.ERROR, "An error altering ASG: %s" % (str(de)))
+            log(logging.ERROR, "An error altering ASG: %s", de)
             raise
+        finally:
+            self._wrote_domain(user_obj.access_id)
 
     @LogEntryDecorator(classname="EPUSystem")
     def get_autoscale_groups(self, user_obj, names=None, max=-1, startToken=None):
-        epu_list = self._epum_client.list_domains(caller=user_obj.access_id)
-        log(logging.DEBUG, "Incoming epu list is %s" %(str(epu_list)))
+        domains = None
+        if self._read_model is not None:
+            domains = self._read_model_domains(user_obj.access_id)
+            epu_list = domains.keys()
+        else:
+            epu_list = self._epum_client.list_domains(caller=user_obj.access_id)
+        log(logging.DEBUG, "Incoming epu list is %s", epu_list)
 
         next_token = None
         epu_list.sort()
 
-        asg_list_type = AWSListType('AutoScalingGroups')
-        for asg_name in epu_list:
-            if asg_list_type.get_length() >= max and max > -1:
-                break
+        # narrow the list down to the page that was asked for before describing anything.
+        # the token is the name of the first group on the next page, comparing
+        # against it rather than looking it up keeps paging stable when groups
+        # come and go between calls
+        if names is not None:
+            wanted = set(names)
+            epu_list = [asg_name for asg_name in epu_list if asg_name in wanted]
+        if startToken is not None:
+            epu_list = [asg_name for asg_name in epu_list if asg_name >= startToken]
+        if max > -1 and len(epu_list) > max:
+            next_token = epu_list[max]
+            epu_list = epu_list[:max]
 
-            if asg_name == startToken:
-                startToken = None
-
-            if startToken is None and (names is None or asg_name in names):
-                asg_description = self._epum_client.describe_domain(asg_name, caller=user_obj.access_id)
-                asg = convert_epu_description_to_asg_out(asg_description, asg_name)
-                asg_list_type.add_item(asg)
+        asg_list_type = AWSListType('AutoScalingGroups')
+        if domains is None:
+            descriptions = self._describe_domains(user_obj.access_id, epu_list)
+        else:
+            descriptions = [domains[asg_name] for asg_name in epu_list]
+        for (asg_name, asg_description) in zip(epu_list, descriptions):
+            asg = convert_epu_description_to_asg_out(asg_description, asg_name)
+            asg_list_type.add_item(asg)
 
-        # XXX need to set next_token
         return (asg_list_type, next_token)
 
     @LogEntryDecorator(classname="EPUSystem")
     def delete_autoscale_group(self, user_obj, name, force):
         try:
-            log(logging.INFO, "deleting %s for user %s" % (str(name), user_obj.access_id))
+            log(logging.INFO, "deleting %s for user %s", name, user_obj.access_id)
+            self._instance_index.remove_domain(user_obj.access_id, name)
             self._epum_client.remove_domain(name, caller=user_obj.access_id)
         except DashiError, de:
-            log(logging.ERROR, "An error altering ASG: %s" % (str(de)))
+            log(logging.ERROR, "An error altering ASG: %s", de)
             raise
+        finally:
+            self._wrote_domain(user_obj.access_id)
+
+    def _describe_instance_domain(self, caller, name, inst_id):
+        """Describe the domain name straight from EPUM and return (epu instance
+        id, minimum_vms) for inst_id, or None if the domain no longer has it"""
+        try:
+            desc = self._live_epum_client.describe_domain(name, caller=caller)
+        except DashiError, de:
+            if de.exc_type != u'NotFoundError':
+                raise
+            self._instance_index.remove_domain(caller, name)
+            return None
+        self._instance_index.update_domain(caller, name, desc)
+        for inst in desc['instances']:
+            if inst.get('iaas_id') == inst_id:
+                return (inst['instance_id'], desc['config']['engine_conf'].get('minimum_vms'))
+        return None
 
     def _find_group_by_instance(self, user_obj, inst_id):
-        epu_list = self._epum_client.list_domains(caller=user_obj.access_id)
-        for domain_name in epu_list:
-            desc = self._epum_client.describe_domain(domain_name, caller=user_obj.access_id)
+        """Return (domain name, epu instance id, minimum_vms) for the domain
+        that owns inst_id, or None.  The instance index only says which domain
+        to look in, that one domain is then described live so the values
+        returned are current.  All of the user's domains are described when
+        the index misses or is wrong."""
+        caller = user_obj.access_id
+        name = self._instance_index.lookup(caller, inst_id)
+        scanned_live = False
+        if name is None:
+            self._find_all_instances(user_obj)
+            scanned_live = self._domain_cache is None and self._read_model is None
+            name = self._instance_index.lookup(caller, inst_id)
+        found = None
+        if name is not None:
+            found = self._describe_instance_domain(caller, name, inst_id)
+        if found is None and not scanned_live:
+            # the index, the cached descriptions or the read model may be older than the instance
+            if self._domain_cache is not None:
+                self._domain_cache.forget_user(caller)
+            self._find_all_instances(user_obj, live=True)
+            name = self._instance_index.lookup(caller, inst_id)
+            if name is not None:
+                found = self._describe_instance_domain(caller, name, inst_id)
+        if found is None:
+            return None
+        return (name,) + found
+
+    def _find_instances_by_id(self, user_obj, instance_id_list):
+        """Return the instances in instance_id_list sorted by iaas id, describing
+        only the domains the instance index says own them.  None is returned
+        when an instance is not in the index or is no longer in its domain."""
+        caller = user_obj.access_id
+        names = set()
+        for inst_id in instance_id_list:
+            name = self._instance_index.lookup(caller, inst_id)
+            if name is None:
+                return None
+            names.add(name)
+        names = sorted(names)
+        try:
+            descriptions = self._describe_domains(caller, names)
+        except DashiError, de:
+            if de.exc_type != u'NotFoundError':
+                raise
+            return None
 
-            inst_list = desc['instances']
-            for inst in inst_list:
-                if 'iaas_id' in  inst:
-                    if inst_id == inst['iaas_id']:
-                        return (domain_name, desc, inst['instance_id'])
-        return None
+        wanted = set(instance_id_list)
+        instances = []
+        for (domain_name, desc) in zip(names, descriptions):
+            for inst in desc['instances']:
+                if inst.get('iaas_id') in wanted:
+                    inst['domain_name'] = domain_name
+                    instances.append(inst)
+        if len(instances) != len(wanted):
+            return None
+        return sorted(instances, key=lambda hm: hm['iaas_id'])
 
-    def _find_all_instances(self, user_obj, instance_id_list=None):
+    def _find_all_instances(self, user_obj, instance_id_list=None, live=False):
         instances = []
-        epu_list = self._epum_client.list_domains(caller=user_obj.access_id)
-        for domain_name in epu_list:
-            desc = self._epum_client.describe_domain(domain_name, caller=user_obj.access_id)
+        if self._read_model is not None and not live:
+            domains = self._read_model_domains(user_obj.access_id)
+        else:
+            domains = self._load_domains(user_obj.access_id)
+        for (domain_name, desc) in domains.items():
             inst_list = desc['instances']
             for inst in inst_list:
 
@@ -397,38 +591,53 @@ class EPUSystem(SystemAPI):
 
         # gotta find the asg that has this instance id.  this is a messed up part of the aws protocol
 
-        log(logging.INFO, "epu_client:terminate_instances %s, adjust %s" % (instance_id, adjust_policy))
+        log(logging.INFO, "epu_client:terminate_instances %s, adjust %s", instance_id, adjust_policy)
 
         try:
             desc_t = self._find_group_by_instance(user_obj, instance_id)
             if desc_t is None:
                 raise PhantomAWSException('InvalidParameterValue', details="There is no domain associated with that instnace id")
-            (name, desc, epu_instance_id) = desc_t
+            (name, epu_instance_id, minimum_vms) = desc_t
 
             conf = {'engine_conf': {'terminate': epu_instance_id}
                   }
 
             if adjust_policy:
-                desired_size = desc['config']['engine_conf']['minimum_vms']
+                desired_size = minimum_vms
                 if desired_size < 1:
                     log(logging.WARN, "Trying to decrease the size lower than 0")
                     desired_size = 0
                 else:
                     desired_size = desired_size - 1
-                log(logging.INFO, "decreasing the desired_size to %d" % (desired_size))
+                log(logging.INFO, "decreasing the desired_size to %d", desired_size)
                 conf['engine_conf']['minimum_vms'] = desired_size
                 conf['engine_conf']['maximum_vms'] = desired_size
 
-            log(logging.INFO, "calling reconfigure_domain with %s for user %s" % (str(conf), user_obj.access_id))
-            self._epum_client.reconfigure_domain(name, conf, caller=user_obj.access_id)
+            log(logging.INFO, "calling reconfigure_domain with %s for user %s", conf, user_obj.access_id)
+            self._instance_index.remove_domain(user_obj.access_id, name)
+            try:
+                self._epum_client.reconfigure_domain(name, conf, caller=user_obj.access_id)
+            finally:
+                self._wrote_domain(user_obj.access_id)
         except DashiError, de:
-            log(logging.ERROR, "An error altering ASG: %s" % (str(de)))
+            log(logging.ERROR, "An error altering ASG: %s", de)
             raise
 
     def get_autoscale_instances(self, user_obj, instance_id_list=None, max=-1, startToken=None):
+        next_token = None
+        instance_list = None
+        if instance_id_list and self._read_model is None:
+            instance_list = self._find_instances_by_id(user_obj, instance_id_list)
+        if instance_list is None:
+            instance_list = self._find_all_instances(user_obj, instance_id_list)
+        if startToken is not None:
+            instance_list = [inst for inst in instance_list if inst['iaas_id'] >= startToken]
+        if max > -1 and len(instance_list) > max:
+            next_token = instance_list[max]['iaas_id']
+            instance_list = instance_list[:max]
+
         lc_list_type = AWSListType("AutoScalingInstances")
-        instance_list = self._find_all_instances(user_obj, instance_id_list)
         for inst in instance_list:
             out_t = convert_instance_type(inst['domain_name'], inst)
             lc_list_type.add_item(out_t)
-        return (lc_list_type, None)
+        return (lc_list_type, next_token)
@@ -0,0 +1,50 @@
+import threading
+
+
+class InstanceIndex(object):
+    """Maps each user's iaas instance ids to the domain that owns them.  It is
+    filled in from domain descriptions as they are fetched.  The entries for
+    a domain are dropped whenever we change or remove that domain, so a hit
+    is only as old as the last describe of an unchanged domain."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # caller -> {iaas_id: domain_name}
+        self._instances = {}
+        # caller -> {domain_name: [iaas_id, ...]}
+        self._domains = {}
+
+    def _remove_domain(self, caller, domain_name):
+        iaas_ids = self._domains.get(caller, {}).pop(domain_name, [])
+        instances = self._instances.get(caller, {})
+        for iaas_id in iaas_ids:
+            instances.pop(iaas_id, None)
+
+    def update_domain(self, caller, domain_name, desc):
+        with self._lock:
+            self._remove_domain(caller, domain_name)
+            instances = self._instances.setdefault(caller, {})
+            iaas_ids = []
+            for inst in desc['instances']:
+                if 'iaas_id' not in inst:
+                    continue
+                instances[inst['iaas_id']] = domain_name
+                iaas_ids.append(inst['iaas_id'])
+            self._domains.setdefault(caller, {})[domain_name] = iaas_ids
+
+    def remove_domain(self, caller, domain_name):
+        with self._lock:
+            self._remove_domain(caller, domain_name)
+
+    def retain_domains(self, caller, domain_names):
+        """Forget every domain of caller that is not in domain_names"""
+        keep = set(domain_names)
+        with self._lock:
+            for domain_name in self._domains.get(caller, {}).keys():
+                if domain_name not in keep:
+                    self._remove_domain(caller, domain_name)
+
+    def lookup(self, caller, iaas_id):
+        """Return the name of the domain that owned iaas_id when it was last described, or None"""
+        with self._lock:
+            return self._instances.get(caller, {}).get(iaas_id)
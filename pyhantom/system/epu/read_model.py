@@ -0,0 +1,116 @@
+import copy
+import logging
+import threading
+import time
+from pyhantom.util import log
+
+DEFAULT_READ_MODEL_INTERVAL = 5
+DEFAULT_READ_MODEL_MAX_STALENESS = 15
+DEFAULT_READ_MODEL_IDLE_TIMEOUT = 300
+
+
+class DomainReadModel(object):
+    """An in process copy of each user's EPUM domains (name -> description)
+    and when it was fetched.  get() only returns a snapshot that is younger
+    than max_staleness and has not been marked dirty by one of our own
+    writes, so anything served from here is at most max_staleness seconds
+    old.  Users that have not asked for anything in idle_timeout seconds
+    are no longer refreshed."""
+
+    def __init__(self, max_staleness=DEFAULT_READ_MODEL_MAX_STALENESS, idle_timeout=DEFAULT_READ_MODEL_IDLE_TIMEOUT, clock=time.time):
+        self._max_staleness = max_staleness
+        self._idle_timeout = idle_timeout
+        self._clock = clock
+        self._lock = threading.Lock()
+        # caller -> (fetched time, {name: description})
+        self._snapshots = {}
+        # caller -> time of our last write
+        self._dirty = {}
+        self._last_access = {}
+
+    def get(self, caller):
+        """Return (age in seconds, {name: description}) or None"""
+        now = self._clock()
+        with self._lock:
+            self._last_access[caller] = now
+            snapshot = self._snapshots.get(caller)
+            if snapshot is None or caller in self._dirty:
+                return None
+            (fetched, domains) = snapshot
+            age = now - fetched
+            if age > self._max_staleness:
+                return None
+        return (age, copy.deepcopy(domains))
+
+    def refresh(self, caller, load):
+        """Store the {name: description} dict returned by load() as the
+        snapshot for caller and return it."""
+        fetched = self._clock()
+        domains = load()
+        with self._lock:
+            current = self._snapshots.get(caller)
+            # a slow refresh must not replace a newer one
+            if current is None or current[0] <= fetched:
+                self._snapshots[caller] = (fetched, copy.deepcopy(domains))
+            # a refresh that started before our last write may have missed it
+            if caller in self._dirty and self._dirty[caller] <= fetched:
+                del self._dirty[caller]
+        return domains
+
+    def mark_dirty(self, caller):
+        with self._lock:
+            self._dirty[caller] = self._clock()
+
+    def active_users(self):
+        """Users asked about within idle_timeout, the rest are dropped"""
+        now = self._clock()
+        with self._lock:
+            for caller in self._last_access.keys():
+                if now - self._last_access[caller] > self._idle_timeout:
+                    del self._last_access[caller]
+                    self._snapshots.pop(caller, None)
+                    self._dirty.pop(caller, None)
+            return self._last_access.keys()
+
+
+class DomainSynchronizer(object):
+    """Calls refresh(caller) for every active user of the read model every
+    interval seconds, or sooner when woken after one of our own writes."""
+
+    def __init__(self, read_model, refresh, interval=DEFAULT_READ_MODEL_INTERVAL):
+        self._read_model = read_model
+        self._refresh = refresh
+        self._interval = interval
+        self._wake_event = threading.Event()
+        self._stopped = False
+        self._thread = None
+
+    def sync_once(self):
+        for caller in self._read_model.active_users():
+            try:
+                self._refresh(caller)
+            except Exception, ex:
+                log(logging.ERROR, "Failed to refresh the domains of %s: %s", caller, str(ex))
+
+    def _run(self):
+        while not self._stopped:
+            self._wake_event.wait(self._interval)
+            self._wake_event.clear()
+            if self._stopped:
+                break
+            self.sync_once()
+
+    def wake(self):
+        self._wake_event.set()
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="DomainSynchronizer")
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        self._stopped = True
+        self._wake_event.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
@@ -0,0 +1,127 @@
+import logging
+import threading
+import time
+from multiprocessing import TimeoutError
+from multiprocessing.pool import ThreadPool
+from pyhantom.phantom_exceptions import PhantomAWSException
+from pyhantom.util import log
+
+DEFAULT_RPC_WORKERS = 8
+DEFAULT_RPC_MAX_IN_FLIGHT = 64
+DEFAULT_RPC_TIMEOUT = 15
+
+# calls that change something.  a write we stopped waiting for can still succeed on
+# its worker, so these are made on the caller's thread and never get the rpc timeout
+EPUM_WRITE_METHODS = ('add_domain', 'reconfigure_domain', 'remove_domain',
+                      'add_domain_definition', 'update_domain_definition', 'remove_domain_definition')
+DTRS_WRITE_METHODS = ('add_dt', 'update_dt', 'remove_dt')
+
+
+class RPCFuture(object):
+    """The pending result of one call made through AsyncRPC"""
+
+    def __init__(self, name, async_result, default_timeout):
+        self._name = name
+        self._async_result = async_result
+        self._default_timeout = default_timeout
+
+    def done(self):
+        return self._async_result.ready()
+
+    def result(self, timeout=None):
+        """Wait up to timeout seconds (the rpc timeout by default) for the
+        call and return its value or raise its exception.  A call that does
+        not finish in time raises ServiceUnavailable, the call itself keeps
+        running on its worker."""
+        if timeout is None:
+            timeout = self._default_timeout
+        try:
+            return self._async_result.get(max(timeout, 0))
+        except TimeoutError:
+            log(logging.ERROR, "%s did not finish within %s seconds", self._name, timeout)
+            raise PhantomAWSException('ServiceUnavailable', details="%s timed out" % (self._name))
+
+
+class AsyncRPC(object):
+    """Runs blocking client calls (EPUM, DTRS) on a fixed set of worker
+    threads so that a request thread can start several at once and give up
+    on a slow one after timeout seconds.  At most max_in_flight calls are
+    queued or running, a submit that cannot get a slot in time fails with
+    ServiceUnavailable."""
+
+    def __init__(self, workers=DEFAULT_RPC_WORKERS, max_in_flight=DEFAULT_RPC_MAX_IN_FLIGHT, timeout=DEFAULT_RPC_TIMEOUT):
+        self._pool = ThreadPool(workers)
+        self._max_in_flight = max_in_flight
+        self._timeout = timeout
+        self._in_flight = 0
+        self._cond = threading.Condition()
+
+    def in_flight(self):
+        return self._in_flight
+
+    def _acquire(self, name, deadline):
+        with self._cond:
+            while self._in_flight >= self._max_in_flight:
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    log(logging.ERROR, "No room to start %s, %d calls in flight", name, self._in_flight)
+                    raise PhantomAWSException('ServiceUnavailable', details="too many calls in flight")
+                self._cond.wait(remaining)
+            self._in_flight = self._in_flight + 1
+
+    def _release(self):
+        with self._cond:
+            self._in_flight = self._in_flight - 1
+            self._cond.notify()
+
+    def submit(self, func, *args, **kwargs):
+        name = getattr(func, '__name__', str(func))
+        self._acquire(name, time.time() + self._timeout)
+
+        def run():
+            try:
+                return func(*args, **kwargs)
+            finally:
+                self._release()
+
+        try:
+            async_result = self._pool.apply_async(run)
+        except:
+            self._release()
+            raise
+        return RPCFuture(name, async_result, self._timeout)
+
+    def call(self, func, *args, **kwargs):
+        return self.submit(func, *args, **kwargs).result()
+
+    def map(self, func, items):
+        """Call func on every item concurrently and return the results in
+        order.  All of the calls share one deadline."""
+        deadline = time.time() + self._timeout
+        futures = [self.submit(func, item) for item in items]
+        return [f.result(deadline - time.time()) for f in futures]
+
+    def wrap(self, client, writes=()):
+        return DeadlineClient(client, self, writes=writes)
+
+
+class DeadlineClient(object):
+    """Makes the method calls on client go through an AsyncRPC so that they
+    are bounded by the rpc timeout.  The methods named in writes are called
+    on client directly and are only bounded by the client's own timeout.
+    Call sites stay the same."""
+
+    def __init__(self, client, rpc, writes=()):
+        self._client = client
+        self._rpc = rpc
+        self._writes = frozenset(writes)
+
+    def __getattr__(self, name):
+        attr = getattr(self._client, name)
+        if not callable(attr) or name in self._writes:
+            return attr
+
+        def call(*args, **kwargs):
+            return self._rpc.call(attr, *args, **kwargs)
+        call.__name__ = name
+        return call
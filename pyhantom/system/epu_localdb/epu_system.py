@@ -1,10 +1,12 @@
 import logging
 from pyhantom.out_data_types import InstanceType, AWSListType
-from pyhantom.system.local_db.system import SystemLocalDB
+from pyhantom.system.local_db.system import SystemLocalDB, db_request
 from pyhantom.phantom_exceptions import PhantomAWSException
-from ceiclient.connection import DashiCeiConnection
 from ceiclient.client import EPUMClient
 from pyhantom.util import log, LogEntryDecorator
+from pyhantom.system.epu.dashi_pool import make_dashi_pool
+from pyhantom.system.epu_localdb.reconciler import ASGReconciler, DEFAULT_RECONCILE_INTERVAL, DEFAULT_RECONCILE_BATCH_SIZE
+from pyhantom.system.epu.rpc import AsyncRPC, EPUM_WRITE_METHODS, DEFAULT_RPC_WORKERS, DEFAULT_RPC_MAX_IN_FLIGHT, DEFAULT_RPC_TIMEOUT
 
 g_add_template = {'general' :
                     {'engine_class': 'epu.decisionengine.impls.phantom.PhantomEngine'},
@@ -41,12 +43,12 @@ def convert_epu_description_to_asg_out(desc, asg):
     name = desc['name']
     config = desc['config']
 
-    log(logging.DEBUG, "Changing the config: %s" %(str(config)))
+    log(logging.DEBUG, "Changing the config: %s", config)
     #asg.DesiredCapacity = int(config['engine_conf']['preserve_n'])
     asg.Instances = AWSListType('Instances')
 
     for inst in inst_list:
-        log(logging.DEBUG, "Converting instance %s" %(str(inst)))
+        log(logging.DEBUG, "Converting instance %s", inst)
         out_t = InstanceType('Instance')
 
         out_t.AutoScalingGroupName = name
@@ -68,23 +70,31 @@ def convert_epu_description_to_asg_out(desc, asg):
 
 class EPUSystemWithLocalDB(SystemLocalDB):
 
-    def __init__(self, cfg):
+    def __init__(self, cfg, epum_client=None, statsd_client=None):
         SystemLocalDB.__init__(self, cfg)
 
-        ssl = cfg.phantom.system.rabbit_ssl
-        self._rabbit = cfg.phantom.system.rabbit
-        self._rabbit_port = cfg.phantom.system.rabbit_port
-        self._rabbitpw = cfg.phantom.system.rabbit_pw
-        self._rabbituser = cfg.phantom.system.rabbit_user
-        self._rabbitexchange = cfg.phantom.system.rabbit_exchange
-        log(logging.INFO, "Connecting to epu messaging fabric: %s, %s, XXXXX, %d, ssl=%s" % (self._rabbit, self._rabbituser, self._rabbit_port, str(ssl)))
-        self._dashi_conn = DashiCeiConnection(self._rabbit, self._rabbituser, self._rabbitpw, exchange=self._rabbitexchange, timeout=60, port=self._rabbit_port, ssl=ssl)
-        self._epum_client = EPUMClient(self._dashi_conn)
+        if epum_client is None:
+            self._dashi_conn = make_dashi_pool(cfg, statsd_client=statsd_client)
+            epum_client = EPUMClient(self._dashi_conn)
+        self._direct_epum_client = epum_client
+
+        rpc_workers = getattr(cfg.phantom.system, 'rpc_workers', DEFAULT_RPC_WORKERS)
+        rpc_max_in_flight = getattr(cfg.phantom.system, 'rpc_max_in_flight', DEFAULT_RPC_MAX_IN_FLIGHT)
+        rpc_timeout = getattr(cfg.phantom.system, 'rpc_timeout', DEFAULT_RPC_TIMEOUT)
+        self._rpc = AsyncRPC(workers=rpc_workers, max_in_flight=rpc_max_in_flight, timeout=rpc_timeout)
+        self._epum_client = self._rpc.wrap(self._direct_epum_client, writes=EPUM_WRITE_METHODS)
+
+        # rows whose domain has gone away are removed in the background, 0 turns that off
+        reconcile_interval = getattr(cfg.phantom.system, 'reconcile_interval', DEFAULT_RECONCILE_INTERVAL)
+        reconcile_batch_size = getattr(cfg.phantom.system, 'reconcile_batch_size', DEFAULT_RECONCILE_BATCH_SIZE)
+        self._reconciler = ASGReconciler(self._db, self._epum_client, interval=reconcile_interval, batch_size=reconcile_batch_size)
+        if reconcile_interval > 0:
+            self._reconciler.start()
 
 
     @LogEntryDecorator(classname="EPUSystemWithLocalDB")
+    @db_request
     def create_autoscale_group(self, user_obj, asg):
-        self._clean_up_db()
         # call the parent class
         (db_asg, db_lc) = self._create_autoscale_group(user_obj, asg)
 
@@ -98,7 +108,7 @@ class EPUSystemWithLocalDB(SystemLocalDB):
         conf['engine_conf']['iaas_site'] = db_asg.AvailabilityZones + "-" + user_obj.access_id
         conf['engine_conf']['iaas_allocation'] = db_lc.InstanceType
 
-        log(logging.INFO, "Creating autoscale group with %s" % (conf))
+        log(logging.INFO, "Creating autoscale group with %s", conf)
         try:
             self._epum_client.add_domain(asg.AutoScalingGroupName, conf)
         except Exception, ex:
@@ -110,11 +120,11 @@ class EPUSystemWithLocalDB(SystemLocalDB):
 
 
     @LogEntryDecorator(classname="EPUSystemWithLocalDB")
+    @db_request
     def alter_autoscale_group(self, user_obj, name, new_conf, force):
-        self._clean_up_db()
         asg = self._db.get_asg(user_obj, name)
         if not asg:
-            raise PhantomAWSException('InvalidParameterValue', details="The name %s does not exists" % (asg.AutoScalingGroupName))
+            raise PhantomAWSException('InvalidParameterValue', details="The name %s does not exists" % (name))
 
         conf = {'engine_conf':
                     {'preserve_n': new_conf['desired_capacity']},
@@ -124,26 +134,38 @@ class EPUSystemWithLocalDB(SystemLocalDB):
         except Exception, ex:
             raise
 
-        asg.DesiredCapacity = desired_capacity
+        asg.DesiredCapacity = new_conf['desired_capacity']
         self._db.db_commit()
 
     @LogEntryDecorator(classname="EPUSystemWithLocalDB")
+    @db_request
     def get_autoscale_groups(self, user_obj, names=None, max=-1, startToken=None):
-        self._clean_up_db()
         try:
-            (asg_list_type, next_token) = SystemLocalDB.get_autoscale_groups(self, user_obj, names, max, startToken)
             epu_list = self._epum_client.list_domains()
-            log(logging.DEBUG, "Incoming epu list is %s" %(str(epu_list)))
-
-            # verify that the names are in thelist
-            my_list = []
-            for grp in asg_list_type.type_list:
-                if grp.AutoScalingGroupName not in epu_list:
-                    # perhaps all we should do here is log the error and remove the item from the DB
-                    # for now make it very obvious that this happened
-                    raise PhantomAWSException('InternalFailure', "%s is in the DB but the epu does not know about it" % (grp.AutoScalingGroupName))
-
-                epu_desc = self._epum_client.describe_domain(grp.AutoScalingGroupName)
+            log(logging.DEBUG, "Incoming epu list is %s", epu_list)
+            epu_names = set(epu_list)
+
+            # groups the epu no longer knows about are left out, the reconciler removes their rows.
+            # pages are fetched until there are max known groups so that a page with a
+            # NextToken is never short
+            known = []
+            next_token = startToken
+            while True:
+                want = max
+                if max > -1:
+                    want = max - len(known)
+                (asg_list_type, next_token) = SystemLocalDB.get_autoscale_groups(self, user_obj, names, want, next_token)
+                for grp in asg_list_type.type_list:
+                    if grp.AutoScalingGroupName not in epu_names:
+                        log(logging.ERROR, "%s is in the DB but the epu does not know about it", grp.AutoScalingGroupName)
+                        continue
+                    known.append(grp)
+                if next_token is None or len(known) >= max:
+                    break
+            asg_list_type.type_list = known
+
+            epu_descs = self._rpc.map(self._direct_epum_client.describe_domain, [grp.AutoScalingGroupName for grp in asg_list_type.type_list])
+            for (grp, epu_desc) in zip(asg_list_type.type_list, epu_descs):
                 convert_epu_description_to_asg_out(epu_desc, grp)
         except Exception, ex:
             raise
@@ -154,8 +176,8 @@ class EPUSystemWithLocalDB(SystemLocalDB):
 
 
     @LogEntryDecorator(classname="EPUSystemWithLocalDB")
+    @db_request
     def delete_autoscale_group(self, user_obj, name, force):
-        self._clean_up_db()
         asg = self._db.get_asg(user_obj, name)
         if not asg:
             raise PhantomAWSException('InvalidParameterValue', details="The name %s does not exists" % (name))
@@ -175,19 +197,3 @@ class EPUSystemWithLocalDB(SystemLocalDB):
 
         self._db.delete_asg(asg)
         self._db.db_commit()
-
-    @LogEntryDecorator(classname="EPUSystemWithLocalDB")
-    def _clean_up_db(self):
-        try:
-            epu_list = self._epum_client.list_domains()
-            asgs = self._db.get_asgs(None)
-
-            for asg in asgs:
-                if asg.AutoScalingGroupName not in epu_list:
-                    log(logging.ERROR, "Cleaning up an ASG that is in the database and not in the epu list: %s" % (asg.AutoScalingGroupName))
-                    self._db.delete_asg(asg)
-                    self._db.db_commit()
-                    log(logging.INFO, "Object %s has been deleted" % (str(asg)))
-
-        except Exception, ex:
-            log(logging.ERROR, "An error occurred while attempting to clean up the DB : %s" % (str(ex)))
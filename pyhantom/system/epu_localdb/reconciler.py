@@ -0,0 +1,68 @@
+import logging
+import threading
+from pyhantom.util import log
+
+DEFAULT_RECONCILE_INTERVAL = 60
+DEFAULT_RECONCILE_BATCH_SIZE = 500
+
+
+class ASGReconciler(object):
+    """Removes autoscale group rows whose EPU domain no longer exists.  This
+    runs every interval seconds on its own thread instead of on every API
+    call.
+
+    The rows are read before the domains are listed.  A group is created
+    in the EPU before its row is committed, so a row that is missing from a
+    later listing really has lost its domain.  A row is still only removed
+    once it has been missing from two passes in a row.  That leaves a
+    DeleteAutoScalingGroup that is under way time to remove the row itself."""
+
+    def __init__(self, db, epum_client, interval=DEFAULT_RECONCILE_INTERVAL, batch_size=DEFAULT_RECONCILE_BATCH_SIZE):
+        self._db = db
+        self._epum_client = epum_client
+        self._interval = interval
+        self._batch_size = batch_size
+        self._suspects = set()
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    def reconcile(self):
+        """Run one pass and return the number of rows removed"""
+        try:
+            asg_keys = self._db.get_asg_keys()
+            epu_names = set(self._epum_client.list_domains())
+
+            missing = set([key for key in asg_keys if key[1] not in epu_names])
+            doomed = sorted(missing & self._suspects)
+            self._suspects = missing - set(doomed)
+
+            for (column_id, name) in doomed:
+                log(logging.ERROR, "Cleaning up an ASG that is in the database and not in the epu list: %s", name)
+            for i in range(0, len(doomed), self._batch_size):
+                batch = doomed[i:i + self._batch_size]
+                self._db.delete_asgs([column_id for (column_id, name) in batch])
+                self._db.db_commit()
+            return len(doomed)
+        except:
+            self._db.db_rollback()
+            raise
+        finally:
+            self._db.remove_session()
+
+    def _run(self):
+        while not self._stop_event.wait(self._interval):
+            try:
+                self.reconcile()
+            except Exception, ex:
+                log(logging.ERROR, "An error occurred while attempting to clean up the DB : %s", str(ex))
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="ASGReconciler")
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
@@ -1,4 +1,6 @@
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import sessionmaker, scoped_session, subqueryload
+from sqlalchemy.pool import QueuePool
+from sqlalchemy import event
 from sqlalchemy import String, MetaData, Sequence
 from sqlalchemy import Table
 from sqlalchemy import Integer
@@ -11,6 +13,7 @@ from sqlalchemy.orm import mapper
 from sqlalchemy.orm import relation
 import sqlalchemy
 import logging
+from pyhantom.authz.simple_sql_db import ping_connection
 
 metadata = MetaData()
 
@@ -90,7 +93,14 @@ class LaunchConfigurationObject(object):
             sgo.name = sg
             self.security_groups.append(sgo)
 
-        # XXX todo: if we everuse EBS we will need that here.
+        for bdm in out_t.BlockDeviceMappings.type_list:
+            bdmo = BlockDeviceMappingsObject()
+            bdmo.DeviceName = bdm.DeviceName
+            bdmo.VirtualName = bdm.VirtualName
+            if getattr(bdm, 'Ebs', None) is not None:
+                bdmo.EBS_SnapshotId = bdm.Ebs.SnapshotId
+                bdmo.EBS_VolumeSize = bdm.Ebs.VolumeSize
+            self.block_device_mappings.append(bdmo)
 
 class SecurityGroupObject(object):
     def __init__(self):
@@ -130,21 +140,50 @@ mapper(LaunchConfigurationObject, launch_configuration_table, properties={
     'security_groups':relation(SecurityGroupObject, backref="launch_configuration")})
 
 
-class LaunchConfigurationDB(object):
+def _page(q, name_column, max, startToken):
+    """Keyset pagination: rows come back in name order starting at the
+    startToken name, at most max of them.  The (user_name, name) unique
+    constraints index both tables so this is a range scan."""
+    if startToken:
+        q = q.filter(name_column >= startToken)
+    q = q.order_by(name_column)
+    if max > -1:
+        q = q.limit(max)
+    return q
+
 
-    def __init__(self, dburl, module=None, logger=logging):
+DEFAULT_DB_POOL_SIZE = 5
+DEFAULT_DB_POOL_MAX_OVERFLOW = 10
+DEFAULT_DB_POOL_RECYCLE = 3600
 
-        if module is None:
-            self._engine = sqlalchemy.create_engine(dburl, connect_args={'check_same_thread':False})
-        else:
-            self._engine = sqlalchemy.create_engine(dburl, module=module, connect_args={'check_same_thread':False})
+
+class LaunchConfigurationDB(object):
+    """Connections come from a QueuePool shared by all threads and each
+    thread gets its own session.  A request should end with
+    remove_session() so the next request on that thread starts clean."""
+
+    def __init__(self, dburl, module=None, logger=logging, pool_size=DEFAULT_DB_POOL_SIZE,
+                 max_overflow=DEFAULT_DB_POOL_MAX_OVERFLOW, pool_recycle=DEFAULT_DB_POOL_RECYCLE, pool_pre_ping=False):
+
+        kwargs = {}
+        if module is not None:
+            kwargs['module'] = module
+        if dburl.startswith('sqlite'):
+            # pooled sqlite connections move between the server threads
+            kwargs['connect_args'] = {'check_same_thread': False}
+        self._engine = sqlalchemy.create_engine(dburl, poolclass=QueuePool, pool_size=pool_size,
+                                                max_overflow=max_overflow, pool_recycle=pool_recycle, **kwargs)
+        if pool_pre_ping:
+            event.listen(self._engine.pool, 'checkout', ping_connection)
         metadata.create_all(self._engine)
-        self._SessionX = sessionmaker(bind=self._engine)
-        self._Session = self._SessionX()
+        self._Session = scoped_session(sessionmaker(bind=self._engine))
         self._log = logger
 
     def close(self):
-        self._Session.close()
+        self._Session.remove()
+
+    def remove_session(self):
+        self._Session.remove()
 
     def db_obj_add(self, obj):
         self._Session.add(obj)
@@ -152,25 +191,38 @@ class LaunchConfigurationDB(object):
     def db_commit(self):
         self._Session.commit()
 
+    def db_rollback(self):
+        self._Session.rollback()
+
     def delete_lc(self, obj):
         for sg in obj.security_groups:
             self._Session.delete(sg)
+        for bdm in obj.block_device_mappings:
+            self._Session.delete(bdm)
         self._Session.delete(obj)
 
     def delete_asg(self, obj):
         self._Session.delete(obj)
 
+    def delete_asgs(self, column_ids):
+        q = self._Session.query(AutoscaleGroupObject).filter(AutoscaleGroupObject.column_id.in_(column_ids))
+        q.delete(synchronize_session=False)
+
+    def get_asg_keys(self):
+        """(column_id, name) of every autoscale group of every user"""
+        q = self._Session.query(AutoscaleGroupObject.column_id, AutoscaleGroupObject.AutoScalingGroupName)
+        return [(column_id, name) for (column_id, name) in q.all()]
+
     def get_lcs(self, user_object, names=None, max=-1, startToken=None, log=logging):
 
-        q = self._Session.query(LaunchConfigurationObject).filter(LaunchConfigurationObject.user_name==user_object.access_id)
+        # every launch config returned is converted with its security groups and block devices,
+        # loading them up front costs one query per relation instead of one per row
+        q = self._Session.query(LaunchConfigurationObject).options(subqueryload('security_groups'), subqueryload('block_device_mappings'))
+        q = q.filter(LaunchConfigurationObject.user_name==user_object.access_id)
 
         if names:
             q = q.filter(LaunchConfigurationObject.LaunchConfigurationName.in_(names))
-        if max > -1:
-            q.limit(max)
-        q = q.order_by(LaunchConfigurationObject.LaunchConfigurationName)
-        if startToken:
-            q = q.filter(LaunchConfigurationObject.LaunchConfigurationName >= startToken)
+        q = _page(q, LaunchConfigurationObject.LaunchConfigurationName, max, startToken)
 
         return q.all()
 
@@ -188,10 +240,6 @@ class LaunchConfigurationDB(object):
 
         if names:
             q = q.filter(AutoscaleGroupObject.AutoScalingGroupName.in_(names))
-        if max > -1:
-            q.limit(max)
-        q = q.order_by(AutoscaleGroupObject.AutoScalingGroupName)
-        if startToken:
-            q = q.filter(AutoscaleGroupObject.AutoScalingGroupName >= startToken)
+        q = _page(q, AutoscaleGroupObject.AutoScalingGroupName, max, startToken)
 
         return q.all()
@@ -1,10 +1,29 @@
 import logging
 from sqlalchemy.exc import IntegrityError
 import uuid
-from pyhantom.out_data_types import LaunchConfigurationType, AWSListType, DateTimeType, AutoScalingGroupType, InstanceType
+from pyhantom.out_data_types import LaunchConfigurationType, AWSListType, DateTimeType, AutoScalingGroupType, InstanceType, \
+    BlockDeviceMappingType, EbsType
 from pyhantom.phantom_exceptions import PhantomAWSException
 from pyhantom.system import SystemAPI
-from pyhantom.system.local_db.persistance import LaunchConfigurationDB, LaunchConfigurationObject, AutoscaleGroupObject
+from pyhantom.system.local_db.persistance import LaunchConfigurationDB, LaunchConfigurationObject, AutoscaleGroupObject, \
+    DEFAULT_DB_POOL_SIZE, DEFAULT_DB_POOL_MAX_OVERFLOW, DEFAULT_DB_POOL_RECYCLE
+
+
+def db_request(func):
+    """Run one SystemLocalDB call as a unit of work on the calling thread's
+    session.  Anything not committed when the call fails is rolled back and
+    the session is always removed afterwards."""
+    def call(system, *args, **kwargs):
+        try:
+            return func(system, *args, **kwargs)
+        except:
+            system._db.db_rollback()
+            raise
+        finally:
+            system._db.remove_session()
+    call.__name__ = func.__name__
+    call.__doc__ = func.__doc__
+    return call
 
 
 def db_launch_config_to_outtype(lcdb):
@@ -21,7 +40,16 @@ def db_launch_config_to_outtype(lcdb):
     for sg in lcdb.security_groups:
         lc.SecurityGroups.type_list.append(sg.name)
     lc.InstanceMonitoring.Enabled = lcdb.InstanceMonitoring
-    #lc.BlockDeviceMappings
+    for bdmdb in lcdb.block_device_mappings:
+        bdm = BlockDeviceMappingType('BlockDeviceMapping')
+        bdm.DeviceName = bdmdb.DeviceName
+        bdm.VirtualName = bdmdb.VirtualName
+        bdm.Ebs = None
+        if bdmdb.EBS_SnapshotId is not None or bdmdb.EBS_VolumeSize is not None:
+            bdm.Ebs = EbsType('Ebs')
+            bdm.Ebs.SnapshotId = bdmdb.EBS_SnapshotId
+            bdm.Ebs.VolumeSize = bdmdb.EBS_VolumeSize
+        lc.BlockDeviceMappings.type_list.append(bdm)
     lc.CreatedTime = DateTimeType('CreatedTime', lcdb.CreatedTime)
 
     return lc
@@ -53,9 +81,15 @@ class SystemLocalDB(SystemAPI):
 
     def __init__(self, cfg, log=logging):
         # cfg.phantom.system.db_url
-        self._db = LaunchConfigurationDB(cfg.phantom.system.db_url)
+        system_cfg = cfg.phantom.system
+        self._db = LaunchConfigurationDB(system_cfg.db_url,
+                                         pool_size=getattr(system_cfg, 'db_pool_size', DEFAULT_DB_POOL_SIZE),
+                                         max_overflow=getattr(system_cfg, 'db_pool_max_overflow', DEFAULT_DB_POOL_MAX_OVERFLOW),
+                                         pool_recycle=getattr(system_cfg, 'db_pool_recycle', DEFAULT_DB_POOL_RECYCLE),
+                                         pool_pre_ping=getattr(system_cfg, 'db_pool_pre_ping', False))
         self._log = log
 
+    @db_request
     def create_launch_config(self, user_obj, lc):
         try:
             lco = LaunchConfigurationObject()
@@ -66,6 +100,7 @@ class SystemLocalDB(SystemAPI):
             self._log.error("DB error %s" % (str(ie)))
             raise PhantomAWSException('InvalidParameterValue',details="Name already in use")
 
+    @db_request
     def get_launch_configs(self, user_obj, names=None, max=-1, startToken=None):
         next_token = None
         use_max = max
@@ -74,9 +109,10 @@ class SystemLocalDB(SystemAPI):
 
         db_lco = self._db.get_lcs(user_obj, names, use_max, startToken, log=self._log)
 
-        if max > -1 and db_lco:
-            nxt = db_lco.pop(-1)
-            next_token = nxt.LaunchConfigurationName
+        # the extra row is the first one of the next page, its name is the token
+        if max > -1 and len(db_lco) > max:
+            next_token = db_lco[max].LaunchConfigurationName
+            db_lco = db_lco[:max]
 
         # if we ever expect people to have more than a few launch configs we should change this to itertools
         lc_list_type = AWSListType('LaunchConfigurations')
@@ -87,6 +123,7 @@ class SystemLocalDB(SystemAPI):
         return (lc_list_type, next_token)
 
 
+    @db_request
     def delete_launch_config(self, user_obj, name):
         db_lco = self._db.get_lcs(user_obj, [name,], max=1, log=self._log)
         if not db_lco:
@@ -125,11 +162,13 @@ class SystemLocalDB(SystemAPI):
         db_asg.set_from_outtype(asg, user_obj)
         return (db_asg, db_lco[0])
 
+    @db_request
     def create_autoscale_group(self, user_obj, asg):
         (db_asg, db_lc) = self._create_autoscale_group(user_obj, asg)
         self._db.db_obj_add(db_asg)
         self._db.db_commit()
 
+    @db_request
     def alter_autoscale_group(self, user_obj, name, new_conf, force):
         asg = self._db.get_asg(user_obj, name)
         if not asg:
@@ -139,6 +178,7 @@ class SystemLocalDB(SystemAPI):
         self._db.db_commit()
 
 
+    @db_request
     def get_autoscale_groups(self, user_obj, names=None, max=-1, startToken=None):
         next_token = None
         use_max = max
@@ -147,9 +187,9 @@ class SystemLocalDB(SystemAPI):
 
         db_asgs = self._db.get_asgs(user_obj, names, use_max, startToken, log=self._log)
 
-        if max > -1 and db_asg:
-            nxt = db_asg.pop(-1)
-            next_token = nxt.AutoScalingGroupName
+        if max > -1 and len(db_asgs) > max:
+            next_token = db_asgs[max].AutoScalingGroupName
+            db_asgs = db_asgs[:max]
 
         asg_list_type = AWSListType('AutoScalingGroups')
         for asgdb in db_asgs:
@@ -159,6 +199,7 @@ class SystemLocalDB(SystemAPI):
 
         return (asg_list_type, next_token)
 
+    @db_request
     def delete_autoscale_group(self, user_obj, name, force):
         asg = self._db.get_asg(user_obj, name)
         if not asg:
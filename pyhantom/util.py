@@ -1,20 +1,24 @@
 import time
 
 import base64
-import boto
 from hashlib import sha1
 from hashlib import sha256
-import boto.utils
-import boto.provider
 import hmac
 import logging
+import random
 import traceback
 import urllib
 import re
 import webob.exc
 import datetime
+from pyhantom.cache import TTLCache
 from pyhantom.phantom_exceptions import PhantomAWSException, PhantomNotImplementedException
 
+# derived SigV4 signing keys only change with the credential scope (date/region/service)
+SIGNING_KEY_CACHE_MAX_ENTRIES = 1024
+SIGNING_KEY_CACHE_TTL = 60 * 60 * 36
+g_signing_key_cache = TTLCache(max_entries=SIGNING_KEY_CACHE_MAX_ENTRIES, ttl=SIGNING_KEY_CACHE_TTL)
+
 
 def statsd(func):
     def call(phantom_service, *args, **kwargs):
@@ -31,19 +35,77 @@ def statsd(func):
         return ret
     return call
 
-def log(lvl, message, printstack=False):
+def submit_metric(statsd_client, kind, name, value=None):
+    """Send one 'incr', 'timing' or 'gauge' metric to statsd_client.  Nothing
+    is sent when statsd is not configured, and a failure to send is only logged."""
+    if statsd_client is None:
+        return
+    try:
+        if kind == 'incr':
+            statsd_client.incr(name)
+        elif kind == 'timing':
+            statsd_client.timing(name, value)
+        else:
+            statsd_client.gauge(name, value)
+    except:
+        log(logging.ERROR, "Failed to submit metrics", printstack=True)
+
+# reply bodies longer than this are truncated in the log, 0 or less means no limit
+DEFAULT_REPLY_LOG_MAX_SIZE = 4096
+# the fraction of replies whose bodies are logged
+DEFAULT_REPLY_LOG_SAMPLE_RATE = 1.0
+g_reply_log_max_size = DEFAULT_REPLY_LOG_MAX_SIZE
+g_reply_log_sample_rate = DEFAULT_REPLY_LOG_SAMPLE_RATE
+
+def configure_reply_logging(max_size=DEFAULT_REPLY_LOG_MAX_SIZE, sample_rate=DEFAULT_REPLY_LOG_SAMPLE_RATE):
+    global g_reply_log_max_size
+    global g_reply_log_sample_rate
+    g_reply_log_max_size = max_size
+    g_reply_log_sample_rate = sample_rate
+
+def log(lvl, message, *args, **kwargs):
+    """Log to the phantom logger.  Any args are handed to the logger so the
+    message is only formatted when lvl is enabled."""
     logger = logging.getLogger("phantom")
-    logger.log(lvl, message)
+    if not logger.isEnabledFor(lvl):
+        return
+    logger.log(lvl, message, *args)
 
-    if printstack:
+    if kwargs.get('printstack', False):
         str = traceback.format_exc()
         logger.log(lvl, str)
 
+def log_enabled(lvl):
+    return logging.getLogger("phantom").isEnabledFor(lvl)
+
 def log_request(req, user_obj):
-    log(logging.INFO, "Received request %s from user %s" % (str(req.params), user_obj.access_id))
+    if not log_enabled(logging.INFO):
+        return
+    log(logging.INFO, "Received request %s from user %s", req.params, user_obj.access_id)
+
+def reply_log_wanted():
+    """True if the body of the reply about to be sent should be logged.
+    Replies are sampled, so ask once per reply."""
+    if not log_enabled(logging.INFO):
+        return False
+    if g_reply_log_sample_rate < 1.0 and random.random() >= g_reply_log_sample_rate:
+        return False
+    return True
+
+def log_reply_body(body, user_obj):
+    if g_reply_log_max_size > 0 and len(body) > g_reply_log_max_size:
+        body = "%s... (truncated %d characters)" % (body[:g_reply_log_max_size], len(body) - g_reply_log_max_size)
+    log(logging.INFO, "Sending reply %s to user %s", body, user_obj.access_id)
+
+def _log_reply_body(get_body, user_obj):
+    if reply_log_wanted():
+        log_reply_body(get_body(), user_obj)
 
 def log_reply(doc, user_obj):
-    log(logging.INFO, "Sending reply %s to user %s" % (doc.documentElement.toprettyxml(), user_obj.access_id))
+    _log_reply_body(doc.documentElement.toprettyxml, user_obj)
+
+def log_reply_writer(writer, user_obj):
+    _log_reply_body(writer.getvalue, user_obj)
 
 
 def not_implemented_decorator(func):
@@ -57,19 +119,23 @@ def not_implemented_decorator(func):
 class LogEntryDecorator(object):
 
     def __init__(self, classname=None):
+        self._classname = ""
         if classname:
             self._classname = classname + ":"
 
     def __call__(self, func):
         def wrapped(*args, **kw):
+            debug = log_enabled(logging.DEBUG)
             try:
-                log(logging.DEBUG, "Entering %s%s." % (self._classname, func.func_name))
+                if debug:
+                    log(logging.DEBUG, "Entering %s%s.", self._classname, func.func_name)
                 return func(*args, **kw)
             except Exception, ex:
-                log(logging.ERROR, "exiting %s%s with error: %s." % (self._classname, func.func_name, str(ex)))
+                log(logging.ERROR, "exiting %s%s with error: %s.", self._classname, func.func_name, ex)
                 raise
             finally:
-                log(logging.DEBUG, "Exiting %s%s." % (self._classname, func.func_name))
+                if debug:
+                    log(logging.DEBUG, "Exiting %s%s.", self._classname, func.func_name)
         return wrapped
 
 
@@ -95,6 +161,14 @@ class CatchErrorDecorator(object):
                 pass
         return wrapped
 
+def get_utf8_value(value):
+    # the same as boto.utils.get_utf8_value, without importing boto for it
+    if isinstance(value, unicode):
+        return value.encode('utf-8')
+    if not isinstance(value, str):
+        return str(value)
+    return value
+
 def phantom_is_primative(t):
     return t == str or t == int or t == bool or t == float or t == unicode
 
@@ -129,7 +203,7 @@ def calc_aws4_signature(secret_key, req, access_dict):
         for key in keys:
             if key == 'Signature':
                 continue
-            val = boto.utils.get_utf8_value(req.params[key])
+            val = get_utf8_value(req.params[key])
             pairs.append(urllib.quote(key, safe='') + '=' +
                          urllib.quote(val, safe='-_~'))
         body = '&'.join(pairs)
@@ -153,18 +227,33 @@ def aws4_sign(key, msg, hex=False):
     return sig
 
 
-def aws4_signature(req, string_to_sign, key, access_dict):
-
-    vals = access_dict['CredentialScope'].split('/')
+def aws4_signing_key(key, credential_scope):
+    vals = credential_scope.split('/')
 
     k_date = aws4_sign(('AWS4' + key).encode('utf-8'),
                           vals[0])
     k_region = aws4_sign(k_date, vals[1])
     k_service = aws4_sign(k_region, vals[2])
     k_signing = aws4_sign(k_service, vals[3])
+    return k_signing
+
+
+def aws4_signature(req, string_to_sign, key, access_dict):
+    scope = access_dict['CredentialScope']
+    # a digest of the secret is part of the cache key so that a changed secret never gets an
+    # old signing key, without the secret itself being kept in the cache
+    cache_key = (access_dict.get('AWSAccessKeyId'), sha256(key.encode('utf-8')).digest(), scope)
+    k_signing = g_signing_key_cache.get(cache_key)
+    if k_signing is None:
+        k_signing = aws4_signing_key(key, scope)
+        g_signing_key_cache.put(cache_key, k_signing)
     return aws4_sign(k_signing, string_to_sign, hex=True)
 
 
+def signing_key_cache_hit_ratio():
+    return g_signing_key_cache.hit_ratio()
+
+
 def get_auth_hash(secret_key, req, access_dict):
     if access_dict['SignatureVersion'] == '2':
         sig = calc_v2_signature(secret_key, req, access_dict)
@@ -176,17 +265,71 @@ def get_auth_hash(secret_key, req, access_dict):
         sig = calc_aws4_signature(secret_key, req, access_dict)
     return sig
 
+# the same few timestamps (CreatedTime of every group and launch config) are parsed and
+# written over and over, so results are remembered until there are too many of them
+TIME_MEMO_MAX_ENTRIES = 4096
+g_parse_time_memo = {}
+g_make_time_memo = {}
+
+# 2012-05-01T12:30:15Z, optionally with fractions of a second and a UTC, GMT or +hh:mm offset in place of the Z.
+# the zone may only be left off after a fraction of a second, that time is taken as UTC as it always was
+_ISO8601_RE = re.compile(r'(\d{4})-(\d\d)-(\d\d)T(\d\d):(\d\d):(\d\d)(?:(?:\.\d*)?(?:Z|UTC|GMT|([+-])(\d\d):?(\d\d))|\.\d*)\Z')
+# the X-Amz-Date header, 20120501T123015Z
+_AMZ_DATE_RE = re.compile(r'(\d{4})(\d\d)(\d\d)T(\d\d)(\d\d)(\d\d)Z\Z')
+
+def _memo_put(memo, key, value):
+    if len(memo) >= TIME_MEMO_MAX_ENTRIES:
+        memo.clear()
+    memo[key] = value
+
 def _get_time(str_time):
-    str_time = str_time.replace("Z", "UTC")
-    # in case the seconds are over provisioned
-    str_time = re.sub('\..*', "UTC", str_time)
-    return datetime.datetime.strptime(str_time, '%Y-%m-%dT%H:%M:%S%Z')
+    """Parse an ISO 8601 time into a naive UTC datetime.  Fractions of a
+    second are dropped."""
+    dt = g_parse_time_memo.get(str_time)
+    if dt is not None:
+        return dt
+    m = _ISO8601_RE.match(str_time)
+    if m is None:
+        raise ValueError("time data %r is not an ISO 8601 time" % (str_time))
+    (year, month, day, hour, minute, second, sign, off_hours, off_minutes) = m.groups()
+    dt = datetime.datetime(int(year), int(month), int(day), int(hour), int(minute), int(second))
+    if sign is not None:
+        offset = datetime.timedelta(hours=int(off_hours), minutes=int(off_minutes))
+        if sign == '+':
+            dt = dt - offset
+        else:
+            dt = dt + offset
+    _memo_put(g_parse_time_memo, str_time, dt)
+    return dt
+
+def _get_amz_time(str_time):
+    """Parse the basic format time of an X-Amz-Date header"""
+    m = _AMZ_DATE_RE.match(str_time)
+    if m is None:
+        raise ValueError("time data %r is not an X-Amz-Date time" % (str_time))
+    return datetime.datetime(*[int(g) for g in m.groups()])
 
 def make_time(datetimeobj):
-    fmt = '%Y-%m-%dT%H:%M:%S.%fZ'
-    dt = datetime.datetime.strftime(datetimeobj, fmt);
+    """Format a datetime as 2012-05-01T12:30:15.000012Z"""
+    d = datetimeobj
+    if d.tzinfo is not None:
+        # aware datetimes that are equal in UTC hash the same but are written differently, so they are not remembered
+        return '%04d-%02d-%02dT%02d:%02d:%02d.%06dZ' % (d.year, d.month, d.day, d.hour, d.minute, d.second, d.microsecond)
+    dt = g_make_time_memo.get(d)
+    if dt is not None:
+        return dt
+    if d.microsecond:
+        dt = d.isoformat() + 'Z'
+    else:
+        # isoformat leaves off a zero fraction
+        dt = d.isoformat() + '.000000Z'
+    _memo_put(g_make_time_memo, d, dt)
     return dt
 
+def _make_timestamp(d):
+    # the Timestamp request parameter has no fractions of a second
+    return '%04d-%02d-%02dT%02d:%02d:%02dZ' % (d.year, d.month, d.day, d.hour, d.minute, d.second)
+
 def authenticate_user(secret_key, req, access_dict):
     access_id = access_dict['AWSAccessKeyId']
     signature = access_dict['Signature']
@@ -237,7 +380,7 @@ def calc_v2_signature(secret_key, req, access_dict):
     for key in keys:
         if key == 'Signature':
             continue
-        val = boto.utils.get_utf8_value(req.params[key])
+        val = get_utf8_value(req.params[key])
         pairs.append(urllib.quote(key, safe='') + '=' +
                      urllib.quote(val, safe='-_~'))
     qs = '&'.join(pairs)
@@ -292,10 +435,8 @@ def _get_aws_access_key_method_two(req):
             res[k] = req.params[k]
             found = True
     if not found:
-        dt_str =  req.headers['X-Amz-Date'].replace('Z', 'UTC')
-        dt = datetime.datetime.strptime(dt_str, '%Y%m%dT%H%M%S%Z')
-        dt_str2 = dt.strftime('%Y-%m-%dT%H:%M:%SZ')
-        res['Timestamp'] = dt_str2
+        dt = _get_amz_time(req.headers['X-Amz-Date'])
+        res['Timestamp'] = _make_timestamp(dt)
 
     for k in res.keys():
         if res[k] is None:
@@ -2,9 +2,31 @@ import uuid
 from webob.response import Response
 from pyhantom.config import build_cfg
 import xml.dom.minidom
-from pyhantom.util import get_aws_access_key
+from pyhantom.util import get_aws_access_key, authenticate_user, reply_log_wanted, log_reply_body, submit_metric, \
+    signing_key_cache_hit_ratio
+from pyhantom.xml_writer import XMLStreamWriter
+
+# the key under which the authenticated request context is stored in the wsgi environ
+PHANTOM_REQUEST_CONTEXT_KEY = 'phantom.request_context'
+# streamed response bodies are sent in chunks of about this many characters
+DEFAULT_RESPONSE_CHUNK_SIZE = 65536
+
+
+class PhantomRequestContext(object):
+    """The result of authenticating a request.  It is established once per
+    request (normally by the MainRouter) and carried in the wsgi environ so
+    that the action applications do not have to look the user up again."""
+
+    def __init__(self, request_id, user_obj, access_dict):
+        self.request_id = request_id
+        self.user_obj = user_obj
+        self.access_dict = access_dict
+
 
 class PhantomBaseService(object):
+    """The MainRouter makes one of each action application when it starts
+    and uses it for every request, so nothing about a single request may be
+    kept on self.  The request id and user come from the request context."""
 
     def __init__(self, name, cfg=None, authz=None):
         if cfg is None:
@@ -14,16 +36,33 @@ class PhantomBaseService(object):
         self._system = self._cfg.get_system()
         self.name = name
         self.ns = u"http://autoscaling.amazonaws.com/doc/2009-05-15/"
-        self.xamznRequestId = str(uuid.uuid4())
         self._authz = self._cfg.get_authz()
 
-    def get_user_obj(self, req):
+    def authenticate_request(self, req, request_id):
         access_dict = get_aws_access_key(req)
+        authz = self._cfg.get_authz()
+        user_obj = authz.get_user_object_by_access_id(access_dict['AWSAccessKeyId'])
+        authenticate_user(user_obj.secret_key, req, access_dict)
+        submit_metric(self._cfg.statsd_client, 'gauge', 'autoscale.signing_key.cache.hit_ratio', signing_key_cache_hit_ratio())
+
+        ctx = PhantomRequestContext(request_id, user_obj, access_dict)
+        req.environ[PHANTOM_REQUEST_CONTEXT_KEY] = ctx
+        return ctx
 
-        user_obj = self._authz.get_user_object_by_access_id(access_dict['AWSAccessKeyId'])
-        return user_obj
+    def get_request_context(self, req):
+        ctx = req.environ.get(PHANTOM_REQUEST_CONTEXT_KEY)
+        if ctx is None:
+            # the application is being used without the router in front of it
+            ctx = self.authenticate_request(req, str(uuid.uuid4()))
+        return ctx
+
+    def get_user_obj(self, req):
+        return self.get_request_context(req).user_obj
 
-    def get_default_response_body_dom(self, doc_name=None):
+    def get_request_id(self, req):
+        return self.get_request_context(req).request_id
+
+    def get_default_response_body_dom(self, req, doc_name=None):
         if doc_name is None:
             doc_name = self.name
 
@@ -37,11 +76,50 @@ class PhantomBaseService(object):
         top_element.appendChild(resp_el)
         reqid_el = doc.createElement('RequestId')
         resp_el.appendChild(reqid_el)
-        text_element = doc.createTextNode(self.xamznRequestId)
+        text_element = doc.createTextNode(self.get_request_id(req))
         reqid_el.appendChild(text_element)
         return doc
 
-    def get_response(self):
+    def get_default_response_body_writer(self, req, doc_name=None):
+        """The streaming equivalent of get_default_response_body_dom.  The
+        document element is left open for the caller to add to and close."""
+        if doc_name is None:
+            doc_name = self.name
+
+        writer = XMLStreamWriter()
+        writer.start(unicode(doc_name), [("xmlns", self.ns)])
+        writer.start('ResponseMetadata')
+        writer.element('RequestId', self.get_request_id(req))
+        writer.end()
+        return writer
+
+    def stream_response_body(self, res, writer, body, user_obj, chunk_size=DEFAULT_RESPONSE_CHUNK_SIZE):
+        """Send the document in writer as the body of res while it is still
+        being written.  body is an iterator that writes the rest of the
+        document to writer, each step it takes is a point where what has been
+        written so far may be sent.  No Content-Length is set.  The reply is
+        logged once all of it has been written."""
+        charset = res.charset
+        logged = None
+        if reply_log_wanted():
+            logged = []
+
+        def app_iter():
+            for step in body:
+                if writer.pending_size() >= chunk_size:
+                    data = writer.drain()
+                    if logged is not None:
+                        logged.append(data)
+                    yield data.encode(charset)
+            data = writer.drain()
+            if logged is not None:
+                logged.append(data)
+                log_reply_body(u"".join(logged), user_obj)
+            yield data.encode(charset)
+
+        res.app_iter = app_iter()
+
+    def get_response(self, req):
         res = Response()
-        res.headers['x-amzn-RequestId'] = self.xamznRequestId
+        res.headers['x-amzn-RequestId'] = self.get_request_id(req)
         return res
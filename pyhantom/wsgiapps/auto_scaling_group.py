@@ -24,14 +24,14 @@ class CreateAutoScalingGroup(PhantomBaseService):
         input = CreateAutoScalingGroupInput()
         input.set_from_dict(req.params)
 
-        arn = make_arn(input.AutoScalingGroupName, self.xamznRequestId, 'autoScalingGroupName')
+        arn = make_arn(input.AutoScalingGroupName, self.get_request_id(req), 'autoScalingGroupName')
         asg = AutoScalingGroupType('AutoScalingGroup')
         asg.set_from_intype(input, arn)
 
         self._system.create_autoscale_group(user_obj, asg)
 
-        res = self.get_response()
-        doc = self.get_default_response_body_dom(doc_name="CreateAutoScalingGroupResponse")
+        res = self.get_response(req)
+        doc = self.get_default_response_body_dom(req, doc_name="CreateAutoScalingGroupResponse")
         res.unicode_body = doc.documentElement.toprettyxml()
         log_reply(doc, user_obj)
         return res
@@ -56,8 +56,8 @@ class DeleteAutoScalingGroup(PhantomBaseService):
             forceit = True
         self._system.delete_autoscale_group(user_obj, input.AutoScalingGroupName, forceit)
         
-        res = self.get_response()
-        doc = self.get_default_response_body_dom(doc_name="DeleteAutoScalingGroupResponse")
+        res = self.get_response(req)
+        doc = self.get_default_response_body_dom(req, doc_name="DeleteAutoScalingGroupResponse")
         res.unicode_body = doc.documentElement.toprettyxml()
         log_reply(doc, user_obj)
         return res
@@ -82,24 +82,22 @@ class DescribeAutoScalingGroup(PhantomBaseService):
             names = input.AutoScalingGroupNames
         (ags_list, next_token) = self._system.get_autoscale_groups(user_obj, names=names, max=input.MaxRecords, startToken=input.NextToken)
 
-        res = self.get_response()
-        doc = self.get_default_response_body_dom(doc_name="DescribeAutoScalingGroupsResponse")
+        res = self.get_response(req)
+        writer = self.get_default_response_body_writer(req, doc_name="DescribeAutoScalingGroupsResponse")
 
-        dlcr_el = doc.createElement('DescribeAutoScalingGroupsResult')
-        doc.documentElement.appendChild(dlcr_el)
+        def write_body(writer):
+            writer.start('DescribeAutoScalingGroupsResult')
+            writer.start('AutoScalingGroups')
+            for asg in ags_list.iter_write_xml(writer):
+                yield asg
+            writer.end()
+            writer.end()
 
-        lc_el = doc.createElement('AutoScalingGroups')
-        dlcr_el.appendChild(lc_el)
+            if next_token:
+                writer.element('NextToken', next_token)
+            writer.end()
 
-        if next_token:
-            nt_el = doc.createElement('NextToken')
-            doc.documentElement.appendChild(nt_el)
-            text_element = doc.createTextNode(next_token)
-            nt_el.appendChild(text_element)
-
-        ags_list.add_xml(doc, lc_el)
-        res.unicode_body = doc.documentElement.toxml()
-        log_reply(doc, user_obj)
+        self.stream_response_body(res, writer, write_body(writer), user_obj)
         return res
 
 
@@ -125,8 +123,8 @@ class SetDesiredCapacity(PhantomBaseService):
         new_conf = {'desired_capacity': input.DesiredCapacity}
         self._system.alter_autoscale_group(user_obj, input.AutoScalingGroupName, new_conf, force)
 
-        res = self.get_response()
-        doc = self.get_default_response_body_dom(doc_name="SetDesiredCapacityResponse")
+        res = self.get_response(req)
+        doc = self.get_default_response_body_dom(req, doc_name="SetDesiredCapacityResponse")
         res.unicode_body = doc.documentElement.toprettyxml()
 
         log(logging.INFO, "User %s change %s capacity to %d" % (user_obj.access_id, input.AutoScalingGroupName, input.DesiredCapacity))
@@ -166,8 +164,8 @@ class CreateOrUpdateTags(PhantomBaseService):
             
             self._system.alter_autoscale_group(user_obj, group_name, new_conf, force=True)
 
-        res = self.get_response()
-        doc = self.get_default_response_body_dom(doc_name="CreateOrUpdateTagsResponse")
+        res = self.get_response(req)
+        doc = self.get_default_response_body_dom(req, doc_name="CreateOrUpdateTagsResponse")
         res.unicode_body = doc.documentElement.toprettyxml()
 
         log_reply(doc, user_obj)
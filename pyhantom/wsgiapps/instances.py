@@ -23,20 +23,19 @@ class DescribeAutoScalingInstances(PhantomBaseService):
             ids = input.InstanceIds
         (inst_list, next_token) = self._system.get_autoscale_instances(user_obj, instance_id_list=ids, max=input.MaxRecords, startToken=input.NextToken)
 
-        res = self.get_response()
-        doc = self.get_default_response_body_dom()
+        res = self.get_response(req)
+        writer = self.get_default_response_body_writer(req)
 
-        lc_el = doc.createElement('AutoScalingInstances')
-        doc.documentElement.appendChild(lc_el)
-        if next_token:
-            nt_el = doc.createElement('NextToken')
-            doc.documentElement.appendChild(nt_el)
-            text_element = doc.createTextNode(next_token)
-            nt_el.appendChild(text_element)
+        def write_body(writer):
+            writer.start('AutoScalingInstances')
+            for inst in inst_list.iter_write_xml(writer):
+                yield inst
+            writer.end()
+            if next_token:
+                writer.element('NextToken', next_token)
+            writer.end()
 
-        inst_list.add_xml(doc, lc_el)
-        res.unicode_body = doc.documentElement.toxml()
-        log_reply(doc, user_obj)
+        self.stream_response_body(res, writer, write_body(writer), user_obj)
         return res
 
 class TerminateInstanceInAutoScalingGroup(PhantomBaseService):
@@ -58,8 +57,8 @@ class TerminateInstanceInAutoScalingGroup(PhantomBaseService):
 
         ############ MUST return an activity type.
 
-        res = self.get_response()
-        doc = self.get_default_response_body_dom(doc_name="TerminateInstanceInAutoScalingGroupResponse")
+        res = self.get_response(req)
+        doc = self.get_default_response_body_dom(req, doc_name="TerminateInstanceInAutoScalingGroupResponse")
         res.unicode_body = doc.documentElement.toprettyxml()
         log_reply(doc, user_obj)
         return res
@@ -21,12 +21,12 @@ class CreateLaunchConfiguration(PhantomBaseService):
         input = LaunchConfigurationInput()
         input.set_from_dict(req.params)
         lc = LaunchConfigurationType('LaunchConfiguration')
-        lc.set_from_intype(input, make_arn(input.LaunchConfigurationName, self.xamznRequestId, 'launchConfigurationName'))
+        lc.set_from_intype(input, make_arn(input.LaunchConfigurationName, self.get_request_id(req), 'launchConfigurationName'))
 
         self._system.create_launch_config(user_obj, lc)
 
-        res = self.get_response()
-        doc = self.get_default_response_body_dom(doc_name="CreateLaunchConfigurationResponse")
+        res = self.get_response(req)
+        doc = self.get_default_response_body_dom(req, doc_name="CreateLaunchConfigurationResponse")
         res.unicode_body = doc.documentElement.toprettyxml()
         log_reply(doc, user_obj)
         return res
@@ -48,8 +48,8 @@ class DeleteLaunchConfiguration(PhantomBaseService):
         input.set_from_dict(req.params)
 
         self._system.delete_launch_config(user_obj, input.LaunchConfigurationName)
-        res = self.get_response()
-        doc = self.get_default_response_body_dom(doc_name="DeleteLaunchConfigurationResponse")
+        res = self.get_response(req)
+        doc = self.get_default_response_body_dom(req, doc_name="DeleteLaunchConfigurationResponse")
         res.unicode_body = doc.documentElement.toprettyxml()
         log_reply(doc, user_obj)
         return res
@@ -75,22 +75,20 @@ class DescribeLaunchConfigurations(PhantomBaseService):
             names = input.LaunchConfigurationNames
         (lc_list, next_token) = self._system.get_launch_configs(user_obj, names=names, max=input.MaxRecords, startToken=input.NextToken)
 
-        res = self.get_response()
-        doc = self.get_default_response_body_dom(doc_name='DescribeLaunchConfigurationsResponse')
+        res = self.get_response(req)
+        writer = self.get_default_response_body_writer(req, doc_name='DescribeLaunchConfigurationsResponse')
 
-        dlcr_el = doc.createElement('DescribeLaunchConfigurationsResult')
-        doc.documentElement.appendChild(dlcr_el)
+        def write_body(writer):
+            writer.start('DescribeLaunchConfigurationsResult')
+            writer.start('LaunchConfigurations')
+            for lc in lc_list.iter_write_xml(writer):
+                yield lc
+            writer.end()
+            writer.end()
 
-        lc_el = doc.createElement('LaunchConfigurations')
-        dlcr_el.appendChild(lc_el)
+            if next_token:
+                writer.element('NextToken', next_token)
+            writer.end()
 
-        if next_token:
-            nt_el = doc.createElement('NextToken')
-            doc.documentElement.appendChild(nt_el)
-            text_element = doc.createTextNode(next_token)
-            nt_el.appendChild(text_element)
-
-        lc_list.add_xml(doc, lc_el)
-        res.unicode_body = doc.documentElement.toxml()
-        log_reply(doc, user_obj)
+        self.stream_response_body(res, writer, write_body(writer), user_obj)
         return res
@@ -0,0 +1,93 @@
+def _escape(data):
+    # the same escaping xml.dom.minidom uses for text and attribute values
+    return data.replace("&", "&amp;").replace("<", "&lt;").replace("\"", "&quot;").replace(">", "&gt;")
+
+
+class XMLStreamWriter(object):
+    """Builds an XML document as a list of string pieces without building a
+    DOM.  The output is the same as xml.dom.minidom's toxml() of the
+    equivalent document element: an element with no children is written as
+    <name/> and nothing is indented."""
+
+    def __init__(self):
+        self._pieces = []
+        # pieces before _counted add up to _pending_size characters
+        self._counted = 0
+        self._pending_size = 0
+        self._stack = []
+        # True while the last start tag still needs its closing '>' or '/>'
+        self._open_tag = False
+
+    def _close_start_tag(self):
+        if self._open_tag:
+            self._pieces.append(">")
+            self._open_tag = False
+
+    def start(self, name, attrs=None):
+        self._close_start_tag()
+        self._pieces.append("<" + name)
+        if attrs:
+            for (a_name, a_value) in sorted(attrs):
+                self._pieces.append(" %s=\"%s\"" % (a_name, _escape(a_value)))
+        self._stack.append(name)
+        self._open_tag = True
+
+    def text(self, data):
+        # an empty text node still counts as a child, minidom writes <name></name> for it
+        self._close_start_tag()
+        if data:
+            self._pieces.append(_escape(data))
+
+    def end(self):
+        name = self._stack.pop()
+        if self._open_tag:
+            self._pieces.append("/>")
+            self._open_tag = False
+        else:
+            self._pieces.append("</%s>" % (name))
+
+    def element(self, name, data=None):
+        # a leaf element, written in one piece
+        self._close_start_tag()
+        if data is None:
+            self._pieces.append("<%s/>" % (name))
+        else:
+            self._pieces.append("<%s>%s</%s>" % (name, _escape(data), name))
+
+    def getvalue(self):
+        """The text written since the last drain"""
+        return u"".join(self._pieces)
+
+    def pending_size(self):
+        """The number of characters written since the last drain"""
+        pieces = self._pieces
+        size = self._pending_size
+        for i in xrange(self._counted, len(pieces)):
+            size = size + len(pieces[i])
+        self._counted = len(pieces)
+        self._pending_size = size
+        return size
+
+    def drain(self):
+        """Return the text written since the last drain and forget it, so a
+        document can be sent while the rest of it is still being written"""
+        data = u"".join(self._pieces)
+        self._pieces = []
+        self._counted = 0
+        self._pending_size = 0
+        return data
+
+    def iter_encoded(self, charset, chunk_size=65536):
+        """Yield the document encoded with charset in chunks of about
+        chunk_size characters, suitable for a webob app_iter."""
+        chunk = []
+        size = 0
+        for piece in self._pieces:
+            chunk.append(piece)
+            size = size + len(piece)
+            if size >= chunk_size:
+                yield u"".join(chunk).encode(charset)
+                chunk = []
+                size = 0
+        if chunk:
+            yield u"".join(chunk).encode(charset)